@@ -2,6 +2,41 @@
 set -euo pipefail
 IFS=$'\n\t'
 
+# Options
+#   --incremental  reuse per-table results of sheets whose content did not change
+#   --force        recompute every table (the incremental cache is still refreshed)
+#   --jobs N       worker processes for the per-table work of 02, 07, 11 and 13 (default 1)
+#   --metrics      record per-stage time, memory and rows in <week folder>/metrics.json
+#   --in-process   run the scripts one at a time in a single python process (libraries imported once)
+#   --project      read only the table columns 02 and the analyzers use (pyarrow strings, empty columns dropped)
+#   --stream-mb N  read the tables of 02 and the analyzers in row chunks of about N MB (memory-bounded)
+# Environment
+#   STAGE_WORKERS  scripts run at the same time by the pipeline runner (default: CPU count)
+#   WPP_PROFILE=1 / WPP_TRACEMALLOC=1  with --metrics, also dump a cProfile / tracemalloc
+#                  report of every stage to output_logs/logs/profiles/
+export WPP_INCREMENTAL=0
+export WPP_FORCE=0
+export WPP_JOBS="${WPP_JOBS:-1}"
+export WPP_METRICS="${WPP_METRICS:-0}"
+export WPP_IN_PROCESS="${WPP_IN_PROCESS:-0}"
+export WPP_PROJECT="${WPP_PROJECT:-0}"
+export WPP_STREAM_MB="${WPP_STREAM_MB:-0}"
+while [ $# -gt 0 ]; do
+  case "$1" in
+    --incremental) WPP_INCREMENTAL=1 ;;
+    --force) WPP_FORCE=1 ;;
+    --jobs) shift; WPP_JOBS="${1:?--jobs needs a number}" ;;
+    --jobs=*) WPP_JOBS="${1#--jobs=}" ;;
+    --metrics) WPP_METRICS=1 ;;
+    --in-process) WPP_IN_PROCESS=1 ;;
+    --project) WPP_PROJECT=1 ;;
+    --stream-mb) shift; WPP_STREAM_MB="${1:?--stream-mb needs a number}" ;;
+    --stream-mb=*) WPP_STREAM_MB="${1#--stream-mb=}" ;;
+    *) echo "Unknown option: $1" >&2; exit 1 ;;
+  esac
+  shift
+done
+
 # Self-locating repo root
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 
@@ -11,6 +46,8 @@ SCRIPTS_DIR="${SCRIPT_DIR}/scripts"
 LOG_DIR="${SCRIPT_DIR}/output_logs/logs"
 REQUIREMENTS="${SCRIPT_DIR}/requirements.txt"
 SHEETS_LIST="${SCRIPT_DIR}/sheets_to_fetch.csv"
+# Parsed-table cache shared by all scripts (see scripts/wpp/loader.py)
+export WPP_CACHE_DIR="${SCRIPT_DIR}/.cache"
 TIMESTAMP=$(date +"%Y%m%d_%H%M%S")
 
 # Weekly layout -> replaced by date-based layout
@@ -42,6 +79,10 @@ echo "Script dir: ${SCRIPT_DIR}"
 echo "Timestamp : ${TIMESTAMP}"
 echo "Run ID    : ${WEEK_ID}"
 echo "Run root  : ${WEEK_DIR}"
+echo "Incremental: ${WPP_INCREMENTAL} (force: ${WPP_FORCE})"
+echo "Jobs      : ${WPP_JOBS}"
+echo "Metrics   : ${WPP_METRICS}"
+echo "In-process: ${WPP_IN_PROCESS}"
 
 # Ensure venv exists
 if [ ! -d "${VENV_DIR}" ]; then
@@ -81,25 +122,17 @@ if [ -f "${REQUIREMENTS}" ]; then
   "$PYTHON" -m pip install -r "${REQUIREMENTS}"
 fi
 
-# Download sheets into week data dir (if sheets file exists)
+# Download sheets into week data dir (if sheets file exists).
+# Concurrent, retried and conditional (ETag/Last-Modified/content hash); see scripts/wpp/download.py.
+# A sheet that fails falls back to its last cached copy; if none exists the run continues without it.
 if [ -f "${SHEETS_LIST}" ]; then
   echo "Downloading sheets -> ${WEEK_DATA_DIR}"
-  while IFS=, read -r fname url || [ -n "${fname:-}" ]; do
-    fname="$(echo "${fname:-}" | xargs)"
-    url="$(echo "${url:-}" | xargs)"
-    [ -z "${fname}" ] || [ -z "${url}" ] && continue
-    out="${WEEK_DATA_DIR}/${fname}"
-    echo "  -> ${fname}"
-    tmp="$(mktemp -u)/${fname}.${TIMESTAMP}.tmp"
-    mkdir -p "$(dirname "${tmp}")"
-    if curl -fsSL "${url}" -o "${tmp}"; then
-      mv "${tmp}" "${out}"
-    else
-      echo "ERROR: failed to download ${url}" >&2
-      rm -f "${tmp}" || true
-      exit 1
-    fi
-  done < "${SHEETS_LIST}"
+  (cd "${SCRIPTS_DIR}" && "${PYTHON}" -m wpp.download \
+      --sheets "${SHEETS_LIST}" \
+      --out "${WEEK_DATA_DIR}" \
+      --cache-dir "${WPP_CACHE_DIR}/downloads" \
+      --workers "${DOWNLOAD_WORKERS:-4}") \
+    || echo "WARNING: some sheets could not be downloaded — see report above" >&2
 else
   echo "No ${SHEETS_LIST} — skipping downloads."
 fi
@@ -110,27 +143,17 @@ for d in "${TOP_OUTPUT_DIRS[@]}"; do
 done
 echo "Created top-level output dirs under ${WEEK_DIR}"
 
-# Run scripts — ALWAYS use the venv python to run the script file by absolute path
+# Run scripts as a dependency graph (scripts/wpp/pipeline.py): independent stages run
+# concurrently with the venv python and CWD=WEEK_DIR, stages with unchanged inputs are
+# skipped (their outputs are copied over from the last run, in any week folder), and a
+# failed stage blocks only the stages that depend on it.
 echo "Running scripts from ${SCRIPTS_DIR} with CWD=${WEEK_DIR} ..."
-shopt -s nullglob
-script_list=("${SCRIPTS_DIR}"/*.py)
-shopt -u nullglob
-
-if [ ${#script_list[@]} -eq 0 ]; then
-  echo "No scripts found in ${SCRIPTS_DIR}/*.py — nothing to run."
-else
-  for script in "${script_list[@]}"; do
-    SCRIPT_PATH="$(realpath "${script}")"
-    name="$(basename "${script}")"
-    logfile="${LOG_DIR}/${name%.*}_${TIMESTAMP}.log"
-    echo "-> ${name} (log: ${logfile})"
-
-    # run via "$PYTHON" so shebang/env differences don't matter
-    (cd "${WEEK_DIR}" && "${PYTHON}" "${SCRIPT_PATH}") > "${logfile}" 2>&1 || echo "Script ${name} failed — see ${logfile}"
-
-    echo "   ${name} completed"
-  done
+PIPELINE_ARGS=(--week-dir "${WEEK_DIR}" --log-dir "${LOG_DIR}" --timestamp "${TIMESTAMP}" --python "${PYTHON}")
+if [ -n "${STAGE_WORKERS:-}" ]; then
+  PIPELINE_ARGS+=(--workers "${STAGE_WORKERS}")
 fi
+PIPELINE_STATUS=0
+(cd "${SCRIPTS_DIR}" && "${PYTHON}" -m wpp.pipeline "${PIPELINE_ARGS[@]}") || PIPELINE_STATUS=$?
 
 # Post-run diagnostics
 echo "=== RUN COMPLETE ==="
@@ -147,4 +170,9 @@ echo "Tail of script logs (last 200 lines of each):"
 for f in "${LOG_DIR}"/*.log; do
   echo "---- ${f} ----"
   tail -n 200 "${f}" || true
-done
\ No newline at end of file
+done
+
+if [ "${PIPELINE_STATUS}" -ne 0 ]; then
+  echo "Pipeline finished with failed stages — see the timing report above." >&2
+fi
+exit "${PIPELINE_STATUS}"
@@ -1,81 +1,236 @@
-#!/usr/bin/env bash
+#!/usr/bin/env python3
+"""
+Fetch the latest ASCT+B tables from the HRA collection and extract every AS/CT/biomarker id.
+
+The table purls are versioned (.../asct-b/<organ>/<version>), so each response is
+cached on disk under $WPP_CACHE_DIR/hra/ and only new versions are downloaded.
+Tables are fetched concurrently over pooled sessions.
+
+Records are extracted as a stream: each item is deduplicated on arrival against a
+set of (organ, id, type, label) keys, kept in column buffers (organ and type as
+integer codes) and written to the CSV in chunks.
+
+    --offline [DIR]  read the collection and tables from a snapshot folder (default: the
+                     cache folder) instead of the network
+    --parquet PATH   also write the records as Parquet (organ/type as dictionary columns)
+"""
+import argparse
+import json
+import os
+import re
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import numpy as np
 import pandas as pd
-import requests
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from wpp.asctb_index import load_index
+from wpp.download import atomic_write, fetch
+
+HRA_COLLECTION_PURL = "https://purl.humanatlas.io/collection/hra"
+CACHE_DIR = os.environ.get("WPP_CACHE_DIR", "./.cache")
+HRA_CACHE_DIR = os.path.join(CACHE_DIR, "hra")
+MAX_WORKERS = 8
+OUTPUT_CSV = "./data/all_asctb_ids_and_types.csv"
+VERSION_RE = re.compile(r"^v\d")
 
 
 def fetch_json(purl):
-    response = requests.get(purl, headers={"Accept": "application/json"})
+    response, _ = fetch(purl, {"Accept": "application/json"}, timeout=120, retries=3, backoff=1.0)
     response.raise_for_status()
     return response.json()
 
 
+def purl_cache_path(cache_dir, purl):
+    """https://purl.humanatlas.io/asct-b/kidney/v1.5 -> <cache_dir>/asct-b/kidney/v1.5.json"""
+    parts = [p for p in urlparse(purl).path.split("/") if p]
+    return os.path.join(cache_dir, *parts) + ".json"
+
+
+def read_json(path):
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def write_json(path, data):
+    atomic_write(path, json.dumps(data).encode("utf-8"))
+
+
+def fetch_cached_json(purl, cache_dir, offline=False):
+    """
+    Return (data, source). Versioned purls never change, so a cached copy is reused;
+    unversioned ones (the collection) are always refreshed unless offline.
+    """
+    path = purl_cache_path(cache_dir, purl)
+    versioned = bool(VERSION_RE.match(purl.rstrip("/").split("/")[-1]))
+    if os.path.exists(path) and (offline or versioned):
+        return read_json(path), "cache"
+    if offline:
+        raise FileNotFoundError(f"{purl} is not in the snapshot folder {cache_dir} ({path})")
+    data = fetch_json(purl)
+    write_json(path, data)
+    return data, "network"
+
+
 def is_asctb_table(purl):
     return (
         purl.startswith("https://purl.humanatlas.io/asct-b/")
         and "crosswalk" not in purl
     )
 
-def get_latest_asctb_data():
-    hra_collection = fetch_json("https://purl.humanatlas.io/collection/hra")
+def get_latest_asctb_data(cache_dir=HRA_CACHE_DIR, offline=False, workers=MAX_WORKERS):
+    hra_collection, _ = fetch_cached_json(HRA_COLLECTION_PURL, cache_dir, offline)
     digital_objects = hra_collection["metadata"]["had_member"]
+    purls = sorted(filter(is_asctb_table, digital_objects))
+
+    # bounded concurrency; results come back in purl order
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(lambda p: fetch_cached_json(p, cache_dir, offline), purls))
+
     tables = {}
-    for purl in sorted(filter(is_asctb_table, digital_objects)):
+    sources = {"cache": 0, "network": 0}
+    for purl, (table_data, source) in zip(purls, results):
         table_name = purl.split("/")[-2].replace('-', '_')
-        table_data = fetch_json(purl)
-        table_rows = table_data["data"]["asctb_record"]
-        tables[table_name] = table_rows
+        tables[table_name] = table_data["data"]["asctb_record"]
+        sources[source] += 1
+    print(f"ASCT+B tables: {sources['network']} downloaded, {sources['cache']} from cache ({cache_dir})")
     return tables
 
 def format_term(s):
     return s.replace("https://purl.org/ccf/ASCTB-TEMP_", "ASCTB-TEMP:")
 
-def extract_all_ids_and_types(tables):
-    records = []
+# (record list, cf_asctb_type) in output order; the type is stored as its index here
+ITEM_LISTS = [
+    ("anatomical_structure_list", "AS"),
+    ("cell_type_list", "CT"),
+    ("gene_marker_list", "B (gene)"),
+    ("protein_marker_list", "B (protein)"),
+]
+ASCTB_TYPES = [t for _, t in ITEM_LISTS]
+OUTPUT_COLUMNS = ["organ", "id", "cf_asctb_type", "label"]
+CHUNK_ROWS = 50_000
+
+
+class RecordBuffer:
+    """
+    Column buffers for extracted records: organ and cf_asctb_type as small integer
+    codes, id and label as plain string lists.
+    """
 
-    for organ_name, rows in tables.items():
+    def __init__(self, organs):
+        self.organs = list(organs)
+        self.organ_codes = array("h")
+        self.type_codes = array("b")
+        self.ids = []
+        self.labels = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def append(self, organ_code, term_id, type_code, label):
+        self.organ_codes.append(organ_code)
+        self.type_codes.append(type_code)
+        self.ids.append(term_id)
+        self.labels.append(label)
+
+    def to_frame(self):
+        return pd.DataFrame({
+            "organ": pd.Categorical.from_codes(np.frombuffer(self.organ_codes, dtype=np.int16), self.organs),
+            "id": self.ids,
+            "cf_asctb_type": pd.Categorical.from_codes(np.frombuffer(self.type_codes, dtype=np.int8), ASCTB_TYPES),
+            "label": self.labels,
+        })
+
+    def clear(self):
+        self.organ_codes = array("h")
+        self.type_codes = array("b")
+        self.ids = []
+        self.labels = []
+
+
+def iter_unique_records(tables):
+    """
+    Yield (organ code, id, type code, label) for every AS/CT/biomarker item, in table
+    order, skipping any (organ, id, type, label) already seen.
+    """
+    seen = set()
+    for organ_code, rows in enumerate(tables.values()):
         for record in rows:
-            # --- Anatomical Structures ---
-            for item in record.get("anatomical_structure_list", []):
-                records.append({
-                    "organ": organ_name,
-                    "id": format_term(item["source_concept"]),
-                    "cf_asctb_type": "AS",
-                    "label": item["ccf_pref_label"]
-                })
-            # --- Cell Types ---
-            for item in record.get("cell_type_list", []):
-                records.append({
-                    "organ": organ_name,
-                    "id": format_term(item["source_concept"]),
-                    "cf_asctb_type": "CT",
-                    "label": item["ccf_pref_label"]
-                })
-            # --- Gene Biomarkers ---
-            for item in record.get("gene_marker_list", []):
-                records.append({
-                    "organ": organ_name,
-                    "id": format_term(item["source_concept"]),
-                    "cf_asctb_type": "B (gene)",
-                    "label": item["ccf_pref_label"]
-                })
-            # --- Protein Biomarkers ---
-            for item in record.get("protein_marker_list", []):
-                records.append({
-                    "organ": organ_name,
-                    "id": format_term(item["source_concept"]),
-                    "cf_asctb_type": "B (protein)",
-                    "label": item["ccf_pref_label"]
-                })
-
-    df = pd.DataFrame(records).drop_duplicates().reset_index(drop=True)
-    return df
-
-tables = get_latest_asctb_data()
-print("Fetched", len(tables), "ASCT+B tables")
-
-df_all_ids = extract_all_ids_and_types(tables)
-print("Extracted", len(df_all_ids), "unique entries across all organs.")
-print(df_all_ids.head())
-
-# Optional: Save to CSV
-df_all_ids.to_csv("./data/all_asctb_ids_and_types.csv", index=False)
+            for type_code, (list_name, _) in enumerate(ITEM_LISTS):
+                for item in record.get(list_name, []):
+                    key = (organ_code, format_term(item["source_concept"]), type_code, item["ccf_pref_label"])
+                    if key not in seen:
+                        seen.add(key)
+                        yield key
+
+
+def extract_all_ids_and_types(tables):
+    buffer = RecordBuffer(tables)
+    for key in iter_unique_records(tables):
+        buffer.append(*key)
+    return buffer.to_frame()
+
+
+def write_all_ids_and_types(tables, csv_path, parquet_path=None, chunk_rows=CHUNK_ROWS):
+    """
+    Stream the unique records to csv_path (and optionally parquet_path), flushing every
+    chunk_rows records. Returns (record count, first rows).
+    """
+    buffer = RecordBuffer(tables)
+    parquet_writer = None
+    total = 0
+    head = None
+
+    def flush():
+        nonlocal parquet_writer, total, head
+        chunk = buffer.to_frame()
+        chunk.to_csv(csv_path, index=False, header=total == 0, mode="w" if total == 0 else "a")
+        if parquet_path:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if parquet_writer is None:
+                parquet_writer = pq.ParquetWriter(parquet_path, table.schema)
+            parquet_writer.write_table(table)
+        if head is None:
+            head = chunk.head()
+        total += len(chunk)
+        buffer.clear()
+
+    for key in iter_unique_records(tables):
+        buffer.append(*key)
+        if len(buffer) >= chunk_rows:
+            flush()
+    if len(buffer) or total == 0:
+        flush()
+    if parquet_writer is not None:
+        parquet_writer.close()
+    return total, head
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract all ids and types from the latest HRA ASCT+B tables.")
+    parser.add_argument("--offline", nargs="?", const=HRA_CACHE_DIR, default=None, metavar="DIR",
+                        help="Read from a snapshot folder (default: the cache folder) instead of the network.")
+    parser.add_argument("--cache-dir", default=HRA_CACHE_DIR, help="Response cache folder.")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Concurrent table downloads.")
+    parser.add_argument("--parquet", help="Also write the records to this Parquet file.")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Records buffered per write.")
+    args = parser.parse_args()
+
+    if args.offline:
+        tables = get_latest_asctb_data(args.offline, offline=True, workers=args.workers)
+    else:
+        tables = get_latest_asctb_data(args.cache_dir, workers=args.workers)
+    print("Fetched", len(tables), "ASCT+B tables")
+
+    total, head = write_all_ids_and_types(tables, OUTPUT_CSV, args.parquet, args.chunk_rows)
+    print("Extracted", total, "unique entries across all organs.")
+    print(head)
+
+    # prebuild the lookup index 04 and 06 load
+    index = load_index(OUTPUT_CSV, rebuild=True)
+    print(f"Indexed {len(index.by_id)} unique ids for 04/06.")
+
+if __name__ == "__main__":
+    main()
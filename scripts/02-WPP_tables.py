@@ -1,9 +1,24 @@
 #!/usr/bin/env python3
+import argparse
+import numpy as np
 import pandas as pd
-import glob
 import os
 import re
 import sys
+import time
+
+from wpp.cube import cube_dir, load_cube
+from wpp.facts import combine_facts, facts_path as facts_file, write_facts
+from wpp.incremental import StageCache
+from wpp import loader
+from wpp.loader import (
+    header_row_for, iter_chunks, list_tables, load_columns, load_table, print_load_report, sniff_header,
+)
+from wpp.parallel import add_jobs_argument, print_timing, run_per_file
+from wpp.vocab import (
+    SPATIAL_TYPE_DTYPE, SPATIAL_TYPES, TIME_RANGE_DTYPE, TIME_RANGES, category_codes, spatial_types, time_keys,
+    time_masks,
+)
 
 INPUT_FOLDER = "./data/WPP Input Tables/"   # root folder containing CSV files (will search recursively)
 OUTPUT_FOLDER = "./temporal_spatial_output/"
@@ -14,68 +29,6 @@ TIME_COLUMNS = [
     "1 week - < 1 year", "1 year or longer",
 ]
 
-TIME_MAPPING = {
-    "milliseconds": ["<1 second"], "seconds": ["1s - < 1min"], "secondsminutes": ["1s - < 1min", "1min - < 1hr"],
-    "minuteshours": ["1min - < 1hr", "1hr - < 1day"], "hoursdays": ["1hr - < 1day", "1day - < 1week"],
-    "daysweeks": ["1day - < 1week", "1 week - < 1 year"], "hours": ["1hr - < 1day"], "minutes": ["1min - < 1hr"],
-    "days": ["1day - < 1week"], "nan": ["Unknown"],
-    "weeks": ["1 week - < 1 year"], "months": ["1 week - < 1 year"], "years": ["1 year or longer"],
-    "weeksmonths": ["1 week - < 1 year"], "minuteshoursdays": ["1min - < 1hr", "1hr - < 1day", "1day - < 1week"],
-    "hoursdaysweeksmonths": ["1hr - < 1day", "1day - < 1week", "1 week - < 1 year"],
-    "secondsminuteshours": ["1s - < 1min", "1min - < 1hr", "1hr - < 1day"],
-    "milisecondsseconds": ["<1 second", "1s - < 1min"], "secondshours": ["1s - < 1min", "1min - < 1hr", "1hr - < 1day"],
-    "continuous": ["continuous"], "variable": ["variable"],
-}
-
-SPATIAL_MAPPING = {
-    "tissue": "AS",
-    "tissueftu": "FTU",
-    "cell": "CT",
-    "organ": "Organ",
-    "organsystem": "Organ",
-    "biomolecule": "B",
-    "molecule": "B",
-    "subcellular": "Unknown",
-    "organism": "Unknown",
-    "nan": "Unknown",
-    "": "Unknown"
-}
-
-time_category_order = [
-    "<1 second", "1s - < 1min", "1min - < 1hr", "1hr - < 1day",
-    "1day - < 1week", "1 week - < 1 year", "1 year or longer",
-    "continuous", "variable"
-]
-
-ftu_ids = {
-    "UBERON:0004203",
-    "UBERON:0001289",
-    "UBERON:0004205",
-    "UBERON:0004193",
-    "UBERON:0001285",
-    "UBERON:0004204",
-    "UBERON:0001229",
-    "UBERON:0001291",
-    "UBERON:0004647",
-    "UBERON:0002299",
-    "UBERON:8410043",
-    "UBERON:0000006",
-    "UBERON:0001263",
-    "UBERON:0014725",
-    "UBERON:0004179",
-    "UBERON:0001983",
-    "UBERON:0000412",
-    "UBERON:0002073",
-    "UBERON:0013487",
-    "UBERON:0001213",
-    "UBERON:0001250",
-    "UBERON:0001959",
-    "UBERON:0002125",
-    "UBERON:0001831",
-    "UBERON:0001832",
-    "UBERON:0001736",
-}
-
 def find_col_case_insensitive(columns, candidates):
     """
     Return first matching column name from 'columns' for any candidate (case-insensitive), or None.
@@ -88,72 +41,49 @@ def find_col_case_insensitive(columns, candidates):
             return lowered[cand.lower()]
     return None
 
-def clean_effector_id(eff_id):
+FUNCTION_COL_RE = re.compile(r"Function/(\d+)$")
+LOWEST_FUNCTION_FALLBACK_COLS = ["Lowest Function", "Lowest_Function", "LowestFunction"]
+EFFECTOR_ID_CANDIDATES = ["Effector/ID","Effector ID","Effector_ID","Effector/Id","Effector/identifier","EffectorID"]
+EFFECTOR_SCALE_CANDIDATES = ["EffectorScale","Effector Scale","Effector_Scale","Scale"]
+
+def resolve_function_columns(columns):
+    """
+    Return the Function/N columns (not Function/N/LABEL or /ID) ordered by N.
+    Resolved once per table instead of once per row.
+    """
+    found = []
+    for col in columns:
+        m = FUNCTION_COL_RE.match(col.strip())
+        if m:
+            found.append((int(m.group(1)), col))
+    found.sort(key=lambda t: t[0])
+    return [col for _, col in found]
+
+def is_filled(arr):
+    """Boolean mask of cells in a stripped string array that hold a real value."""
+    return (arr != "") & (np.char.lower(arr) != "nan")
+
+def lowest_function_column(df):
     """
-    Normalize an Effector/ID value so it can be matched to ftu_ids.
-    - extracts a 'UBERON:NNNN' token if present (case-insensitive),
-    - strips common wrappers, removes URLs, then uppercases fallback string.
-    - returns None if nothing meaningful.
+    Vectorized Lowest_Function: the last non-empty Function/N value of each row,
+    or "Unknown" when the row has none.
     """
-    if pd.isna(eff_id):
-        return None
-    s = str(eff_id).strip()
-    if not s:
-        return None
-    # extract UBERON token if present
-    m = re.search(r"(UBERON:\d+)", s, flags=re.IGNORECASE)
-    if m:
-        return m.group(1).upper()
-    # remove urls and surrounding punctuation then uppercase
-    s2 = re.sub(r"https?://\S+", "", s)
-    s2 = re.sub(r"[<>()\[\]{}\"']", "", s2)
-    s2 = s2.strip()
-    return s2.upper() if s2 else None
-
-def normalize_time(val):
-    if pd.isna(val):
-        return "nan"
-    s = str(val).lower()
-    s = re.sub(r"[–—\-\s,]+", "", s)
-    return s
-
-def normalize_spatial(val, effector_id=None):
-    val_str = str(val).strip() if pd.notna(val) else ""
-    if val_str == "":
-        return SPATIAL_MAPPING.get("nan", "Unknown")
-
-    v = re.sub(r"[^a-z0-9]", "", val_str.lower())
-
-    if v == "tissueftu":
-        return "FTU"
-    if v.startswith("tissue"):
-        eff_id_str = str(effector_id).strip() if pd.notna(effector_id) else ""
-        if eff_id_str.upper() in ftu_ids or clean_effector_id(eff_id_str) in ftu_ids:
-            return "FTU"
-        return "AS"
-
-    return SPATIAL_MAPPING.get(v, "Unknown")
-
-def get_lowest_function(row):
-    lowest_func = ""
-    function_cols = [col for col in row.index if re.match(r"Function/\d+$", col.strip())]
+    function_cols = resolve_function_columns(df.columns)
     if not function_cols:
-        # heuristics: look for "Lowest Function" column or "Lowest_Function"
-        for cand in ["Lowest Function", "Lowest_Function", "LowestFunction"]:
-            if cand in row.index:
-                val = str(row.get(cand, "")).strip()
-                if pd.notna(val) and val != "" and val.lower() != "nan":
-                    return val
-        return "Unknown"
-
-    function_cols.sort(key=lambda c: int(re.search(r"\d+", c).group()))
-    # iterate and keep the last non-empty (matches your previous behavior)
-    last_val = ""
-    for col in function_cols:
-        val = row.get(col, "")
-        if pd.notna(val) and str(val).strip().lower() not in {"", "nan"}:
-            last_val = str(val).strip()
-    return last_val if last_val else "Unknown"
+        # heuristics: look for "Lowest Function" column or "Lowest_Function" (first filled candidate wins)
+        result = np.full(len(df), "Unknown", dtype=object)
+        for cand in reversed(LOWEST_FUNCTION_FALLBACK_COLS):
+            if cand in df.columns:
+                vals = np.char.strip(df[cand].fillna("").astype(str).to_numpy(dtype=str))
+                result = np.where(is_filled(vals), vals, result)
+        return pd.Series(result, index=df.index, dtype=object)
+
+    values = np.char.strip(df[function_cols].fillna("").astype(str).to_numpy(dtype=str))
+    filled = is_filled(values)
+    # index of the last filled Function/N column per row
+    last = values.shape[1] - 1 - filled[:, ::-1].argmax(axis=1)
+    lowest = values[np.arange(len(values)), last]
+    return pd.Series(np.where(filled.any(axis=1), lowest, "Unknown"), index=df.index, dtype=object)
 
 # split Process cell on ';' into fragments
 def split_processes_cell(proc_cell):
@@ -174,84 +104,161 @@ def split_processes_cell(proc_cell):
         if p and p.strip() and p.strip().lower() not in {"nan", "none", "null"}
     ]
 
-def make_function_at_process(lowest_function, process_fragment):
-    if process_fragment is None:
-        return None
-
-    pf = str(process_fragment).strip()
-    if pf == "":
-        return None
-
-    lf = str(lowest_function).strip() if pd.notna(lowest_function) else ""
-
-    if lf.lower() != "unknown" and lf != "":
-        return f"{lf}@{pf}"
+def function_at_process_column(lowest_function, process_fragment):
+    """
+    Vectorized "<Lowest_Function>@<process fragment>" builder; rows with an Unknown/empty
+    function keep just the fragment, rows without a fragment become None.
+    """
+    pf = process_fragment.fillna("").astype(str).str.strip()
+    lf = lowest_function.fillna("").astype(str).str.strip()
+    has_function = (lf != "") & (lf.str.lower() != "unknown")
+    combined = (lf + "@" + pf).where(has_function, pf)
+    return combined.where(pf != "", None)
+
+def table_columns(header):
+    """The columns of a table with this header that table_fragments reads, in header order."""
+    used = resolve_function_columns(header) or [c for c in LOWEST_FUNCTION_FALLBACK_COLS if c in header]
+    used += ["TimeScale", "Process",
+             find_col_case_insensitive(header, EFFECTOR_ID_CANDIDATES),
+             find_col_case_insensitive(header, EFFECTOR_SCALE_CANDIDATES)]
+    return [c for c in header if c in used]
+
+def table_fragments(MAIN_CSV_PATH, header_row=None):
+    """
+    One row per Process fragment of a table: Function@Process, TimeScale_norm and
+    Spatial_Type (rows without a process are dropped).
+    """
+    if loader.PROJECT:
+        # only the columns used below; the ones empty in every row come back as NaN
+        # so the column choices are those of a full read
+        columns = table_columns(sniff_header(MAIN_CSV_PATH, header_row))
+        main = load_columns(MAIN_CSV_PATH, columns, header_row=header_row, categorical=False).reindex(columns=columns)
     else:
-        return pf
-
-def process_and_save_single(MAIN_CSV_PATH, OUTPUT_PATH, header_row=11):
-    # read with given header row (0-indexed)
-    main = pd.read_csv(MAIN_CSV_PATH, header=header_row, encoding="utf-8-sig")
-    # strip whitespace from column names
-    main.columns = main.columns.str.strip()
-
-    # compute Lowest_Function
-    main["Lowest_Function"] = main.apply(get_lowest_function, axis=1)
+        # parsed once per run via the shared loader (headers already stripped)
+        main = load_table(MAIN_CSV_PATH, header_row=header_row)
+    return frame_fragments(main)
+
+def frame_fragments(main):
+    """Fragments (see table_fragments) of a parsed table, or of a row chunk of one."""
+    # row-level columns are computed column-wise on the un-exploded table
+    main["Lowest_Function"] = lowest_function_column(main)
+
+    # TimeScale normalization (once per distinct value, carried as categorical codes)
+    timescale = main["TimeScale"] if "TimeScale" in main.columns else pd.Series(np.nan, index=main.index, dtype=object)
+    main["TimeScale_norm"] = time_keys(timescale)
+
+    # compute Spatial_Type - prefer explicit 'EffectorScale' column, otherwise check candidate names
+    effector_id_col = find_col_case_insensitive(main.columns, EFFECTOR_ID_CANDIDATES)
+    effector_scale_col = find_col_case_insensitive(main.columns, EFFECTOR_SCALE_CANDIDATES)
+    # Unknown spatial types are NaN; without an effector scale column every row is Unknown
+    if effector_scale_col is None:
+        main["Spatial_Type"] = pd.Series(np.nan, index=main.index, dtype=SPATIAL_TYPE_DTYPE)
+    else:
+        main["Spatial_Type"] = spatial_types(
+            main[effector_scale_col],
+            main[effector_id_col] if effector_id_col else None,
+        )
 
     # split Process into list fragments
-    main["Process_List"] = main.get("Process", pd.Series([""] * len(main))).apply(split_processes_cell)
+    main["Process_List"] = main.get("Process", pd.Series([""] * len(main), index=main.index)).apply(split_processes_cell)
 
-    # explode so each process fragment gets its own row
-    exploded = main.explode("Process_List").copy()
+    # explode so each process fragment gets its own row (only the columns still needed)
+    exploded = main[["Lowest_Function", "Process_List", "TimeScale_norm", "Spatial_Type"]].explode("Process_List")
 
     # build Function@Process
-    exploded["Function@Process"] = exploded.apply(
-    lambda r: make_function_at_process(
-        str(r.get("Lowest_Function", "")),
-        str(r.get("Process_List", "")) if pd.notna(r.get("Process_List", "")) else ""
-    ),
-    axis=1
-    )
+    exploded["Function@Process"] = function_at_process_column(exploded["Lowest_Function"], exploded["Process_List"])
 
     # drop rows where Function@Process is None or empty (missing processes)
     exploded = exploded[exploded["Function@Process"].notna() & (exploded["Function@Process"].astype(str).str.strip() != "")]
+    exploded["Function@Process"] = exploded["Function@Process"].astype(str).str.strip()
+    return exploded[["Function@Process", "TimeScale_norm", "Spatial_Type"]]
 
-    # normalize TimeScale and Spatial_Type on exploded rows
-    # find effector id column case-insensitively once per file
-    effector_id_col = find_col_case_insensitive(exploded.columns, ["Effector/ID","Effector ID","Effector_ID","Effector/Id","Effector/identifier","EffectorID"])
-    # apply TimeScale normalization
-    if "TimeScale" in exploded.columns:
-        exploded["TimeScale_norm"] = exploded["TimeScale"].apply(normalize_time)
-    else:
-        exploded["TimeScale_norm"] = "nan"
-
-    # compute Spatial_Type - try common columns
-    # prefer explicit 'EffectorScale' column, otherwise check candidate names
-    effector_scale_col = find_col_case_insensitive(exploded.columns, ["EffectorScale","Effector Scale","Effector_Scale","Scale"])
-    # If no explicit effector scale column, set as nan to map to Unknown
-    if effector_scale_col is None:
-        exploded["Spatial_Type"] = SPATIAL_MAPPING.get("nan", "Unknown")
-    else:
-        if effector_id_col:
-            exploded["Spatial_Type"] = exploded.apply(lambda r: normalize_spatial(r.get(effector_scale_col, ""), r.get(effector_id_col, "")), axis=1)
-        else:
-            exploded["Spatial_Type"] = exploded[effector_scale_col].apply(lambda v: normalize_spatial(v, None))
+def fragment_masks(fragments):
+    """
+    The time ranges of every fragment as a bitmask (TIME_MASKS): Spatial_Type,
+    Function@Process and mask of the fragments that can reach the pivot (the
+    Unknown spatial type and fragments without a known time range cannot).
+    """
+    masks = time_masks(fragments["TimeScale_norm"])
+    keep = (masks != 0) & fragments["Spatial_Type"].notna().to_numpy()
+    return pd.DataFrame({
+        "Spatial_Type": fragments["Spatial_Type"][keep],
+        "Function@Process": fragments["Function@Process"][keep],
+        "mask": masks[keep],
+    })
+
+def masks_to_facts(masks):
+    """
+    Facts from fragment masks (fragment_masks, or several of them concatenated): the
+    masks are OR-ed into a Spatial_Type x Function@Process grid and only expanded to
+    one row per time range at the end, so the fragments are never exploded per range.
+    """
+    # sorted codes: reading the grid in index order yields the facts already sorted
+    # (spatial types by name, as the facts have always been ordered)
+    spatial_type = masks["Spatial_Type"]
+    if isinstance(spatial_type.dtype, pd.CategoricalDtype):
+        spatial_type = spatial_type.cat.reorder_categories(sorted(spatial_type.cat.categories))
+    sp_codes, spatial = pd.factorize(spatial_type, sort=True)
+    fp_codes, entries = pd.factorize(masks["Function@Process"], sort=True)
+    covered = np.zeros((len(spatial), len(entries)), dtype=np.uint16)
+    np.bitwise_or.at(covered, (sp_codes, fp_codes), masks["mask"].to_numpy(dtype=np.uint16))
+
+    # a cell whose only entry is "Unknown" is dropped: the Unknown entry keeps only the
+    # time ranges where its spatial type has other entries
+    unknown = np.flatnonzero(entries == "Unknown")
+    if len(unknown):
+        others = covered.copy()
+        others[:, unknown] = 0
+        covered[:, unknown] &= np.bitwise_or.reduce(others, axis=1)[:, None]
+
+    # one row per set bit, time range first
+    parts = [np.nonzero(covered & (1 << t)) for t in range(len(TIME_RANGES))]
+    time_idx = np.concatenate([np.full(len(sp), t) for t, (sp, _) in enumerate(parts)]).astype(np.int64)
+    sp_idx = np.concatenate([sp for sp, _ in parts]).astype(np.int64)
+    fp_idx = np.concatenate([fp for _, fp in parts]).astype(np.int64)
+    return pd.DataFrame({
+        "time_range": np.array(TIME_RANGES, dtype=object)[time_idx],
+        "spatial_type": np.asarray(spatial, dtype=object).take(sp_idx),
+        "function_process": entries.take(fp_idx),
+    }).astype(str)
+
+def fragments_to_facts(fragments):
+    """Facts of a table from its fragments (fragment_masks, then masks_to_facts)."""
+    return masks_to_facts(fragment_masks(fragments))
+
+def streamed_masks(MAIN_CSV_PATH, header_row=None):
+    """
+    fragment_masks of a table read in row chunks of about WPP_STREAM_MB (wpp.loader.iter_chunks):
+    each chunk is reduced to its distinct (Spatial_Type, Function@Process, mask) rows, so
+    only those partial aggregates - not the table or its fragments - are held at once.
+    """
+    columns = table_columns(sniff_header(MAIN_CSV_PATH, header_row)) if loader.PROJECT else None
+    partials = [
+        fragment_masks(frame_fragments(chunk)).drop_duplicates()
+        for chunk in iter_chunks(MAIN_CSV_PATH, header_row=header_row, columns=columns)
+    ]
+    if not partials:
+        partials = [pd.DataFrame(columns=["Spatial_Type", "Function@Process", "mask"])]
+    return pd.concat(partials, ignore_index=True).drop_duplicates()
 
-    # Map time scales that expand to multiple TIME_MAPPING entries
-    exploded["Time Range"] = exploded["TimeScale_norm"].apply(lambda x: TIME_MAPPING.get(x, ["Unknown"]))
-    exploded = exploded.explode("Time Range")
+def build_spatial_temporal_facts(MAIN_CSV_PATH, header_row=None):
+    """
+    Return the facts of one table: one row per unique (time_range, spatial_type,
+    function_process) that ends up in its spatial-temporal pivot.
+    """
+    if loader.STREAM_MB:
+        return masks_to_facts(streamed_masks(MAIN_CSV_PATH, header_row=header_row))
+    return fragments_to_facts(table_fragments(MAIN_CSV_PATH, header_row=header_row))
 
-    # Now group by Time Range + Spatial_Type and collect unique Function@Process entries
+def facts_to_pivot(facts):
+    """Render one table's facts as the Time Range x Spatial_Type pivot of "? "-joined entries."""
     grouped = (
-        exploded.groupby(["Time Range", "Spatial_Type"])["Function@Process"]
-        .apply(lambda s: "? ".join(sorted(set(ss.strip() for ss in s.dropna() if str(ss).strip()))))
+        facts.groupby(["time_range", "spatial_type"])["function_process"]
+        .apply(lambda s: "? ".join(sorted(s)))
         .reset_index(name="Function@Process")
+        .rename(columns={"time_range": "Time Range", "spatial_type": "Spatial_Type"})
     )
 
-    # drop empty/Unknown groups (same as before)
-    grouped = grouped[grouped["Function@Process"] != ""]
-    grouped = grouped[grouped["Function@Process"] != "Unknown"]
-
     # pivot into spatial x temporal table
     pivot = grouped.pivot(
         index="Time Range",
@@ -263,34 +270,85 @@ def process_and_save_single(MAIN_CSV_PATH, OUTPUT_PATH, header_row=11):
     if "Unknown" in pivot.columns:
         pivot = pivot.drop(columns=["Unknown"])
 
-    desired_spatial_types = ["Organ", "AS", "FTU", "CT", "B"]
-    for t in desired_spatial_types:
+    for t in SPATIAL_TYPES:
         if t not in pivot.columns:
             pivot[t] = ""
 
     # Ensure desired ordering of time rows
-    pivot = pivot.set_index("Time Range").reindex(time_category_order).fillna("").reset_index()
-    pivot["Time Range"] = pd.Categorical(pivot["Time Range"], categories=time_category_order, ordered=True)
+    pivot = pivot.set_index("Time Range").reindex(TIME_RANGES).fillna("").reset_index()
+    pivot["Time Range"] = pivot["Time Range"].astype(TIME_RANGE_DTYPE)
     pivot = pivot.sort_values("Time Range").reset_index(drop=True)
 
-    final_pivot = pivot[["Time Range"] + desired_spatial_types]
+    final_pivot = pivot[["Time Range"] + SPATIAL_TYPES]
+    return final_pivot
+
+def facts_to_pivots(facts):
+    """
+    Batched facts_to_pivot over a combined fact table (wpp/facts.py): the pivots of all
+    tables in one pass - drop_duplicates, one sort, a "? "-join per cell into a
+    table x time range x spatial type grid - as {table: pivot}.
+    """
+    keys = ["table", "time_range", "spatial_type"]
+    tables = list(facts["table"].cat.categories)
+    entries = facts[keys + ["function_process"]].drop_duplicates()
+    # the categorical keys sort by their codes; entries within a cell end up in sorted() order
+    entries = entries.sort_values(keys + ["function_process"])
+    codes = np.column_stack([
+        entries["table"].cat.codes.to_numpy(),
+        category_codes(entries["time_range"], TIME_RANGE_DTYPE),
+        category_codes(entries["spatial_type"], SPATIAL_TYPE_DTYPE),
+    ]).astype(np.int64)
+    keep = (codes >= 0).all(axis=1)
+    codes = codes[keep]
+    values = entries["function_process"].astype(str).to_numpy()[keep].tolist()
+
+    # first entry of every cell; each cell is a contiguous run of the sorted entries
+    starts = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]).any(axis=1)]) if len(codes) else np.array([], dtype=np.int64)
+    ends = np.r_[starts[1:], len(values)].astype(np.int64)
+    grid = np.full((len(tables), len(TIME_RANGES), len(SPATIAL_TYPES)), "", dtype=object)
+    grid[codes[starts, 0], codes[starts, 1], codes[starts, 2]] = [
+        "? ".join(values[a:b]) for a, b in zip(starts, ends)
+    ]
+
+    pivots = {}
+    for i, table in enumerate(tables):
+        pivot = pd.DataFrame(grid[i], columns=SPATIAL_TYPES)
+        pivot.insert(0, "Time Range", TIME_RANGES)
+        pivots[table] = pivot
+    return pivots
 
-    # Save to CSV
-    final_pivot.to_csv(OUTPUT_PATH, index=False, encoding="utf-8-sig")
+def build_spatial_temporal_table(MAIN_CSV_PATH, header_row=None):
+    """Return the Time Range x Spatial_Type pivot of Function@Process entries for one table."""
+    return facts_to_pivot(build_spatial_temporal_facts(MAIN_CSV_PATH, header_row=header_row))
 
-def main_run():
-    csv_files = sorted(glob.glob(os.path.join(INPUT_FOLDER, "**", "*.csv"), recursive=True))
+def process_and_save_single(MAIN_CSV_PATH, OUTPUT_PATH, header_row=None, cache=None):
+    if cache is None:
+        facts = build_spatial_temporal_facts(MAIN_CSV_PATH, header_row=header_row)
+    else:
+        # incremental mode: the facts of an unchanged table come from the stage cache
+        facts = cache.table_result(MAIN_CSV_PATH, lambda p: build_spatial_temporal_facts(p, header_row=header_row))
+
+    # Save the pivot rendering to CSV
+    facts_to_pivot(facts).to_csv(OUTPUT_PATH, index=False, encoding="utf-8-sig")
+    return facts
+
+def main_run(argv=None):
+    parser = argparse.ArgumentParser(description="Spatial-temporal tables for every WPP table.")
+    add_jobs_argument(parser)
+    parser.add_argument("--batched", action=argparse.BooleanOptionalAction, default=True,
+                        help="Pivot all tables in one pass over the combined facts (default); "
+                             "--no-batched pivots and writes each table in its own task.")
+    args = parser.parse_args(argv)
+
+    csv_files = list_tables(INPUT_FOLDER)
     if not csv_files:
         print("No CSV files found in", INPUT_FOLDER)
         sys.exit(1)
 
+    tasks = []
     for file_path in csv_files:
         file_name = os.path.basename(file_path)
-        # header row heuristic (your previous rule)
-        if "endocrine" in file_name.lower():
-            header_row = 12
-        else:
-            header_row = 11
+        header_row = header_row_for(file_path)
 
         base_noext = os.path.splitext(file_name)[0]
         words = re.findall(r"\w+", base_noext)
@@ -303,14 +361,47 @@ def main_run():
 
         out_name = f"{prefix}_spatial_temporal_table.csv"
         out_path = os.path.join(OUTPUT_FOLDER, out_name)
+        tasks.append((file_path, (file_path, out_path, header_row)))
+
+    # each table is independent: build (+ write, unless batched) in the pool, report in input order
+    cache = StageCache("02-WPP_tables", __file__)
+    start = time.perf_counter()
+    if args.batched:
+        fact_tasks = [(path, (path, header_row)) for path, (path, _, header_row) in tasks]
+        runs = run_per_file(build_spatial_temporal_facts, fact_tasks, jobs=args.jobs, cache=cache)
+    else:
+        runs = run_per_file(process_and_save_single, tasks, jobs=args.jobs, cache=cache)
+    wall = time.perf_counter() - start
 
-        try:
-            process_and_save_single(file_path, out_path, header_row=header_row)
-            print(f"Saved: {out_path}")
-        except Exception as e:
-            print(f"Failed processing {file_name}: {e}")
+    table_facts, out_paths = [], []
+    for (_, (_, out_path, _)), run in zip(tasks, runs):
+        if run["error"] is not None:
+            print(f"Failed processing {run['name']}: {run['error']}")
             continue
-
+        table_facts.append((os.path.basename(out_path), run["result"]))
+        out_paths.append(out_path)
+    # long-format facts of all tables, the input of 07, 08 and 10
+    facts = combine_facts(table_facts)
+
+    if args.batched:
+        # every table's pivot from the one combined pass
+        pivots = facts_to_pivots(facts)
+    for out_path, run in zip(out_paths, (r for r in runs if r["error"] is None)):
+        if args.batched:
+            pivots[os.path.splitext(os.path.basename(out_path))[0]].to_csv(out_path, index=False, encoding="utf-8-sig")
+        elif run["reused"]:
+            # unchanged table: only the write is left to do
+            facts_to_pivot(run["result"]).to_csv(out_path, index=False, encoding="utf-8-sig")
+        print(f"Saved: {out_path}")
+
+    facts_path = write_facts(facts, facts_file(OUTPUT_FOLDER))
+    print(f"Saved: {facts_path}")
+    cube = load_cube(OUTPUT_FOLDER)
+    print(f"Saved: {cube_dir(OUTPUT_FOLDER)} ({' x '.join(str(n) for n in cube.shape)} count cube)")
+
+    cache.save()
+    print_timing(runs, args.jobs, wall)
+    print_load_report()
     print("Done processing all folders.")
 
 if __name__ == "__main__":
@@ -11,9 +11,13 @@ Columns:
 """
 
 import os
-import glob
 import pandas as pd
 import sys 
+
+from wpp.analyzers import empty_cl_partial as empty_partial
+from wpp.engine import print_analyzer_report, table_scan
+from wpp.incremental import StageCache
+from wpp.loader import list_tables, print_load_report
 if hasattr(sys.stdout, "reconfigure"):
     sys.stdout.reconfigure(encoding="utf-8")
 
@@ -21,145 +25,39 @@ input_folder = "./data/WPP Input Tables/"
 output_file = "./analysis/all_CT_statistics/all_CL_ids_in_WPP_by_id.csv"
 os.makedirs(os.path.dirname(output_file), exist_ok=True)
 
-ID_LABEL_PAIRS_CANDIDATES = [
-    # Effector pair variants
-    (["Effector/ID", "Effector ID", "EffectorID", "effector_id", "ID", "id", "AS_ID"],
-     ["Effector/LABEL", "Effector LABEL", "EffectorLabel", "Effector Label", "LABEL", "label", "AS"]),
-    # EffectorLocation pair variants
-    (["EffectorLocation/ID", "EffectorLocation ID", "EffectorLocationID", "effectorlocation_id", "effectorlocationid"],
-     ["EffectorLocation/LABEL", "EffectorLocation LABEL", "EffectorLocationLabel", "Effector Location Label"])
-]
-
-def find_column(df, candidates):
-    """Return first matching column name from df (case-insensitive), or None."""
-    lowered = {c.lower(): c for c in df.columns}
-    for cand in candidates:
-        if cand in df.columns:
-            return cand
-        lc = cand.lower()
-        if lc in lowered:
-            return lowered[lc]
-    return None
-
-def split_cells(cell, sep=";"):
-    """Split on sep and clean whitespace. Returns list of strings (no empty)."""
-    if pd.isna(cell) or cell is None:
-        return []
-    s = str(cell).strip()
-    if s == "":
-        return []
-    parts = [p.strip() for p in s.split(sep)]
-    return [p for p in parts if p]
-
-def is_cl_id(idstr):
-    """True if idstr (string) starts with CL: (case-insensitive)."""
-    if idstr is None:
-        return False
-    return str(idstr).strip().upper().startswith("CL:")
+def scan_cl_file(fp):
+    """CL id -> labels/sources for one input table (CT analyzer of the shared walk)."""
+    try:
+        return table_scan(fp, "CT")
+    except Exception as e:
+        print(f"[WARN] Could not read {os.path.basename(fp)}: {e} -- skipping.")
+        return empty_partial()
 
-def normalize_source_name(fname):
-    """
-    Normalize input table names so the same table is only listed once per ID.
-    - lowercases
-    - strips extension
-    - removes trailing ' - ...' suffix if present
-    - converts underscores to hyphens
-    - strips surrounding whitespace
-    """
-    s = fname.strip().lower()
-    if " - " in s:
-        s = s.split(" - ")[0]
-    s = os.path.splitext(s)[0]
-    s = s.replace("_", "-")
-    s = s.strip()
-    return s
+def merge_partial(total, partial):
+    for cl_id, labels in partial["cl_to_labels"].items():
+        total["cl_to_labels"].setdefault(cl_id, set()).update(labels)
+    for cl_id, sources in partial["cl_to_sources"].items():
+        total["cl_to_sources"].setdefault(cl_id, set()).update(sources)
 
 def collect_cl_ids_dedupe_by_id(input_folder, output_file):
-    files = sorted(glob.glob(os.path.join(input_folder, "*.csv")))
+    files = list_tables(input_folder, recursive=False)
     if not files:
         print(f"[ERROR] No CSV files found in: {input_folder}")
         return
 
-    cl_to_labels = {}   # map CL_ID -> set(labels)
-    cl_to_sources = {}  # map CL_ID -> set(normalized source names)
+    merged = empty_partial()
     per_file_counts = {}
 
+    # per-table scans are reused from the stage cache in incremental mode, then merged
+    cache = StageCache("05-CT_extracts_WPP", __file__)
     for fp in files:
-        fname = os.path.basename(fp)
-        fname_l = fname.lower()
-        # heuristic used in your other scripts
-        header_row = 12 if "endocrine" in fname_l else 11
-
-        # robust read with utf-8-sig fallback
-        try:
-            df = pd.read_csv(fp, dtype=str, header=header_row)
-        except Exception:
-            try:
-                df = pd.read_csv(fp, dtype=str, header=header_row, encoding="utf-8-sig")
-            except Exception as e:
-                print(f"[WARN] Could not read {fname} (header={header_row}): {e} -- skipping.")
-                per_file_counts[fname] = 0
-                continue
-
-        # For each candidate pair, detect actual column names present in this file
-        found_pairs = []
-        for id_cands, label_cands in ID_LABEL_PAIRS_CANDIDATES:
-            id_col = find_column(df, id_cands)
-            label_col = find_column(df, label_cands)
-            # we will process the pair even if label_col is None (we'll use empty label)
-            if id_col:
-                found_pairs.append((id_col, label_col))
-
-        if not found_pairs:
-            # nothing to extract in this file
-            per_file_counts[fname] = 0
-            continue
-
-        row_count_with_ids = 0
-        canonical_fname = normalize_source_name(fname)
-
-        # iterate rows
-        for _, row in df.iterrows():
-            row_had_id = False
-            for id_col, label_col in found_pairs:
-                raw_ids = split_cells(row.get(id_col))
-                if not raw_ids:
-                    continue
-
-                # labels from matching label column if present
-                raw_labels = split_cells(row.get(label_col)) if label_col else []
-
-                # process each id with positional mapping if possible
-                for idx, raw_id in enumerate(raw_ids):
-                    if not is_cl_id(raw_id):
-                        continue
-                    row_had_id = True
-                    # determine label for this id
-                    label_for_id = ""
-                    if raw_labels:
-                        if len(raw_labels) == len(raw_ids):
-                            # positional mapping
-                            label_for_id = raw_labels[idx]
-                        else:
-                            # fallback: use first label if available
-                            label_for_id = raw_labels[0]
-
-                    # store label (if non-empty) for this CL id
-                    cl_key = raw_id.strip()
-                    if cl_key not in cl_to_labels:
-                        cl_to_labels[cl_key] = set()
-                    if label_for_id:
-                        cl_to_labels[cl_key].add(label_for_id)
-
-                    # store canonical source filename for this CL id (set prevents duplicates)
-                    if cl_key not in cl_to_sources:
-                        cl_to_sources[cl_key] = set()
-                    cl_to_sources[cl_key].add(canonical_fname)
-
-            if row_had_id:
-                row_count_with_ids += 1
+        partial = cache.table_result(fp, scan_cl_file)
+        merge_partial(merged, partial)
+        per_file_counts[os.path.basename(fp)] = partial["row_count_with_ids"]
+    cache.save()
 
-        per_file_counts[fname] = row_count_with_ids
+    cl_to_labels = merged["cl_to_labels"]
+    cl_to_sources = merged["cl_to_sources"]
 
     # Build output rows: one row per unique CL ID, labels joined by " | ", sources joined by " | "
     rows = []
@@ -181,6 +79,8 @@ def collect_cl_ids_dedupe_by_id(input_folder, output_file):
     for fn, ct in per_file_counts.items():
         print(f"  {fn}: rows_with_CL_ids={ct}")
     print(f"Total unique CL IDs collected: {len(out_df)} -> saved to: {output_file}")
+    print_load_report()
+    print_analyzer_report()
 
 if __name__ == "__main__":
     collect_cl_ids_dedupe_by_id(input_folder, output_file)
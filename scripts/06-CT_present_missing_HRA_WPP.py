@@ -3,6 +3,9 @@ import os
 import re
 import pandas as pd
 import sys
+
+from wpp.asctb_index import load_index
+
 if hasattr(sys.stdout, "reconfigure"):
     sys.stdout.reconfigure(encoding="utf-8")
 
@@ -11,18 +14,7 @@ astcb_master_file = "./data/all_asctb_ids_and_types.csv"        # master file
 output_missing = "./analysis/all_CT_statistics/cl_ids_missing_in_astcb.csv"
 output_present = "./analysis/all_CT_statistics/cl_ids_present_in_astcb.csv"
 
-ASTCB_ID_COL_CANDIDATES = ["id", "ID", "asctb_id"]
-
 # ---------- HELPERS ----------
-def find_column(df, candidates):
-    lowered = {c.lower(): c for c in df.columns}
-    for cand in candidates:
-        if cand in df.columns:
-            return cand
-        if cand.lower() in lowered:
-            return lowered[cand.lower()]
-    return None
-
 def split_semicolons(cell):
     """Split semicolon-separated values safely and strip whitespace."""
     if pd.isna(cell):
@@ -31,9 +23,6 @@ def split_semicolons(cell):
     parts = [p.strip() for p in s.split(";") if p.strip() != ""]
     return parts
 
-def is_cl_id(x):
-    return isinstance(x, str) and x.strip().upper().startswith("CL:")
-
 def detect_source_columns(df):
     """Return columns whose name contains 'source' or 'table' or 'file' (case-insensitive)."""
     return [c for c in df.columns if re.search(r"(source|table|file)", c, re.I) and c.lower() not in ("cl_ids","cl_ids","cl_id","cllabel","cl_labels","cl_label")]
@@ -106,23 +95,18 @@ def main():
     all_cl_ids = set(id_to_label.keys())
     print(f"Total CL IDs loaded from WPP file: {len(all_cl_ids)}")
 
-    # read ASTCB master and find ID column
-    astcb_df = pd.read_csv(astcb_master_file, dtype=str)
-    astcb_col = find_column(astcb_df, ASTCB_ID_COL_CANDIDATES)
-    if astcb_col is None:
-        # fallback: try any column with 'id' in name
-        astcb_col = next((c for c in astcb_df.columns if "id" in c.lower()), None)
-        if astcb_col is None:
-            print("[ERROR] Could not find an ID column in ASTCB master.")
-            return
-        print(f"[INFO] Using guessed ASTCB ID column: {astcb_col}")
-
-    # collect unique ASTCB IDs (raw)
-    astcb_ids_raw = {str(x).strip() for x in astcb_df[astcb_col].dropna() if str(x).strip()}
-    print(f"Total unique raw IDs in ASTCB ({astcb_col}): {len(astcb_ids_raw)}")
+    # ASTCB master index (built once per master content, see wpp/asctb_index.py)
+    try:
+        astcb_index = load_index(astcb_master_file)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return
+
+    # unique ASTCB IDs (raw)
+    print(f"Total unique raw IDs in ASTCB ({astcb_index.id_column}): {len(astcb_index.by_id)}")
 
     # restrict to CL: IDs in ASTCB (HRA)
-    astcb_cl_ids = {x for x in astcb_ids_raw if is_cl_id(x)}
+    astcb_cl_ids = astcb_index.cl_ids()
     total_cl_in_hra = len(astcb_cl_ids)
     print(f"Total CL-type IDs in ASTCB (HRA): {total_cl_in_hra}")
 
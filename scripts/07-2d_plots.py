@@ -1,137 +1,84 @@
 #!/usr/bin/env python3
+import argparse
+import hashlib
+import json
 import os
-import glob
-import re
+import time
 import numpy as np
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # files only; also what the worker processes render with
 import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
 
+from wpp.cube import load_cube
+from wpp.incremental import StageCache
+from wpp.parallel import add_jobs_argument, print_timing, run_per_file
+from wpp.vocab import PLOT_TIME_RANGES, SPATIAL_TYPE_DTYPE, SPATIAL_TYPES, category_codes, organ_system_dtype
+
 input_folder = "./temporal_spatial_output/"
 output_folder = "./2d_plots/"
 os.makedirs(output_folder, exist_ok=True)
 
-spatial_order = ["Organ", "AS", "FTU", "CT", "B"]
-time_order = [
-    "<1 second", "1s - < 1min", "1min - < 1hr", "1hr - < 1day",
-    "1day - < 1week", "1 week - < 1 year", "1 year or longer"
-]  
+spatial_order = SPATIAL_TYPES
+time_order = PLOT_TIME_RANGES
 
 # plotting defaults
 cmap_choice = "summer"
 figsize = (10, 6)
 dpi = 300
 
-def process_count(x):
-    """Return number of semicolon-separated IDs in a cell; treat empty/NaN as 0."""
-    if pd.isna(x) or str(x).strip() == "":
-        return 0
-    return len([p for p in str(x).split("?") if p.strip()])
-
-def extract_organ_system_name(filename):
-    """
-    Extract first two words from filename (before '_final...' or '.csv').
-    e.g. 'male_reproductive_system_final_spatial_temporal_v3.csv' -> 'male reproductive'
-    """
-    base = os.path.basename(filename)
-    base = re.sub(r"_final_spatial_temporal_v3\.csv$", "", base, flags=re.IGNORECASE)
-    base = re.sub(r"\.csv$", "", base, flags=re.IGNORECASE)
-    parts = base.split("_")
-    if len(parts) >= 2:
-        return " ".join(parts[:2])
-    return parts[0]
-
-files = sorted(glob.glob(os.path.join(input_folder, "*.csv")))
-if not files:
-    raise RuntimeError(f"No CSV files found in {input_folder}")
-
-combined_list = []
-organ_system_labels = []
-for f in files:
-    label = extract_organ_system_name(f)
-    organ_system_labels.append(label)
-    # read file
-    df = pd.read_csv(f)
-    df["Organ System"] = label
-    combined_list.append(df)
-
-combined = pd.concat(combined_list, ignore_index=True)
-
-for col in ["Organ", "AS", "FTU", "CT", "B"]:
-    if col in combined.columns:
-        combined[col + "_count"] = combined[col].apply(process_count)
-    else:
-        # create zero-count column if missing
-        combined[col + "_count"] = 0
-
-
-long_df = combined.melt(
-    id_vars=["Time Range", "Organ System"],
-    value_vars=["Organ_count", "AS_count", "FTU_count", "CT_count", "B_count"],
-    var_name="Spatial Scale",
-    value_name="Count"
-)
-
-long_df["Spatial Scale"] = long_df["Spatial Scale"].str.replace("_count", "")
-long_df = long_df[long_df["Count"] > 0].copy()
-
-# Build organ system order (preserve file order)
-organ_system_order = []
-seen = set()
-for f in files:
-    lab = extract_organ_system_name(f)
-    if lab not in seen:
-        seen.add(lab)
-        organ_system_order.append(lab)
-
-if not organ_system_order:
-    organ_system_order = sorted(long_df["Organ System"].unique())
-
-# Encode categorical axes & filter invalid categories
-long_df["z"] = long_df["Organ System"].astype("category").cat.set_categories(organ_system_order).cat.codes
-long_df["x"] = long_df["Spatial Scale"].astype("category").cat.set_categories(spatial_order).cat.codes
-long_df["y"] = long_df["Time Range"].astype("category").cat.set_categories(time_order).cat.codes
-
-long_df = long_df[(long_df["x"] >= 0) & (long_df["y"] >= 0) & (long_df["z"] >= 0)].copy()
-
 x_categories = spatial_order[:]
 y_categories = time_order[:]
 x_map = {cat: i for i, cat in enumerate(x_categories)}
 y_map = {cat: i for i, cat in enumerate(y_categories)}
 
-organ_systems = [s for s in organ_system_order if s in long_df["Organ System"].unique()]
+# Plot settings
+make_heatmaps = False
+make_bubbles = True
 
-# CALCULATE GLOBAL COLORBAR RANGE (same as 3D plot)
-all_counts = long_df["Count"].values.astype(float)
-global_vmin = max(1, all_counts.min())  # avoid 0
-global_vmax = all_counts.max()
-# Apply same adjustment as 3D plot
-global_vmin_adjusted = global_vmin + (global_vmax - global_vmin) * 0.01
 
-print(f"Global colorbar range: {global_vmin_adjusted:.2f} to {global_vmax:.2f}")
+def plot_paths(organ):
+    safe_name = organ.replace(" ", "_")
+    paths = []
+    if make_bubbles:
+        paths.append(os.path.join(output_folder, f"{safe_name}_plot.png"))
+    if make_heatmaps:
+        paths.append(os.path.join(output_folder, f"{safe_name}_heatmap.png"))
+    return paths
+
+
+def render_key(df_os, vmin, vmax):
+    """
+    Hash of what a system's plots show: its count slice, the global colour range, the plot
+    settings and the matplotlib version.
+    """
+    h = hashlib.sha256()
+    h.update(df_os[["Time Range", "Spatial Scale", "Count"]].to_csv(index=False).encode("utf-8"))
+    h.update(json.dumps([vmin, vmax, cmap_choice, figsize, dpi, x_categories, y_categories,
+                         make_bubbles, make_heatmaps, matplotlib.__version__]).encode("utf-8"))
+    return h.hexdigest()
 
-# Plot settings
-make_heatmaps = False  
-make_bubbles = True     
 
-for organ in organ_systems:
-    df_os = long_df[long_df["Organ System"] == organ].copy()
-    if df_os.empty:
-        continue
+def render_system(df_os, paths, global_vmin_adjusted, global_vmax):
+    """Write the enabled plots of one organ system to paths (runs in a worker process with --jobs)."""
+    paths = list(paths)
 
     # Numeric positions for bubble plot
+    df_os = df_os.copy()
     df_os["xpos"] = df_os["Spatial Scale"].map(x_map)
     df_os["ypos"] = df_os["Time Range"].map(y_map)
 
     # --- BUBBLE PLOT ---
     if make_bubbles:
+        out_bubble = paths.pop(0)
         counts = df_os["Count"].astype(float).values
         if counts.size > 0:
-            sizes = (counts ** 0.9) * 30  
+            sizes = (counts ** 0.9) * 30
             colors = counts
 
             fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
-            
+
             # Use GLOBAL colorbar range
             sc = ax.scatter(
                 df_os["xpos"].values, df_os["ypos"].values,
@@ -144,7 +91,7 @@ for organ in organ_systems:
             ax.set_xticks(range(len(x_categories)))
             ax.set_xticklabels(x_categories, rotation=45, ha="right", fontsize=10)
             ax.set_xlim(-0.5, len(x_categories) - 0.5)
-            
+
             ax.set_yticks(range(len(y_categories)))
             ax.set_yticklabels(y_categories, fontsize=9)
             ax.set_ylim(-0.5, len(y_categories) - 0.5)
@@ -156,24 +103,22 @@ for organ in organ_systems:
             cbar = fig.colorbar(sc, ax=ax, pad=0.05, shrink=0.8)
             cbar.set_label("Number of Processes", rotation=90, labelpad=12)
             cbar.ax.yaxis.set_label_position("left")
-            
+
             plt.tight_layout()
-            safe_name = organ.replace(" ", "_")
-            out_bubble = os.path.join(output_folder, f"{safe_name}_plot.png")
             plt.savefig(out_bubble, bbox_inches="tight")
             plt.close(fig)
-            print(f"Saved {out_bubble}")
 
     if make_heatmaps:
         # --- HEATMAP ---
+        out_heatmap = paths.pop(0)
         pivot = df_os.pivot_table(index="Time Range", columns="Spatial Scale", values="Count", aggfunc="sum", fill_value=0)
         pivot = pivot.reindex(index=y_categories, columns=x_categories, fill_value=0)
 
         fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
-        
+
         # Use GLOBAL colorbar range for heatmap too
         im = ax.imshow(
-            pivot.values, aspect="auto", origin="lower", 
+            pivot.values, aspect="auto", origin="lower",
             interpolation="none", cmap=cmap_choice,
             vmin=global_vmin_adjusted, vmax=global_vmax  # GLOBAL RANGE
         )
@@ -186,12 +131,12 @@ for organ in organ_systems:
 
         ax.set_xlabel("Spatial Scale")
         ax.set_ylabel("Time Range")
-        
+
         # Create vertical colorbar
         cbar = fig.colorbar(im, ax=ax, pad=0.02, shrink=0.8)
         cbar.set_label("")
-        cbar.ax.set_title("Number of Processes", rotation=90, fontsize=12, pad=20)        
-        
+        cbar.ax.set_title("Number of Processes", rotation=90, fontsize=12, pad=20)
+
         annotate_cells = True
         if annotate_cells:
             for i in range(pivot.shape[0]):
@@ -201,10 +146,93 @@ for organ in organ_systems:
                         ax.text(j, i, int(val), ha="center", va="center", fontsize=8)
 
         plt.tight_layout()
-        safe_name = organ.replace(" ", "_")
-        out_heatmap = os.path.join(output_folder, f"{safe_name}_heatmap.png")
         plt.savefig(out_heatmap, bbox_inches="tight")
         plt.close(fig)
-        print(f"Saved {out_heatmap}")
 
-print("All done — 2D plots saved to:", output_folder)
\ No newline at end of file
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="2D bubble plot (spatial scale x time range) per organ system.")
+    add_jobs_argument(parser)
+    args = parser.parse_args(argv)
+
+    # counts per organ system x time range x spatial scale, from the count cube over 02's facts
+    cube = load_cube(input_folder)
+    if not cube.tables:
+        raise RuntimeError(f"No CSV files found in {input_folder}")
+
+    long_df = cube.cells().rename(columns={
+        "organ_system": "Organ System", "time_range": "Time Range", "spatial_type": "Spatial Scale", "count": "Count",
+    })[["Time Range", "Organ System", "Spatial Scale", "Count"]]
+
+    # Build organ system order (preserve file order)
+    organ_system_order = cube.organ_system_order()
+
+    # Encode categorical axes & filter invalid categories
+    long_df["z"] = category_codes(long_df["Organ System"], organ_system_dtype(organ_system_order))
+    long_df["x"] = category_codes(long_df["Spatial Scale"], SPATIAL_TYPE_DTYPE)
+    long_df["y"] = category_codes(long_df["Time Range"], pd.CategoricalDtype(time_order, ordered=True))
+
+    long_df = long_df[(long_df["x"] >= 0) & (long_df["y"] >= 0) & (long_df["z"] >= 0)].copy()
+
+    organ_systems = [s for s in organ_system_order if s in long_df["Organ System"].unique()]
+
+    # CALCULATE GLOBAL COLORBAR RANGE (same as 3D plot)
+    all_counts = long_df["Count"].values.astype(float)
+    global_vmin = max(1, all_counts.min())  # avoid 0
+    global_vmax = all_counts.max()
+    # Apply same adjustment as 3D plot
+    global_vmin_adjusted = global_vmin + (global_vmax - global_vmin) * 0.01
+
+    print(f"Global colorbar range: {global_vmin_adjusted:.2f} to {global_vmax:.2f}")
+
+    # a system whose count slice, colour range and settings are unchanged gets its cached
+    # plots back (in every run, not only with --incremental; --force re-renders); the
+    # others are rendered, in a pool with --jobs
+    cache = StageCache("07-2d_plots", __file__, enabled=True)
+    plots, tasks = [], []
+    for organ in organ_systems:
+        df_os = long_df[long_df["Organ System"] == organ]
+        if df_os.empty:
+            continue
+        paths = plot_paths(organ)
+        key = render_key(df_os, float(global_vmin_adjusted), float(global_vmax))
+        cache.current[organ] = key
+        reused = cache.restore_outputs(key, paths)
+        plots.append((organ, paths, key, reused))
+        if not reused:
+            tasks.append((paths[0] if paths else organ,
+                          (df_os[["Time Range", "Spatial Scale", "Count"]], paths,
+                           global_vmin_adjusted, global_vmax)))
+
+    start = time.perf_counter()
+    runs = iter(run_per_file(render_system, tasks, jobs=args.jobs))
+    wall = time.perf_counter() - start
+
+    rendered = skipped = failed = 0
+    all_runs = []
+    for organ, paths, key, reused in plots:
+        if reused:
+            skipped += 1
+            for p in paths:
+                print(f"Reused cached {p}")
+            continue
+        run = next(runs)
+        all_runs.append(run)
+        if run["error"] is not None:
+            failed += 1
+            print(f"Failed plotting {organ}: {run['error']}")
+            continue
+        rendered += 1
+        cache.store_outputs(key, paths)
+        for p in paths:
+            print(f"Saved {p}")
+
+    cache.save()
+    print(f"\n=== 2D plots ===\n  rendered: {rendered}  skipped (unchanged): {skipped}  failed: {failed}")
+    if all_runs:
+        print_timing(all_runs, args.jobs, wall)
+    print("All done — 2D plots saved to:", output_folder)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,161 +1,118 @@
 #!/usr/bin/env python3
 import pandas as pd
-import glob
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 import numpy as np
 import os
-import re
 import matplotlib.colors as mcolors
 
+from wpp.cube import load_cube
+from wpp.facts import fact_inputs
+from wpp.incremental import StageCache
+from wpp.vocab import PLOT_TIME_RANGES, SPATIAL_TYPES, category_codes, organ_system_dtype
+
 input_folder = "./temporal_spatial_output/"
 output_folder = "./3d_scatter_plots/"
 os.makedirs(output_folder, exist_ok=True)
-files = sorted(glob.glob(os.path.join(input_folder, "*.csv")))
 
-spatial_order = ["Organ", "AS", "FTU", "CT", "B"][::-1]
-time_order = [
-    "<1 second", "1s - < 1min", "1min - < 1hr", "1hr - < 1day",
-    "1day - < 1week", "1 week - < 1 year", "1 year or longer"
-][::-1]
+spatial_order = SPATIAL_TYPES[::-1]
+time_order = PLOT_TIME_RANGES[::-1]
 
 cmap_choice = "summer"   # e.g. "viridis", "inferno", "plasma", "magma", "cividis", "YlGnBu"
 use_log_norm = False
 
-def process_count(x):
-    if pd.isna(x) or str(x).strip() == "":
-        return 0
-    return len([p for p in str(x).split("?") if p.strip()])
-
-def extract_organ_system_name(filename):
-    """
-    Extract first two words from filename (before '_final...' or '.csv').
-    e.g. 'male_reproductive_system_xyz.csv' -> 'male reproductive'
-    """
-    base = os.path.basename(filename)
-    base = re.sub(r"_final_spatial_temporal_v3\.csv$", "", base)
-    base = re.sub(r"\.csv$", "", base)
-    parts = base.split("_")
-    if len(parts) >= 2:
-        return " ".join(parts[:2])
-    return parts[0]
-
-# Load & combine all CSVs into one dataframe with an 'Organ System' column
-combined_list = []
-organ_system_labels = []
-
-for f in files:
-    label = extract_organ_system_name(f)
-    organ_system_labels.append(label)
-    df = pd.read_csv(f)
-    df["Organ System"] = label
-    combined_list.append(df)
-
-if not combined_list:
+# counts per organ system x time range x spatial scale, from the count cube over 02's facts
+cube = load_cube(input_folder)
+if not cube.tables:
     raise RuntimeError(f"No CSV files found in {input_folder}")
 
-combined = pd.concat(combined_list, ignore_index=True)
-
-# Count processes
-for col in ["Organ", "AS", "FTU", "CT", "B"]:
-    if col in combined.columns:
-        combined[col + "_count"] = combined[col].apply(process_count)
-    else:
-        # If the column is missing, create a zero column
-        combined[col + "_count"] = 0
-
-long_df = combined.melt(
-    id_vars=["Time Range", "Organ System"],
-    value_vars=["Organ_count", "AS_count", "FTU_count", "CT_count", "B_count"],
-    var_name="Spatial Scale",
-    value_name="Count"
-)
-
-long_df["Spatial Scale"] = long_df["Spatial Scale"].str.replace("_count", "")
-long_df = long_df[long_df["Count"] > 0].copy()
-
-# Build z-axis categories 
-organ_system_order = []
-seen = set()
-for f in files:
-    lab = extract_organ_system_name(f)
-    if lab not in seen:
-        seen.add(lab)
-        organ_system_order.append(lab)
-
-if not organ_system_order:
-    organ_system_order = sorted(long_df["Organ System"].unique())
+long_df = cube.cells().rename(columns={
+    "organ_system": "Organ System", "time_range": "Time Range", "spatial_type": "Spatial Scale", "count": "Count",
+})[["Time Range", "Organ System", "Spatial Scale", "Count"]]
+
+# Build z-axis categories (every table, also those without entries)
+organ_system_order = cube.organ_system_order()
 
 # Encode categorical axes
-long_df["z"] = long_df["Organ System"].astype("category").cat.set_categories(organ_system_order).cat.codes
-long_df["x"] = long_df["Spatial Scale"].astype("category").cat.set_categories(spatial_order).cat.codes
-long_df["y"] = long_df["Time Range"].astype("category").cat.set_categories(time_order).cat.codes
+long_df["z"] = category_codes(long_df["Organ System"], organ_system_dtype(organ_system_order))
+long_df["x"] = category_codes(long_df["Spatial Scale"], pd.CategoricalDtype(spatial_order, ordered=True))
+long_df["y"] = category_codes(long_df["Time Range"], pd.CategoricalDtype(time_order, ordered=True))
 
 # Remove rows that got -1 codes because their category wasn't present in the category map
 long_df = long_df[(long_df["x"] >= 0) & (long_df["y"] >= 0) & (long_df["z"] >= 0)].copy()
 
 
-fig = plt.figure(figsize=(24, 16))
-ax = fig.add_subplot(111, projection="3d")
+combined_output_path = os.path.join(output_folder, "combined_all_systems_3D_scatter.png")
+
+def render_3d_plot():
+    fig = plt.figure(figsize=(24, 16))
+    ax = fig.add_subplot(111, projection="3d")
 
-xs = long_df["x"].values
-ys = long_df["y"].values
-zs = long_df["z"].values
-sizes = (long_df["Count"].values.astype(float) ** 0.9) * 30  
-colors = long_df["Count"].values
+    xs = long_df["x"].values
+    ys = long_df["y"].values
+    zs = long_df["z"].values
+    sizes = (long_df["Count"].values.astype(float) ** 0.9) * 30  
+    colors = long_df["Count"].values
 
-norm = None
-if use_log_norm and colors.min() > 0:
-    norm = mcolors.LogNorm(vmin=colors.min(), vmax=colors.max())
+    norm = None
+    if use_log_norm and colors.min() > 0:
+        norm = mcolors.LogNorm(vmin=colors.min(), vmax=colors.max())
 
-# Clip the color range slightly above min to make small counts visible
-vmin = max(1, colors.min())  # avoid 0
-vmax = colors.max()
-vmin_adjusted = vmin + (vmax - vmin) * 0.01 
+    # Clip the color range slightly above min to make small counts visible
+    vmin = max(1, colors.min())  # avoid 0
+    vmax = colors.max()
+    vmin_adjusted = vmin + (vmax - vmin) * 0.01 
 
-print(f"Global colorbar range: {vmin_adjusted:.2f} to {vmax:.2f}")
+    print(f"Global colorbar range: {vmin_adjusted:.2f} to {vmax:.2f}")
 
-p = ax.scatter(
-    xs, ys, zs, s=sizes, c=colors,
-    cmap=cmap_choice, alpha=0.9, edgecolors="#808080", linewidths=0.3,
-    vmin=vmin_adjusted, vmax=vmax
-)
+    p = ax.scatter(
+        xs, ys, zs, s=sizes, c=colors,
+        cmap=cmap_choice, alpha=0.9, edgecolors="#808080", linewidths=0.3,
+        vmin=vmin_adjusted, vmax=vmax
+    )
 
 
-# Ticks & labels
-ax.set_xticks(range(len(spatial_order)))
-ax.set_xticklabels(spatial_order, rotation=45, ha="right", fontsize=11)
-ax.set_xlabel("Spatial Scale", fontsize=14, labelpad=18)
+    # Ticks & labels
+    ax.set_xticks(range(len(spatial_order)))
+    ax.set_xticklabels(spatial_order, rotation=45, ha="right", fontsize=11)
+    ax.set_xlabel("Spatial Scale", fontsize=14, labelpad=18)
 
-ax.set_yticks(range(len(time_order)))
-ax.set_yticklabels(time_order, rotation=10, fontsize=10)
-ax.set_ylabel("Time Scale", fontsize=14, labelpad=18)
+    ax.set_yticks(range(len(time_order)))
+    ax.set_yticklabels(time_order, rotation=10, fontsize=10)
+    ax.set_ylabel("Time Scale", fontsize=14, labelpad=18)
 
-ax.set_zticks(range(len(organ_system_order)))
-# show nicer z tick labels (title case)
-ztick_labels = [s.replace("_", " ").title() for s in organ_system_order]
-ax.set_zticklabels(ztick_labels, fontsize=11)
-ax.set_zlabel("Organ System", fontsize=14, labelpad=50)
+    ax.set_zticks(range(len(organ_system_order)))
+    # show nicer z tick labels (title case)
+    ztick_labels = [s.replace("_", " ").title() for s in organ_system_order]
+    ax.set_zticklabels(ztick_labels, fontsize=11)
+    ax.set_zlabel("Organ System", fontsize=14, labelpad=50)
 
-# Expand axes limits so end labels aren't crammed
-ax.set_xlim(-0.6, len(spatial_order)-0.4)
-ax.set_ylim(-0.6, len(time_order)-0.4)
-ax.set_zlim(-0.6, len(organ_system_order)-0.4)
+    # Expand axes limits so end labels aren't crammed
+    ax.set_xlim(-0.6, len(spatial_order)-0.4)
+    ax.set_ylim(-0.6, len(time_order)-0.4)
+    ax.set_zlim(-0.6, len(organ_system_order)-0.4)
 
-# Title, colorbar and layout tweaks
-ax.set_title("Combined Temporal–Spatial Distribution — All Organ Systems", fontsize=18, pad=30)
+    # Title, colorbar and layout tweaks
+    ax.set_title("Combined Temporal–Spatial Distribution — All Organ Systems", fontsize=18, pad=30)
 
-cbar = fig.colorbar(p, ax=ax, shrink=0.6, pad=0.08)
-cbar.set_label("Number of Processes", rotation=270, labelpad=20, fontsize=12)
+    cbar = fig.colorbar(p, ax=ax, shrink=0.6, pad=0.08)
+    cbar.set_label("Number of Processes", rotation=270, labelpad=20, fontsize=12)
 
-# Subplot adjustments to create breathing room
-plt.subplots_adjust(left=0.12, right=0.92, bottom=0.12, top=0.9)
+    # Subplot adjustments to create breathing room
+    plt.subplots_adjust(left=0.12, right=0.92, bottom=0.12, top=0.9)
 
-# Improve 3D view angle
-ax.view_init(elev=25, azim=130)
+    # Improve 3D view angle
+    ax.view_init(elev=25, azim=130)
 
-combined_output_path = os.path.join(output_folder, "combined_all_systems_3D_scatter.png")
-plt.savefig(combined_output_path, dpi=300, bbox_inches="tight")
-plt.close(fig)
+    plt.savefig(combined_output_path, dpi=300, bbox_inches="tight")
+    plt.close(fig)
+
+# incremental mode: re-render only when the spatial-temporal facts changed
+cache = StageCache("08-3d_scatter_plot", __file__)
+rendered = cache.cached_outputs(fact_inputs(input_folder), [combined_output_path], render_3d_plot)
+cache.save()
 
-print(f"Saved combined plot to: {combined_output_path}")
+if rendered:
+    print(f"Saved combined plot to: {combined_output_path}")
+else:
+    print(f"Inputs unchanged, reused cached plot: {combined_output_path}")
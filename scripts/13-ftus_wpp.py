@@ -11,49 +11,24 @@ import os
 import re
 import glob
 import argparse
+import time
+from functools import partial
 from pathlib import Path
-from typing import List, Optional
+from typing import Optional
 import pandas as pd
 
+from wpp.analyzers import FtuAnalyzer
+from wpp import engine
+from wpp.engine import print_analyzer_report, table_scan, walk
+from wpp.incremental import StageCache
+from wpp.loader import header_row_for, load_table, print_load_report
+from wpp.parallel import add_jobs_argument, print_timing, run_per_file
+from wpp.vocab import FTU_IDS
+
 INPUT_FOLDER = "./data/WPP Input Tables"   # folder to search (recursive)
 OUT_CSV = "./unique_ftus/ftu_id_matches_summary_.csv"
 OUT_GLOBAL_SUMMARY_CSV = "./unique_ftus/ftu_global_process_summary_.csv"
 RECURSIVE = True
-# Candidate ID columns to look for
-ID_COLUMN_CANDIDATES = ["EffectorLocation/ID", "Effector/ID"]
-LABEL_COLUMN_CANDIDATES = ["EffectorLocation/LABEL", "Effector/LABEL"]
-PROCESS_COLUMN_CANDIDATES = ["Process", "Process/ID"]
-# separators used when a cell contains multiple IDs in one cell
-ID_SEPARATORS_REGEX = r"[;|,]\s*"
-
-FTU_IDS = {
-    "UBERON:0004203",
-    "UBERON:0001289",
-    "UBERON:0004205",
-    "UBERON:0004193",
-    "UBERON:0001285",
-    "UBERON:0004204",
-    "UBERON:0001229",
-    "UBERON:0001291",
-    "UBERON:0004647",
-    "UBERON:0002299",
-    "UBERON:8410043",
-    "UBERON:0000006",
-    "UBERON:0001263",
-    "UBERON:0014725",
-    "UBERON:0004179",
-    "UBERON:0001983",
-    "UBERON:0000412",
-    "UBERON:0002073",
-    "UBERON:0013487",
-    "UBERON:0001213",
-    "UBERON:0001250",
-    "UBERON:0001959",
-    "UBERON:0002125",
-    "UBERON:0001831",
-    "UBERON:0001832",
-    "UBERON:0001736",
-}
 
 def derive_table_name(filepath: str) -> str:
     stem = Path(filepath).stem
@@ -63,35 +38,84 @@ def derive_table_name(filepath: str) -> str:
         return stem
     return " ".join(parts[:2])
 
-def find_best_column(columns: List[str], candidates: List[str]) -> Optional[str]:
-
-    lowered = {c.lower(): c for c in columns}
-    # exact / case-insensitive
-    for cand in candidates:
-        if cand in columns:
-            return cand
-        lc = cand.lower()
-        if lc in lowered:
-            return lowered[lc]
-    # suffix / contains matches
-    for cand in candidates:
-        lc = cand.lower()
-        for c in columns:
-            cl = c.lower()
-            if cl.endswith(lc) or lc in cl:
-                return c
-    return None
+def scan_file(fp: str, ftu_ids: set) -> list:
+    """
+    Scan one input file (every sheet for Excel) and return its match records.
+    """
+    records = []
+    fp_path = Path(fp)
+    ext = fp_path.suffix.lower()
+    table_name = derive_table_name(fp)
+    try:
+        if ext in (".xls", ".xlsx"):
+            # handle each sheet
+            xls = pd.ExcelFile(fp)
+            for sheet in xls.sheet_names:
+                try:
+                    df = xls.parse(sheet, dtype=str)
+                except Exception as e:
+                    # skip unreadable sheet
+                    records.append({
+                        "input_file": fp,
+                        "sheet": sheet,
+                        "table_name": table_name,
+                        "column": "ERROR",
+                        "matched_id": "",
+                        "label": f"Excel parse error: {e}",
+                        "row_index": "",
+                        "process": ""
+                    })
+                    continue
+                if df.empty:
+                    continue
+                scan_dataframe(fp, sheet, table_name, df, ftu_ids, records)
+        else:
+            if ext == ".csv" and ftu_ids == FTU_IDS:
+                # WPP sheets: ftu analyzer of the shared single-pass walk (wpp/engine.py)
+                for rec in table_scan(fp, "ftu"):
+                    records.append({"input_file": fp, "sheet": None, "table_name": table_name, **rec})
+                return records
+            if ext == ".csv":
+                df = load_table(fp)
+            else:
+                # header row from the schema catalog (Endocrine's is one further down)
+                header_row = header_row_for(fp)
+                try:
+                    df = pd.read_csv(fp, dtype=str, sep='\t', header=header_row)
+                except Exception:
+                    try:
+                        df = pd.read_csv(fp, dtype=str, sep='\t', engine='python', header=header_row)
+                    except Exception:
+                        # fallback: let the python engine sniff the separator
+                        df = pd.read_csv(fp, dtype=str, engine='python', sep=None)
+            if df.empty:
+                return records
+            scan_dataframe(fp, None, table_name, df, ftu_ids, records)
+    except Exception as exc:
+        records.append({
+            "input_file": fp,
+            "sheet": None,
+            "table_name": table_name,
+            "column": "ERROR",
+            "matched_id": "",
+            "label": f"File-level error: {exc}",
+            "row_index": "",
+            "process": ""
+        })
+    return records
 
-def split_ids_from_cell(cell_value) -> List[str]:
-    if pd.isna(cell_value):
-        return []
-    s = str(cell_value).strip()
-    if not s:
-        return []
-    parts = re.split(ID_SEPARATORS_REGEX, s)
-    return [p.strip() for p in parts if p.strip()]
+def print_ftu_scan_report():
+    """FTU analyzer CPU time per WPP table, from the walk that produced its scan (here or earlier)."""
+    scans = {fname: result for fname, _, result in engine.SCAN_LOG}
+    if not scans:
+        return
+    print("\n=== FTU scan per table ===")
+    for fname, result in scans.items():
+        secs = result["cpu"].get(FtuAnalyzer.name, 0.0)
+        rows = max(result["rows"], 1)
+        print(f"  {fname}: {result['rows']} rows, {secs * 1000:.1f} ms ({secs / rows * 1e6:.2f} us/row)")
 
-def scan_files(input_folder: str, ftu_ids: set, out_csv: str, recursive: bool = True):
+def scan_files(input_folder: str, ftu_ids: set, out_csv: str, recursive: bool = True, jobs: int = 1):
     patterns = ["**/*.csv", "**/*.tsv", "**/*.xlsx", "**/*.xls"] if recursive else ["*.csv","*.tsv","*.xlsx","*.xls"]
     base = Path(input_folder)
     if not base.exists():
@@ -108,58 +132,23 @@ def scan_files(input_folder: str, ftu_ids: set, out_csv: str, recursive: bool =
 
     records = []  # collected match records
 
-    for fp in found_files:
-        fp_path = Path(fp)
-        ext = fp_path.suffix.lower()
-        table_name = derive_table_name(fp)
-        try:
-            if ext in (".xls", ".xlsx"):
-                # handle each sheet
-                xls = pd.ExcelFile(fp)
-                for sheet in xls.sheet_names:
-                    try:
-                        df = xls.parse(sheet, dtype=str)
-                    except Exception as e:
-                        # skip unreadable sheet
-                        records.append({
-                            "input_file": fp,
-                            "sheet": sheet,
-                            "table_name": table_name,
-                            "column": "ERROR",
-                            "matched_id": "",
-                            "label": f"Excel parse error: {e}",
-                            "row_index": "",
-                            "process": ""
-                        })
-                        continue
-                    if df.empty:
-                        continue
-                    scan_dataframe(fp, sheet, table_name, df, ftu_ids, records)
-            else:
-                # CSV/TSV
-                sep = ','
-                if fp.lower().endswith(".tsv"):
-                    sep = '\t'
-                try:
-                    # header row set to 11 (0-indexed) to match your WPP files
-                    df = pd.read_csv(fp, dtype=str, sep=sep, engine='python', header=11)
-                except Exception:
-                    # fallback: try python engine without forcing sep
-                    df = pd.read_csv(fp, dtype=str, engine='python', sep=None)
-                if df.empty:
-                    continue
-                scan_dataframe(fp, None, table_name, df, ftu_ids, records)
-        except Exception as exc:
-            records.append({
-                "input_file": fp,
-                "sheet": None,
-                "table_name": table_name,
-                "column": "ERROR",
-                "matched_id": "",
-                "label": f"File-level error: {exc}",
-                "row_index": "",
-                "process": ""
-            })
+    # per-file scans run in a pool with --jobs and come back in file order;
+    # they are reused from the stage cache in incremental mode
+    cache = StageCache("13-ftus_wpp", __file__)
+    start = time.perf_counter()
+    runs = run_per_file(partial(scan_file, ftu_ids=ftu_ids), [(fp, (fp,)) for fp in found_files], jobs=jobs, cache=cache)
+    wall = time.perf_counter() - start
+    for run in runs:
+        if run["error"] is not None:
+            print(f"Failed processing {run['name']}: {run['error']}")
+            continue
+        records.extend(run["result"])
+    cache.save()
+
+    print_timing(runs, jobs, wall)
+    print_load_report()
+    print_analyzer_report()
+    print_ftu_scan_report()
 
     if not records:
         print("No matches found.")
@@ -171,27 +160,25 @@ def scan_files(input_folder: str, ftu_ids: set, out_csv: str, recursive: bool =
 
     df_records = pd.DataFrame(records)
 
-    summary_parts = []
-    
-    for (table_name, column, matched_id, label), group in df_records.groupby(["table_name", "column", "matched_id", "label"], dropna=False):
-        # Get all processes for this group
-        processes = [p for p in group['process'] if pd.notna(p) and p != ""]
-        unique_processes = sorted(set(processes))
-        
-        # Check if this is an Effector/ID column
-        is_effector_id = 'effector/id' in str(column).lower()
-        
-        summary_parts.append({
-            "table_name": table_name,
-            "column": column,
-            "matched_id": matched_id,
-            "label": label,
-            "all_processes": "; ".join(unique_processes) if is_effector_id else "",
-            "unique_process_count_in_table": len(unique_processes) if is_effector_id else 0
-        })
-    
-    summary = pd.DataFrame(summary_parts)
-    
+    keys = ["table_name", "column", "matched_id", "label"]
+    # one row per group, in groupby's (sorted) key order
+    summary = df_records[keys].drop_duplicates().sort_values(keys).reset_index(drop=True)
+    # unique non-empty processes per group, sorted, joined and counted
+    processes = (df_records.loc[df_records["process"].notna() & (df_records["process"] != ""), keys + ["process"]]
+                 .drop_duplicates()
+                 .sort_values(keys + ["process"]))
+    grouped = processes.groupby(keys, sort=False)["process"]
+    summary = summary.merge(
+        pd.DataFrame({"all_processes": grouped.agg("; ".join), "unique_process_count_in_table": grouped.size()}).reset_index(),
+        on=keys, how="left",
+    )
+    # processes are only reported for Effector/ID columns
+    is_effector_id = summary["column"].astype(str).str.lower().str.contains("effector/id", regex=False)
+    summary["all_processes"] = summary["all_processes"].where(is_effector_id, "").fillna("")
+    summary["unique_process_count_in_table"] = (
+        summary["unique_process_count_in_table"].where(is_effector_id, 0).fillna(0).astype(int)
+    )
+
     # compute total unique matched IDs per table_name
     per_table_unique = (df_records.groupby("table_name")["matched_id"]
                         .nunique()
@@ -224,9 +211,11 @@ def scan_files(input_folder: str, ftu_ids: set, out_csv: str, recursive: bool =
                                 .reset_index(name='unique_process_count'))
         
         # Get labels for each FTU (take first non-empty label)
-        ftu_labels = (effector_records
+        ftu_labels = (effector_records[effector_records['label'].notna() & (effector_records['label'] != "")]
                      .groupby('matched_id')['label']
-                     .apply(lambda x: next((l for l in x if pd.notna(l) and l != ""), ""))
+                     .first()
+                     .reindex(effector_records['matched_id'].unique(), fill_value="")
+                     .rename_axis('matched_id')
                      .reset_index(name='label'))
         
         # Merge labels
@@ -262,82 +251,20 @@ def scan_dataframe(input_file: str, sheet: Optional[str], table_name: str, df: p
     """
     Scan a single dataframe for matches and append to `records`.
     """
-    columns = list(df.columns)
-    
-    # Find process column (if exists)
-    process_col = find_best_column(columns, PROCESS_COLUMN_CANDIDATES)
-    
-    # locate id columns (we will look for both possible ID columns)
-    for id_candidate in ID_COLUMN_CANDIDATES:
-        id_col = find_best_column(columns, [id_candidate])
-        if not id_col:
-            continue
-        
-        # Check if this is an Effector/ID column
-        is_effector_id = 'effector/id' in id_col.lower()
-        
-        # determine corresponding label candidate for this ID column
-        corresponding_label_name = None
-        # find matching label candidate that has same prefix before '/'
-        if '/' in id_candidate:
-            prefix = id_candidate.split('/', 1)[0]
-            # try exact prefix + /LABEL
-            test_label = prefix + "/LABEL"
-            label_col = find_best_column(columns, [test_label])
-            if label_col:
-                corresponding_label_name = label_col
-        # if not found, try any of the generic label candidates
-        if not corresponding_label_name:
-            label_col = find_best_column(columns, LABEL_COLUMN_CANDIDATES)
-            if label_col:
-                corresponding_label_name = label_col
-
-        # iterate rows
-        # convert entire column to string, preserving empties
-        col_series = df[id_col].astype(str).fillna("").where(df[id_col].notna(), "")
-        for idx, cell in col_series.items():
-            ids_in_cell = split_ids_from_cell(cell)
-            if not ids_in_cell:
-                continue
-            for found_id in ids_in_cell:
-                if found_id in ftu_ids:
-                    label_val = ""
-                    if corresponding_label_name and corresponding_label_name in df.columns:
-                        try:
-                            raw = df.at[idx, corresponding_label_name]
-                            label_val = "" if pd.isna(raw) else str(raw)
-                        except Exception:
-                            label_val = ""
-                    
-                    # Get process value if this is Effector/ID and process column exists
-                    process_val = ""
-                    if is_effector_id and process_col and process_col in df.columns:
-                        try:
-                            raw = df.at[idx, process_col]
-                            process_val = "" if pd.isna(raw) else str(raw)
-                        except Exception:
-                            process_val = ""
-                    
-                    records.append({
-                        "input_file": input_file,
-                        "sheet": sheet,
-                        "table_name": table_name,
-                        "column": id_col,
-                        "matched_id": found_id,
-                        "label": label_val,
-                        "row_index": idx,
-                        "process": process_val
-                    })
+    results, _, _ = walk(table_name, df, [FtuAnalyzer(ftu_ids)])
+    for rec in results[FtuAnalyzer.name]:
+        records.append({"input_file": input_file, "sheet": sheet, "table_name": table_name, **rec})
 
 def main():
     parser = argparse.ArgumentParser(description="Scan input tables for FTU UBERON IDs.")
     parser.add_argument("--input", "-i", default=INPUT_FOLDER, help="Input folder to search (recursive).")
     parser.add_argument("--out", "-o", default=OUT_CSV, help="Output CSV path for summary.")
     parser.add_argument("--no-recursive", action="store_true", help="Don't search subfolders.")
+    add_jobs_argument(parser)
     args = parser.parse_args()
 
     print(f"Scanning folder: {args.input} (recursive={not args.no_recursive})")
-    summary = scan_files(args.input, FTU_IDS, args.out, recursive=not args.no_recursive)
+    summary = scan_files(args.input, FTU_IDS, args.out, recursive=not args.no_recursive, jobs=args.jobs)
     if summary is None or summary.empty:
         print("No matches written.")
     else:
@@ -0,0 +1,3 @@
+"""
+Benchmarks for the WPP scripts; run from ./scripts with `python -m benchmarks.<name>`.
+"""
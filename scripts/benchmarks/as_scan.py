@@ -0,0 +1,135 @@
+"""
+Row throughput of the tissue id extraction behind 03 per table and scale: the
+vectorized analyzer (tissue mask, split, label merge and drop_duplicates over
+whole columns, every distinct cell cleaned once) vs the per-row walk that
+cleaned and split every label and id cell in Python, and the iterrows() loop
+03 started from.
+
+    cd scripts
+    python -m benchmarks.as_scan --scale 1 10 100
+
+For every scale a week of synthetic tables is generated (benchmarks.synthetic_tables)
+and parsed once; every implementation then scans every table through wpp.engine.walk
+(best of --repeat), and their per-table results are compared.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_tables import generate_week
+from wpp.analyzers import TissueIdAnalyzer, clean_text, split_cells
+from wpp.engine import walk
+from wpp.loader import header_row_for, list_tables, parse_table
+
+
+class RowTissueIdAnalyzer(TissueIdAnalyzer):
+    """The implementation before the vectorized scan: one row dict at a time."""
+
+    vectorized = False
+
+    def row(self, idx, row):
+        if str(row[self.esc_col]).strip().lower() != "tissue":
+            return
+        self.saw_tissue = True
+        if not self.label_cols:
+            return
+        self.partial["tissue_count"] += 1
+
+        labels_found = [lbl for lbl in (clean_text(row[c]) for c in self.label_cols) if lbl]
+        if not labels_found:
+            return  # no label -> skip row
+
+        # non-CL ids in this row, splitting multi-ids
+        ids_found = []
+        for idcol in self.id_cols:
+            for p in split_cells(row[idcol]):
+                pclean = clean_text(p)
+                if pclean and not pclean.upper().startswith("CL"):
+                    ids_found.append(pclean)
+
+        if ids_found:
+            for idv in ids_found:
+                self.partial["id_to_labels"].setdefault(idv, set()).update(labels_found)
+                self.partial["id_to_sources"].setdefault(idv, set()).add(self.source)
+        else:
+            # labels that currently have no non-CL id
+            self.partial["labels_with_no_id"].update(labels_found)
+
+
+class IterrowsTissueIdAnalyzer(RowTissueIdAnalyzer):
+    """03 before the shared walk: df.iterrows() over the whole table."""
+
+    vectorized = True
+
+    def rows(self, df):
+        for idx, row in df.iterrows():
+            self.row(idx, row)
+
+
+IMPLS = {"iterrows": IterrowsTissueIdAnalyzer, "row": RowTissueIdAnalyzer, "vectorized": TissueIdAnalyzer}
+
+
+def scan_table(fname, df, cls, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results, _, _ = walk(fname, df, [cls()])
+        secs = time.perf_counter() - start
+        best = secs if best is None else min(best, secs)
+        result = results[cls.name]
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vectorized vs per-row tissue id extraction of the WPP tables.")
+    parser.add_argument("--scale", type=float, nargs="+", default=[1, 10], help="Table size multipliers.")
+    parser.add_argument("--repeat", type=int, default=3, help="Scans per table and implementation (best is kept).")
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed.")
+    parser.add_argument("--report", help="Optional JSON file for the results.")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="wpp-as-bench-")
+    results = []
+    print(f"{'scale':>6} {'rows':>9} {'AS ids':>7} " + " ".join(f"{impl + ' ms':>14} {'rows/s':>10}" for impl in IMPLS)
+          + f" {'speedup':>8} {'identical':>9}")
+    try:
+        for scale in args.scale:
+            week_dir = os.path.join(work_dir, f"scale_{scale:g}")
+            generate_week(week_dir, scale=scale, seed=args.seed)
+            tables = [(os.path.basename(p), parse_table(p, header_row_for(p)))
+                      for p in list_tables(os.path.join(week_dir, "data", "WPP Input Tables"))]
+            rows = sum(len(df) for _, df in tables)
+            r = {"scale": scale, "rows": rows, "tables": {}}
+            partials = {}
+            for impl, cls in IMPLS.items():
+                total = 0.0
+                partials[impl] = []
+                for fname, df in tables:
+                    secs, partial = scan_table(fname, df, cls, args.repeat)
+                    total += secs
+                    partials[impl].append(partial)
+                    r["tables"].setdefault(fname, {"rows": len(df)})[impl] = round(secs, 5)
+                r[impl] = round(total, 4)
+            r["as_ids"] = len({idv for p in partials["vectorized"] for idv in p["id_to_labels"]})
+            r["identical"] = all(partials[impl] == partials["vectorized"] for impl in IMPLS)
+            results.append(r)
+            print(f"{scale:>6g} {rows:>9} {r['as_ids']:>7} "
+                  + " ".join(f"{r[impl] * 1000:>14.1f} {rows / r[impl]:>10.0f}" for impl in IMPLS)
+                  + f" {r['row'] / r['vectorized']:>7.1f}x {str(r['identical']):>9}")
+            shutil.rmtree(week_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return 0 if all(r["identical"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Row throughput of the CL id extraction behind 05 per table and scale: the
+vectorized analyzer (split, explode, positional label merge and drop_duplicates
+over whole columns) vs the per-row walk that split every id and label cell in
+Python, and the iterrows() loop 05 started from.
+
+    cd scripts
+    python -m benchmarks.cl_scan --scale 1 10 100
+
+For every scale a week of synthetic tables is generated (benchmarks.synthetic_tables)
+and parsed once; every implementation then scans every table through wpp.engine.walk
+(best of --repeat), and their per-table results are compared.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_tables import generate_week
+from wpp.analyzers import CellTypeIdAnalyzer, split_cells
+from wpp.engine import walk
+from wpp.loader import header_row_for, list_tables, parse_table
+
+
+class RowCellTypeIdAnalyzer(CellTypeIdAnalyzer):
+    """The implementation before the vectorized scan: one row dict at a time."""
+
+    vectorized = False
+
+    def row(self, idx, row):
+        cl_to_labels = self.partial["cl_to_labels"]
+        cl_to_sources = self.partial["cl_to_sources"]
+        row_had_id = False
+        for id_col, label_col in self.pairs:
+            raw_ids = split_cells(row[id_col])
+            if not raw_ids:
+                continue
+            raw_labels = split_cells(row[label_col]) if label_col else []
+
+            for i, raw_id in enumerate(raw_ids):
+                if not raw_id.upper().startswith("CL:"):
+                    continue
+                row_had_id = True
+                label_for_id = ""
+                if raw_labels:
+                    # positional mapping when the counts match, else the first label
+                    label_for_id = raw_labels[i] if len(raw_labels) == len(raw_ids) else raw_labels[0]
+                labels = cl_to_labels.setdefault(raw_id, set())
+                if label_for_id:
+                    labels.add(label_for_id)
+                cl_to_sources.setdefault(raw_id, set()).add(self.source)
+
+        if row_had_id:
+            self.partial["row_count_with_ids"] += 1
+
+
+class IterrowsCellTypeIdAnalyzer(RowCellTypeIdAnalyzer):
+    """05 before the shared walk: df.iterrows() over the whole table."""
+
+    vectorized = True
+
+    def rows(self, df):
+        for idx, row in df.iterrows():
+            self.row(idx, row)
+
+
+IMPLS = {"iterrows": IterrowsCellTypeIdAnalyzer, "row": RowCellTypeIdAnalyzer, "vectorized": CellTypeIdAnalyzer}
+
+
+def scan_table(fname, df, cls, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results, _, _ = walk(fname, df, [cls()])
+        secs = time.perf_counter() - start
+        best = secs if best is None else min(best, secs)
+        result = results[cls.name]
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vectorized vs per-row CL id extraction of the WPP tables.")
+    parser.add_argument("--scale", type=float, nargs="+", default=[1, 10], help="Table size multipliers.")
+    parser.add_argument("--repeat", type=int, default=3, help="Scans per table and implementation (best is kept).")
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed.")
+    parser.add_argument("--report", help="Optional JSON file for the results.")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="wpp-cl-bench-")
+    results = []
+    print(f"{'scale':>6} {'rows':>9} {'CL ids':>7} " + " ".join(f"{impl + ' ms':>14} {'rows/s':>10}" for impl in IMPLS)
+          + f" {'speedup':>8} {'identical':>9}")
+    try:
+        for scale in args.scale:
+            week_dir = os.path.join(work_dir, f"scale_{scale:g}")
+            generate_week(week_dir, scale=scale, seed=args.seed)
+            tables = [(os.path.basename(p), parse_table(p, header_row_for(p)))
+                      for p in list_tables(os.path.join(week_dir, "data", "WPP Input Tables"))]
+            rows = sum(len(df) for _, df in tables)
+            r = {"scale": scale, "rows": rows, "tables": {}}
+            partials = {}
+            for impl, cls in IMPLS.items():
+                total = 0.0
+                partials[impl] = []
+                for fname, df in tables:
+                    secs, partial = scan_table(fname, df, cls, args.repeat)
+                    total += secs
+                    partials[impl].append(partial)
+                    r["tables"].setdefault(fname, {"rows": len(df)})[impl] = round(secs, 5)
+                r[impl] = round(total, 4)
+            r["cl_ids"] = len({cl_id for p in partials["vectorized"] for cl_id in p["cl_to_labels"]})
+            r["identical"] = all(partials[impl] == partials["vectorized"] for impl in IMPLS)
+            results.append(r)
+            print(f"{scale:>6g} {rows:>9} {r['cl_ids']:>7} "
+                  + " ".join(f"{r[impl] * 1000:>14.1f} {rows / r[impl]:>10.0f}" for impl in IMPLS)
+                  + f" {r['row'] / r['vectorized']:>7.1f}x {str(r['identical']):>9}")
+            shutil.rmtree(week_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return 0 if all(r["identical"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
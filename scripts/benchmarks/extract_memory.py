@@ -0,0 +1,143 @@
+"""
+Peak memory of the ASCT+B id extraction in 01: the streaming extractor vs the
+previous list-of-dicts + drop_duplicates implementation.
+
+    cd scripts
+    python -m benchmarks.extract_memory --snapshot <hra snapshot dir> --scale 1 10 50
+
+The snapshot is a folder as written by `01 --offline` (collection/hra.json +
+asct-b/<organ>/<version>.json). --scale N repeats every table N times under new
+organ names, and every record twice, so the dedup has work to do.
+Each implementation runs in its own subprocess; peak RSS is ru_maxrss of that
+process, reported together with the RSS just before extraction started.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXTRACT_SCRIPT = os.path.join(SCRIPTS_DIR, "01-all_asctb_ids_with_types.py")
+
+
+def load_extract_module():
+    spec = importlib.util.spec_from_file_location("asctb_extract", EXTRACT_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def legacy_extract(tables, format_term):
+    """The implementation before streaming: one dict per item, dedup at the end."""
+    records = []
+    for organ_name, rows in tables.items():
+        for record in rows:
+            for list_name, asctb_type in [
+                ("anatomical_structure_list", "AS"),
+                ("cell_type_list", "CT"),
+                ("gene_marker_list", "B (gene)"),
+                ("protein_marker_list", "B (protein)"),
+            ]:
+                for item in record.get(list_name, []):
+                    records.append({
+                        "organ": organ_name,
+                        "id": format_term(item["source_concept"]),
+                        "cf_asctb_type": asctb_type,
+                        "label": item["ccf_pref_label"],
+                    })
+    return pd.DataFrame(records).drop_duplicates().reset_index(drop=True)
+
+
+def scaled_tables(tables, scale):
+    out = {}
+    for i in range(scale):
+        for name, rows in tables.items():
+            out[name if i == 0 else f"{name}_{i}"] = rows + rows
+    return out
+
+
+def max_rss_mb():
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_one(impl, snapshot, scale, out_dir):
+    """Body of the child process: load, extract, write; prints a JSON result line."""
+    module = load_extract_module()
+    tables = scaled_tables(module.get_latest_asctb_data(snapshot, offline=True), scale)
+    items = sum(len(r.get(k, [])) for rows in tables.values() for r in rows for k, _ in module.ITEM_LISTS)
+    rss_before = max_rss_mb()
+    csv_path = os.path.join(out_dir, f"{impl}.csv")
+
+    start = time.perf_counter()
+    if impl == "legacy":
+        df = legacy_extract(tables, module.format_term)
+        df.to_csv(csv_path, index=False)
+        rows = len(df)
+    else:
+        rows, _ = module.write_all_ids_and_types(tables, csv_path)
+    seconds = time.perf_counter() - start
+
+    print(json.dumps({
+        "impl": impl,
+        "scale": scale,
+        "items": items,
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rss_before_mb": round(rss_before, 1),
+        "peak_rss_mb": round(max_rss_mb(), 1),
+        "csv": csv_path,
+    }))
+
+
+def measure(impl, snapshot, scale, out_dir):
+    cmd = [sys.executable, "-m", "benchmarks.extract_memory", "--child", impl,
+           "--snapshot", snapshot, "--scale", str(scale), "--out", out_dir]
+    proc = subprocess.run(cmd, cwd=SCRIPTS_DIR, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Peak RSS of the 01 extraction, streaming vs legacy.")
+    parser.add_argument("--snapshot", required=True, help="HRA snapshot folder (see 01 --offline).")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10], help="Table multipliers to run.")
+    parser.add_argument("--out", help="Folder for the CSVs (default: a temporary folder).")
+    parser.add_argument("--report", help="Optional JSON file for the results.")
+    parser.add_argument("--child", choices=["legacy", "streaming"], help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    snapshot = os.path.abspath(args.snapshot)
+
+    if args.child:
+        run_one(args.child, snapshot, args.scale[0], args.out)
+        return 0
+
+    out_dir = args.out or tempfile.mkdtemp(prefix="wpp-extract-bench-")
+    results = []
+    print(f"{'scale':>5} {'impl':>9} {'items':>9} {'rows':>9} {'seconds':>8} {'base MB':>8} {'peak MB':>8} {'extra MB':>8}")
+    for scale in args.scale:
+        pair = [measure(impl, snapshot, scale, out_dir) for impl in ("legacy", "streaming")]
+        for r in pair:
+            print(f"{scale:>5} {r['impl']:>9} {r['items']:>9} {r['rows']:>9} {r['seconds']:>8.2f} "
+                  f"{r['rss_before_mb']:>8.1f} {r['peak_rss_mb']:>8.1f} {r['peak_rss_mb'] - r['rss_before_mb']:>8.1f}")
+        with open(pair[0]["csv"], "rb") as a, open(pair[1]["csv"], "rb") as b:
+            same = a.read() == b.read()
+        print(f"{'':>5} output identical: {same}")
+        results.extend(pair)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Time of the FTU id scan behind 13 per table and scale: the vectorized analyzer
+(split, explode, isin over whole columns) vs the previous per-row walk that split
+every id cell in Python.
+
+    cd scripts
+    python -m benchmarks.ftu_scan --scale 1 10 100
+
+For every scale a week of synthetic tables is generated (benchmarks.synthetic_tables)
+and parsed once; both implementations then scan every table through wpp.engine.walk
+(best of --repeat), and their match records are compared.
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic_tables import generate_week
+from wpp.analyzers import ID_SEPARATORS_REGEX, FtuAnalyzer
+from wpp.engine import walk
+from wpp.loader import header_row_for, list_tables, parse_table
+
+
+def split_ids_from_cell(cell_value):
+    if pd.isna(cell_value):
+        return []
+    s = str(cell_value).strip()
+    if not s:
+        return []
+    parts = re.split(ID_SEPARATORS_REGEX, s)
+    return [p.strip() for p in parts if p.strip()]
+
+
+class RowFtuAnalyzer(FtuAnalyzer):
+    """The implementation before the vectorized scan: one row dict at a time."""
+
+    vectorized = False
+
+    def row(self, idx, row):
+        for id_col, label_col, process_col, records in self.targets:
+            cell = row[id_col]
+            for found_id in split_ids_from_cell("" if pd.isna(cell) else str(cell)):
+                if found_id not in self.ftu_ids:
+                    continue
+                label_val = ""
+                if label_col:
+                    raw = row[label_col]
+                    label_val = "" if pd.isna(raw) else str(raw)
+                process_val = ""
+                if process_col:
+                    raw = row[process_col]
+                    process_val = "" if pd.isna(raw) else str(raw)
+                records.append({
+                    "column": id_col,
+                    "matched_id": found_id,
+                    "label": label_val,
+                    "row_index": idx,
+                    "process": process_val,
+                })
+
+
+IMPLS = {"row": RowFtuAnalyzer, "vectorized": FtuAnalyzer}
+
+
+def scan_table(fname, df, cls, repeat):
+    best, records = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results, _, _ = walk(fname, df, [cls()])
+        secs = time.perf_counter() - start
+        best = secs if best is None else min(best, secs)
+        records = results[cls.name]
+    return best, records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vectorized vs per-row FTU scan of the WPP tables.")
+    parser.add_argument("--scale", type=float, nargs="+", default=[1, 10], help="Table size multipliers.")
+    parser.add_argument("--repeat", type=int, default=3, help="Scans per table and implementation (best is kept).")
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed.")
+    parser.add_argument("--report", help="Optional JSON file for the results.")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="wpp-ftu-bench-")
+    results = []
+    print(f"{'scale':>6} {'rows':>9} {'matches':>8} " + " ".join(f"{impl + ' ms':>14} {'us/row':>7}" for impl in IMPLS)
+          + f" {'speedup':>8} {'identical':>9}")
+    try:
+        for scale in args.scale:
+            week_dir = os.path.join(work_dir, f"scale_{scale:g}")
+            generate_week(week_dir, scale=scale, seed=args.seed)
+            tables = [(os.path.basename(p), parse_table(p, header_row_for(p)))
+                      for p in list_tables(os.path.join(week_dir, "data", "WPP Input Tables"))]
+            rows = sum(len(df) for _, df in tables)
+            r = {"scale": scale, "rows": rows, "tables": {}}
+            records = {}
+            for impl, cls in IMPLS.items():
+                total = 0.0
+                records[impl] = []
+                for fname, df in tables:
+                    secs, recs = scan_table(fname, df, cls, args.repeat)
+                    total += secs
+                    records[impl].extend(recs)
+                    r["tables"].setdefault(fname, {"rows": len(df)})[impl] = round(secs, 5)
+                r[impl] = round(total, 4)
+            r["matches"] = len(records["vectorized"])
+            r["identical"] = records["row"] == records["vectorized"]
+            results.append(r)
+            print(f"{scale:>6g} {rows:>9} {r['matches']:>8} "
+                  + " ".join(f"{r[impl] * 1000:>14.1f} {r[impl] / rows * 1e6:>7.2f}" for impl in IMPLS)
+                  + f" {r['row'] / r['vectorized']:>7.1f}x {str(r['identical']):>9}")
+            shutil.rmtree(week_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return 0 if all(r["identical"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
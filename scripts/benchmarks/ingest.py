@@ -0,0 +1,132 @@
+"""
+Parse time and memory per input table: full-width reads vs the column-projected
+loads of WPP_PROJECT=1 (wpp.loader.load_columns).
+
+    cd scripts
+    python -m benchmarks.ingest                                   # the synthetic week, scale 1
+    python -m benchmarks.ingest --input "../output_iterative/2026-01-28/data/WPP Input Tables"
+    python -m benchmarks.ingest --scale 10 --repeat 5
+
+Three reads of every table, each straight from the CSV (no Parquet cache):
+
+    object     every column as object-dtype strings (dtype=str before pandas 3)
+    full       every column as the loader parses it today (parse_table)
+    projected  the columns the scans and 02 declare, pyarrow-backed strings and
+               categoricals, all-empty columns dropped
+
+Time is the best of --repeat reads; memory is the frame's deep memory_usage.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic_tables import generate_week
+from benchmarks.time_mask import load_tables_module
+from wpp import engine
+from wpp.loader import header_row_for, list_tables, load_columns, normalize_headers, parse_table, sniff_header
+
+IMPLS = ["object", "full", "projected"]
+
+
+def read_object(path, header_row):
+    df = pd.read_csv(path, dtype=object, header=header_row, encoding="utf-8-sig")
+    return normalize_headers(df)
+
+
+def projected_columns(tables_module, path, header_row):
+    """Columns 02 and the registered analyzers read from this table."""
+    import wpp.analyzers  # noqa: F401  (registers the built-in analyzers)
+
+    header = sniff_header(path, header_row)
+    wanted = set(tables_module.table_columns(header))
+    declared = engine.declared_columns(os.path.basename(path), header)
+    wanted.update(header if declared is None else declared)
+    return header, [c for c in header if c in wanted]
+
+
+def best_of(fn, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        secs = time.perf_counter() - start
+        best = secs if best is None else min(best, secs)
+    return best, result
+
+
+def measure_table(tables_module, path, repeat):
+    header_row = header_row_for(path)
+    header, columns = projected_columns(tables_module, path, header_row)
+    reads = {
+        "object": lambda: read_object(path, header_row),
+        "full": lambda: parse_table(path, header_row),
+        "projected": lambda: load_columns(path, columns, header_row=header_row, use_cache=False),
+    }
+    out = {"table": os.path.basename(path), "header_columns": len(header), "declared_columns": len(columns)}
+    for impl in IMPLS:
+        secs, df = best_of(reads[impl], repeat)
+        out[impl] = {
+            "seconds": round(secs, 4),
+            "columns": df.shape[1],
+            "rows": len(df),
+            "bytes": int(df.memory_usage(deep=True).sum()),
+        }
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Full-width vs column-projected reads of the WPP tables.")
+    parser.add_argument("--input", help="Folder of WPP tables (default: a generated synthetic week).")
+    parser.add_argument("--scale", type=float, default=1, help="Synthetic table size multiplier.")
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed.")
+    parser.add_argument("--repeat", type=int, default=3, help="Reads per table and implementation (best is kept).")
+    parser.add_argument("--report", help="Optional JSON file for the results.")
+    args = parser.parse_args(argv)
+
+    input_folder = os.path.abspath(args.input) if args.input else None
+    work_dir = tempfile.mkdtemp(prefix="wpp-ingest-bench-")
+    cwd = os.getcwd()
+    results = []
+    try:
+        # 02 creates its output folder on import
+        os.chdir(work_dir)
+        tables_module = load_tables_module()
+        if input_folder is None:
+            generate_week(work_dir, scale=args.scale, seed=args.seed)
+            input_folder = os.path.join(work_dir, "data", "WPP Input Tables")
+        paths = list_tables(input_folder)
+        if not paths:
+            print(f"[ERROR] No CSV tables in {input_folder}")
+            return 1
+        print(f"{'table':<36} {'columns':>9} " + " ".join(f"{impl + ' ms':>12} {impl + ' KB':>12}" for impl in IMPLS))
+        for path in paths:
+            r = measure_table(tables_module, path, args.repeat)
+            results.append(r)
+            print(f"{r['table'][:36]:<36} {r['projected']['columns']:>4}/{r['header_columns']:<4} " + " ".join(
+                f"{r[impl]['seconds'] * 1000:>12.1f} {r[impl]['bytes'] / 1024:>12.1f}" for impl in IMPLS))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    totals = {impl: (sum(r[impl]["seconds"] for r in results), sum(r[impl]["bytes"] for r in results)) for impl in IMPLS}
+    print(f"{'total':<36} {'':>9} " + " ".join(f"{s * 1000:>12.1f} {b / 1024:>12.1f}" for s, b in totals.values()))
+    base_s, base_b = totals["object"]
+    for impl in IMPLS[1:]:
+        s, b = totals[impl]
+        print(f"  {impl}: {base_s / s:.1f}x faster, {base_b / b:.1f}x less memory than object reads")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Scaling benchmark of the stage scripts 02-13 on synthetic WPP tables.
+
+For every scale a week folder is generated with benchmarks.synthetic_tables and
+the numbered scripts run in it one after the other (as run.sh would, with a
+fresh WPP_CACHE_DIR per scale). Each script is its own process; per stage the
+harness records wall time, CPU time and peak RSS (from wait4 on that process)
+and input rows per second. 01 reads the network and is not part of it.
+
+    cd scripts
+    python -m benchmarks.stages --scales 1 10 100 --report bench.json
+    python -m benchmarks.stages --scales 1 10 --report new.json --compare bench.json
+
+The report holds the git commit, so results of two commits can be compared with
+--compare. --scales 1000 writes about 4 million rows (several GB of CSV).
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.synthetic_tables import generate_week
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTPUT_DIRS = [
+    "analysis", "temporal_spatial_output", "2d_plots", "3d_scatter_plots", "unique_processes",
+    "unique_effectors", "common_effectors_across_systems", "unique_ftus",
+]
+
+
+def stage_scripts():
+    return sorted(f for f in os.listdir(SCRIPTS_DIR)
+                  if f[:2].isdigit() and f.endswith(".py") and not f.startswith("01-"))
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPTS_DIR,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_stage(script, week_dir, cache_dir, log_path, timeout):
+    """Run one script in week_dir; returns (returncode, wall s, cpu s, peak RSS MB, timed out)."""
+    env = dict(os.environ, MPLBACKEND="Agg", WPP_CACHE_DIR=cache_dir)
+    env.pop("WPP_INCREMENTAL", None)
+    with open(log_path, "w", encoding="utf-8") as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, os.path.join(SCRIPTS_DIR, script)],
+                                cwd=week_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        timer = threading.Timer(timeout, proc.kill) if timeout else None
+        if timer:
+            timer.start()
+        # wait4: resource usage of this child alone
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - start
+        if timer:
+            timer.cancel()
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    rss = usage.ru_maxrss / (1024 * 1024) if sys.platform == "darwin" else usage.ru_maxrss / 1024
+    timed_out = bool(timeout) and proc.returncode < 0 and wall >= timeout
+    return proc.returncode, wall, usage.ru_utime + usage.ru_stime, rss, timed_out
+
+
+def run_scale(scale, stages, work_dir, seed, timeout):
+    week_dir = os.path.join(work_dir, f"scale_{scale:g}")
+    shutil.rmtree(week_dir, ignore_errors=True)
+    start = time.perf_counter()
+    counts = generate_week(week_dir, scale=scale, seed=seed)
+    rows = sum(counts.values())
+    print(f"\nscale {scale:g}: {len(counts)} tables, {rows} rows generated in {time.perf_counter() - start:.1f} s")
+    for d in OUTPUT_DIRS:
+        os.makedirs(os.path.join(week_dir, d), exist_ok=True)
+
+    results = []
+    for script in stages:
+        log_path = os.path.join(week_dir, f"{os.path.splitext(script)[0]}.log")
+        code, wall, cpu, rss, timed_out = run_stage(script, week_dir, os.path.join(week_dir, ".cache"),
+                                                    log_path, timeout)
+        results.append({
+            "scale": scale, "stage": script, "rows": rows,
+            "seconds": round(wall, 3), "cpu_seconds": round(cpu, 3), "peak_rss_mb": round(rss, 1),
+            "rows_per_sec": round(rows / wall, 1) if wall > 0 else None,
+            "returncode": code, "timed_out": timed_out, "log": log_path,
+        })
+        status = "timeout" if timed_out else "ok" if code == 0 else f"exit {code}"
+        print(f"  {script:<42} {wall:>8.2f} s {cpu:>8.2f} s CPU {rss:>8.1f} MB {rows / wall:>10.0f} rows/s  {status}")
+    return results
+
+
+def print_comparison(old, new):
+    """Stage x scale table of two reports (old = --compare file)."""
+    before = {(r["stage"], r["scale"]): r for r in old["results"]}
+    print(f"\n=== {old.get('commit')} -> {new.get('commit')} ===")
+    print(f"{'stage':<42} {'scale':>6} {'old s':>8} {'new s':>8} {'ratio':>6} {'old MB':>8} {'new MB':>8}")
+    for r in new["results"]:
+        o = before.get((r["stage"], r["scale"]))
+        if o is None:
+            continue
+        ratio = r["seconds"] / o["seconds"] if o["seconds"] else float("nan")
+        print(f"{r['stage']:<42} {r['scale']:>6g} {o['seconds']:>8.2f} {r['seconds']:>8.2f} {ratio:>6.2f} "
+              f"{o['peak_rss_mb']:>8.1f} {r['peak_rss_mb']:>8.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Wall time, peak RSS and rows/s of stages 02-13 at several scales.")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 10, 100],
+                        help="Table size multipliers (default 1 10 100; 1000 is supported but large).")
+    parser.add_argument("--stages", nargs="+", help="Script names (or their number prefixes) to run; default all but 01.")
+    parser.add_argument("--work", help="Folder for the generated weeks (default: a temporary folder, removed after).")
+    parser.add_argument("--report", help="JSON results file (default bench_<commit>.json).")
+    parser.add_argument("--compare", help="Earlier JSON results file to compare against.")
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed.")
+    parser.add_argument("--timeout", type=float, default=0, help="Kill a stage after this many seconds (0 = never).")
+    args = parser.parse_args(argv)
+
+    stages = stage_scripts()
+    if args.stages:
+        stages = [s for s in stages if any(s == want or s.startswith(f"{want}-") for want in args.stages)]
+
+    work_dir = args.work or tempfile.mkdtemp(prefix="wpp-stage-bench-")
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": args.seed,
+        "results": [],
+    }
+    try:
+        for scale in args.scales:
+            report["results"].extend(run_scale(scale, stages, work_dir, args.seed, args.timeout))
+    finally:
+        if not args.work:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            for r in report["results"]:
+                r.pop("log", None)
+
+    report_path = args.report or f"bench_{commit or 'unknown'}.json"
+    with open(report_path, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nResults written to {report_path}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            print_comparison(json.load(fh), report)
+    return 1 if any(r["returncode"] != 0 for r in report["results"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Peak memory and time of whole-table reads vs the streamed, memory-bounded mode
+(WPP_STREAM_MB) for the two kinds of per-table work it covers:
+
+    facts  02's spatial-temporal facts of every table (build_spatial_temporal_facts)
+    scan   the single-pass analyzer walk behind 03, 05, 11, 12 and 13 (wpp.engine.scan)
+
+    cd scripts
+    python -m benchmarks.streaming --scale 10 100 --mb 4
+
+For every scale a week of synthetic tables is generated (benchmarks.synthetic_tables).
+Every part and mode runs in its own subprocess with an empty cache folder; peak RSS
+is the high-water mark of that process, reported with the one before the first
+table was read. The results of both modes are compared by digest.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_tables import generate_week
+from benchmarks.time_mask import load_tables_module
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARTS = ["facts", "scan"]
+
+
+def max_rss_mb():
+    # VmHWM starts over at exec; ru_maxrss of a child keeps the peak of the parent it was forked from
+    try:
+        with open("/proc/self/status", encoding="ascii") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def canonical(obj):
+    """JSON-able form with sets sorted, so results digest the same in any process."""
+    if isinstance(obj, dict):
+        return {str(k): canonical(v) for k, v in sorted(obj.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(obj, (set, frozenset)):
+        return sorted(canonical(v) for v in obj)
+    if isinstance(obj, (list, tuple)):
+        return [canonical(v) for v in obj]
+    return obj
+
+
+def run_one(part, mb, week_dir):
+    """Body of the child process: the part over every table; prints a JSON line."""
+    os.chdir(week_dir)
+    from wpp import engine, loader
+    loader.STREAM_MB = mb
+    module = load_tables_module()
+    paths = module.list_tables(module.INPUT_FOLDER)
+    rss_before = max_rss_mb()
+
+    digest = hashlib.sha256()
+    rows = 0
+    start = time.perf_counter()
+    for path in paths:
+        if part == "facts":
+            facts = module.build_spatial_temporal_facts(path, header_row=module.header_row_for(path))
+            rows += len(facts)
+            digest.update(facts.to_csv(index=False).encode("utf-8"))
+        else:
+            result = engine.scan(path)
+            rows += result["rows"]
+            digest.update(json.dumps(canonical(result["results"])).encode("utf-8"))
+    seconds = time.perf_counter() - start
+
+    print(json.dumps({
+        "part": part,
+        "mode": f"{mb:g} MB chunks" if mb else "whole",
+        "rows": rows,
+        "chunks": sum(n for _, n, _, _ in loader.STREAMS),
+        "seconds": round(seconds, 3),
+        "rss_before_mb": round(rss_before, 1),
+        "peak_rss_mb": round(max_rss_mb(), 1),
+        "digest": digest.hexdigest(),
+    }))
+
+
+def measure(part, mb, week_dir):
+    cache_dir = tempfile.mkdtemp(prefix="wpp-stream-cache-")
+    try:
+        cmd = [sys.executable, "-m", "benchmarks.streaming", "--child", part, "--mb", str(mb), "--work", week_dir]
+        env = dict(os.environ, WPP_CACHE_DIR=cache_dir, WPP_PROJECT="0", WPP_STREAM_MB="0")
+        proc = subprocess.run(cmd, cwd=SCRIPTS_DIR, env=env, capture_output=True, text=True, check=True)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Whole-table vs streamed (WPP_STREAM_MB) facts and scans.")
+    parser.add_argument("--scale", type=float, nargs="+", default=[1, 10], help="Table size multipliers.")
+    parser.add_argument("--mb", type=float, default=4, help="Chunk size of the streamed mode in MB.")
+    parser.add_argument("--work", help="Folder for the generated weeks (default: a temporary folder, removed after).")
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed.")
+    parser.add_argument("--report", help="Optional JSON file for the results.")
+    parser.add_argument("--child", choices=PARTS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_one(args.child, args.mb, args.work)
+        return 0
+
+    work_dir = args.work or tempfile.mkdtemp(prefix="wpp-stream-bench-")
+    results = []
+    print(f"{'scale':>6} {'part':>6} {'mode':>14} {'rows':>10} {'chunks':>7} {'seconds':>8} "
+          f"{'base MB':>8} {'peak MB':>8} {'extra MB':>8}")
+    try:
+        for scale in args.scale:
+            week_dir = os.path.join(work_dir, f"scale_{scale:g}")
+            shutil.rmtree(week_dir, ignore_errors=True)
+            generate_week(week_dir, scale=scale, seed=args.seed)
+            for part in PARTS:
+                pair = [measure(part, mb, week_dir) for mb in (0, args.mb)]
+                for r in pair:
+                    r["scale"] = scale
+                    print(f"{scale:>6g} {part:>6} {r['mode']:>14} {r['rows']:>10} {r['chunks']:>7} "
+                          f"{r['seconds']:>8.2f} {r['rss_before_mb']:>8.1f} {r['peak_rss_mb']:>8.1f} "
+                          f"{r['peak_rss_mb'] - r['rss_before_mb']:>8.1f}")
+                print(f"{'':>6} {part} identical: {pair[0]['digest'] == pair[1]['digest']}")
+                results.extend(pair)
+    finally:
+        if not args.work:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return 0 if all(a["digest"] == b["digest"] for a, b in zip(results[::2], results[1::2])) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
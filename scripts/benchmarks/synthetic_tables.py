@@ -0,0 +1,259 @@
+"""
+Synthetic WPP input tables for scaling benchmarks.
+
+Writes the 14 organ-system CSVs in the WPP template: the 11-line preamble (12 for
+the endocrine table), the Function/N hierarchy with LABEL/ID columns, Process
+cells with ';'-separated fragments, the EffectorScale and TimeScale
+vocabularies as they occur in the real tables (mixed case, en dashes),
+Effector/EffectorLocation ids by scale (CL for cells, UBERON with some FTU ids
+for tissues, multi-id cells) and a matching ASCT+B master for 04/06.
+
+    cd scripts
+    python -m benchmarks.synthetic_tables --out /tmp/week --scale 10
+
+--scale N multiplies the row count of every table (1 = the size of the current
+tables, about 3900 rows in total); --rows N gives every table N rows instead.
+The vocabularies grow with the row count, so larger tables also have more
+distinct functions, processes and ids. Output is deterministic for a --seed.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# data rows per table in the 2026-01 release
+BASE_ROWS = {
+    "Cardiovascular_System": 272, "Dental_and_Craniofacial_System": 271, "Digestive_System": 232,
+    "Endocrine_System": 202, "Fascia_System": 126, "Female_Reproductive_System": 173,
+    "Immune_and_Lymphatic_System": 1113, "Integumentary_System": 490, "Male_Reproductive_System": 115,
+    "Muscular_System": 77, "Nervous_System": 488, "Pulmonary_System": 202, "Skeletal_System": 53,
+    "Urinary_System": 153,
+}
+
+COLUMNS = (
+    [f"Function/{n}{suffix}" for n in range(1, 9) for suffix in ("", "/LABEL", "/ID")]
+    + ["Function/Notes", "Process", "EffectorScale",
+       "EffectorLocation", "EffectorLocation/LABEL", "EffectorLocation/ID",
+       "Effector", "Effector/LABEL", "Effector/ID", "Signal", "Effect", "Behavior", "Behavior X", "Behavior Y",
+       "EffectParameters (quantitative values)", "SignalScale", "EffectScale", "TimeScale"]
+    + [f"ClinicalMeasure/{n}{suffix}" for n in range(1, 5) for suffix in ("", "/LABEL", "/ID")]
+    + [f"Interaction/{n}{suffix}" for n in range(1, 5) for suffix in ("", "/LABEL", "/ID")]
+    + [f"REF/{n}{suffix}" for n in range(1, 4) for suffix in ("", "/ID", "/CHAPTER", "/NOTES")]
+)
+
+# value -> weight, spellings as found in the real tables
+EFFECTOR_SCALES = {
+    "Cell": 40, "cell": 12, "Tissue": 9, "tissue": 27, "Organ": 5, "organ": 2,
+    "Organ system": 2, "Organ System": 1, "Tissue FTU": 1, "Molecule": 1, "": 0.2, "organism": 0.1,
+}
+TIME_SCALES = {
+    "hours": 12, "Hours–days": 11, "days": 10, "minutes–hours": 8, "minutes": 8, "Hours": 7, "Days": 6,
+    "seconds–minutes": 6, "milliseconds–seconds": 5, "Minutes–hours": 4, "hours–days": 4, "Days–weeks": 3,
+    "seconds": 3, "milliseconds": 2, "weeks": 2, "months": 1, "years": 1, "Weeks–months": 1,
+    "continuous": 0.5, "variable": 0.5, "": 1,
+}
+EFFECTS = {"does": 75, "increases": 21, "decreases": 4}
+BEHAVIORS = ["Induction of X by Y", "Induction of X", "X activation", "X production", "X secretion",
+             "X migration to Y", "X expression", "X differentiation", "X release", "X binding"]
+SIGNAL_SCALES = {"": 70, "paracrine": 10, "Cellular": 8, "Intra-organ": 5, "Circulatory": 4, "Systemic": 3}
+EFFECT_SCALES = {"Intra-organ (Tissue)": 80, "Circulatory": 8, "Systemic": 6, "Cell": 4, "Organ system": 2}
+FUNCTION_WORDS = ["homeostasis", "transport", "regulation", "secretion", "signaling", "repair",
+                  "metabolism", "defense", "contraction", "development", "absorption", "clearance"]
+CELL_WORDS = ["epithelial cell", "macrophage", "fibroblast", "T cell", "B cell", "endothelial cell",
+              "neuron", "myocyte", "keratinocyte", "stem cell"]
+TISSUE_WORDS = ["epithelium", "stroma", "capsule", "lobule", "duct", "membrane", "gland", "vessel wall"]
+FTU_IDS = sorted([
+    "UBERON:0004203", "UBERON:0001289", "UBERON:0004205", "UBERON:0004193", "UBERON:0001285",
+    "UBERON:0004204", "UBERON:0001229", "UBERON:0001291", "UBERON:0004647", "UBERON:0002299",
+    "UBERON:8410043", "UBERON:0000006", "UBERON:0001263", "UBERON:0014725", "UBERON:0004179",
+    "UBERON:0001983", "UBERON:0000412", "UBERON:0002073", "UBERON:0013487", "UBERON:0001213",
+    "UBERON:0001250", "UBERON:0001959", "UBERON:0002125", "UBERON:0001831", "UBERON:0001832",
+    "UBERON:0001736",
+])
+# rows generated and written at a time
+CHUNK_ROWS = 50_000
+# functions per hierarchy level below Function/1
+BRANCHING = 4
+
+
+def header_row_for(system):
+    return 12 if "endocrine" in system.lower() else 11
+
+
+def preamble(system, header_row):
+    """The template lines above the header row, padded to the column count."""
+    title = system.replace("_", " ")
+    lines = [
+        [f"Whole Person Physiome Table for {title}"], [],
+        ["Author Name(s):", "Synthetic Author"], ["Author ORCID(s):", "0000-0000-0000-0000"],
+        ["Reviewer Name(s):", "Synthetic Reviewer"], ["Reviewer ORCID(s):", "0000-0000-0000-0001"],
+        ["General Publication(s):", "Synthetic benchmark data"], ["Data DOI:"],
+        ["Date:", "1/1/2026"], ["Version Number:", "v1.0"],
+    ]
+    if header_row == 12:
+        lines.append(["Physiological Function"] + [""] * 24 + ["Physiological Process"])
+    lines.append(["List physiological functions as a hierarchy, starting with the body system in Function/1."])
+    return pd.DataFrame([line + [""] * (len(COLUMNS) - len(line)) for line in lines])
+
+
+class Vocabulary:
+    """Term pools of one table; sizes grow with the table's row count."""
+
+    def __init__(self, system, rows, rng):
+        self.system = system.replace("_", " ").lower()
+        self.rng = rng
+        n = max(rows, 50)
+        self.leaves = max(8, n // 3)
+        self.cells = [(f"CL:{1000000 + i * 37 % 8999999:07d}", f"{CELL_WORDS[i % len(CELL_WORDS)]} {i}")
+                      for i in range(max(10, n // 8))]
+        self.tissues = [(f"UBERON:{2000000 + i * 53 % 7999999:07d}", f"{TISSUE_WORDS[i % len(TISSUE_WORDS)]} {i}")
+                        for i in range(max(10, n // 10))]
+        self.molecules = [(f"CHEBI:{10000 + i}", f"molecule {i}") for i in range(max(10, n // 10))]
+        self.processes = [f"process {i}" for i in range(max(20, n // 2))]
+
+    def pick(self, weights, size):
+        values = list(weights)
+        p = np.array([weights[v] for v in values], dtype=float)
+        return np.array(values, dtype=object)[self.rng.choice(len(values), size=size, p=p / p.sum())]
+
+    def ids(self, pool, size, multi=0.1, ftu=0.0):
+        """(ids, labels) per row; a `multi` share of cells hold two ';'-separated ids."""
+        idx = self.rng.integers(len(pool), size=size)
+        ids = np.array([pool[i][0] for i in idx], dtype=object)
+        labels = np.array([pool[i][1] for i in idx], dtype=object)
+        if ftu:
+            is_ftu = self.rng.random(size) < ftu
+            ftu_ids = np.array(FTU_IDS, dtype=object)[self.rng.integers(len(FTU_IDS), size=size)]
+            ids = np.where(is_ftu, ftu_ids, ids)
+            labels = np.where(is_ftu, "functional tissue unit", labels)
+        second = self.rng.random(size) < multi
+        idx2 = self.rng.integers(len(pool), size=size)
+        ids = np.where(second, ids + "; " + np.array([pool[i][0] for i in idx2], dtype=object), ids)
+        labels = np.where(second, labels + "; " + np.array([pool[i][1] for i in idx2], dtype=object), labels)
+        return ids, labels
+
+
+def generate_rows(vocab, size):
+    """One chunk of data rows as a DataFrame with COLUMNS."""
+    rng = vocab.rng
+    out = {c: np.full(size, "", dtype=object) for c in COLUMNS}
+
+    # Function/1 is the system; a leaf at depth 2..8 fixes all its ancestors
+    depth = rng.integers(2, 9, size=size)
+    leaf = rng.integers(vocab.leaves, size=size)
+    for level in range(1, 9):
+        present = depth >= level
+        if level == 1:
+            names = np.full(size, vocab.system, dtype=object)
+            ids = np.full(size, "GO:0003008", dtype=object)
+        else:
+            node = leaf // (BRANCHING ** np.maximum(depth - level, 0)) + (level * 1000003)
+            words = np.array(FUNCTION_WORDS, dtype=object)[node % len(FUNCTION_WORDS)]
+            names = words + " " + node.astype(str)
+            ids = np.char.add("GO:", np.char.zfill((node % 10_000_000).astype(str), 7)).astype(object)
+        out[f"Function/{level}"] = np.where(present, names, "")
+        out[f"Function/{level}/LABEL"] = np.where(present, names, "")
+        out[f"Function/{level}/ID"] = np.where(present, ids, "")
+
+    procs = np.array(vocab.processes, dtype=object)
+    process = procs[rng.integers(len(procs), size=size)]
+    second = rng.random(size) < 0.15
+    out["Process"] = np.where(second, process + "; " + procs[rng.integers(len(procs), size=size)], process)
+
+    scale = vocab.pick(EFFECTOR_SCALES, size)
+    out["EffectorScale"] = scale
+    kind = np.char.lower(scale.astype(str))
+    loc_ids, loc_labels = vocab.ids(vocab.tissues, size, multi=0.05, ftu=0.08)
+    out["EffectorLocation"] = loc_labels
+    out["EffectorLocation/LABEL"] = loc_labels
+    out["EffectorLocation/ID"] = loc_ids
+
+    cell_ids, cell_labels = vocab.ids(vocab.cells, size, multi=0.1)
+    tissue_ids, tissue_labels = vocab.ids(vocab.tissues, size, multi=0.05, ftu=0.1)
+    mol_ids, mol_labels = vocab.ids(vocab.molecules, size, multi=0.05)
+    is_cell = np.char.startswith(kind, "cell")
+    is_tissue = np.char.startswith(kind, "tissue")
+    is_molecule = kind == "molecule"
+    eff_ids = np.where(is_cell, cell_ids, np.where(is_tissue, tissue_ids, np.where(is_molecule, mol_ids, loc_ids)))
+    eff_labels = np.where(is_cell, cell_labels,
+                          np.where(is_tissue, tissue_labels, np.where(is_molecule, mol_labels, loc_labels)))
+    out["Effector"] = eff_labels
+    out["Effector/LABEL"] = eff_labels
+    out["Effector/ID"] = eff_ids
+
+    mol_ids, mol_labels = vocab.ids(vocab.molecules, size, multi=0.0)
+    out["Signal"] = np.where(rng.random(size) < 0.3, mol_labels, "")
+    out["Effect"] = vocab.pick(EFFECTS, size)
+    out["Behavior"] = np.array(BEHAVIORS, dtype=object)[rng.integers(len(BEHAVIORS), size=size)]
+    out["Behavior X"] = mol_labels
+    out["SignalScale"] = vocab.pick(SIGNAL_SCALES, size)
+    out["EffectScale"] = vocab.pick(EFFECT_SCALES, size)
+    out["TimeScale"] = vocab.pick(TIME_SCALES, size)
+    out["ClinicalMeasure/1"] = np.where(rng.random(size) < 0.5, "plasma " + mol_labels, "")
+    out["REF/1"] = "Synthetic reference"
+    return pd.DataFrame(out, columns=COLUMNS)
+
+
+def write_table(path, system, rows, rng, chunk_rows=CHUNK_ROWS):
+    """Write one synthetic table; returns the ids used (for the ASCT+B master)."""
+    header_row = header_row_for(system)
+    vocab = Vocabulary(system, rows, rng)
+    with open(path, "w", encoding="utf-8", newline="") as fh:
+        preamble(system, header_row).to_csv(fh, header=False, index=False)
+        pd.DataFrame(columns=COLUMNS).to_csv(fh, index=False)
+        for start in range(0, rows, chunk_rows):
+            generate_rows(vocab, min(chunk_rows, rows - start)).to_csv(fh, header=False, index=False)
+    return vocab
+
+
+def master_frame(vocabs, rng, coverage=0.7):
+    """ASCT+B master rows for a `coverage` share of the generated cell and tissue ids."""
+    rows = []
+    for vocab in vocabs:
+        organ = vocab.system.replace(" system", "").replace(" ", "_")
+        for pool, asctb_type in ((vocab.tissues, "AS"), (vocab.cells, "CT")):
+            keep = rng.random(len(pool)) < coverage
+            rows.extend((organ, term_id, asctb_type, label) for (term_id, label), k in zip(pool, keep) if k)
+        rows.extend((organ, ftu, "AS", "functional tissue unit") for ftu in FTU_IDS[::2])
+    return pd.DataFrame(rows, columns=["organ", "id", "cf_asctb_type", "label"]).drop_duplicates()
+
+
+def generate_week(out_dir, scale=1.0, rows=None, seed=0, systems=None):
+    """
+    Lay out a week folder (data/WPP Input Tables/*.csv + data/all_asctb_ids_and_types.csv).
+    Returns {table file name: data rows}.
+    """
+    rng = np.random.default_rng(seed)
+    table_dir = os.path.join(out_dir, "data", "WPP Input Tables")
+    os.makedirs(table_dir, exist_ok=True)
+    counts, vocabs = {}, []
+    for system in systems or BASE_ROWS:
+        n = rows if rows is not None else max(1, int(round(BASE_ROWS[system] * scale)))
+        vocabs.append(write_table(os.path.join(table_dir, f"{system}.csv"), system, n, rng))
+        counts[f"{system}.csv"] = n
+    master_frame(vocabs, rng).to_csv(os.path.join(out_dir, "data", "all_asctb_ids_and_types.csv"), index=False)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic WPP input tables.")
+    parser.add_argument("--out", required=True, help="Week folder to create (data/ is written inside).")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier on the current table sizes.")
+    parser.add_argument("--rows", type=int, help="Rows per table (overrides --scale).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--systems", nargs="+", choices=sorted(BASE_ROWS), help="Only these tables.")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    counts = generate_week(args.out, args.scale, args.rows, args.seed, args.systems)
+    print(f"Wrote {len(counts)} tables, {sum(counts.values())} rows in {time.perf_counter() - start:.1f} s "
+          f"to {os.path.join(args.out, 'data')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Time and peak memory of the spatial-temporal aggregation in 02: the time-range
+bitmask (fragments_to_facts) vs the previous path that exploded every Process
+fragment once per time range of its TimeScale.
+
+    cd scripts
+    python -m benchmarks.time_mask --scale 1 10 100
+
+For every scale a week of synthetic tables is generated (benchmarks.synthetic_tables).
+Each implementation runs in its own subprocess: it builds the fragments of all
+tables with 02's table_fragments, then aggregates them. Peak RSS is ru_maxrss of
+that process, reported together with the RSS once the fragments were built. The
+facts of both are compared by digest.
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_tables import generate_week
+from wpp.vocab import TIME_MAPPING, TIME_RANGES
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TABLES_SCRIPT = os.path.join(SCRIPTS_DIR, "02-WPP_tables.py")
+
+
+def load_tables_module():
+    spec = importlib.util.spec_from_file_location("wpp_tables", TABLES_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def legacy_facts(module, fragments):
+    """The implementation before the bitmask: explode per time range, drop_duplicates, groupby."""
+    # the fragments as they were then: plain strings, "Unknown" spelled out
+    exploded = fragments.astype({"TimeScale_norm": object, "Spatial_Type": object}).fillna({"Spatial_Type": "Unknown"})
+    exploded["Time Range"] = exploded["TimeScale_norm"].map(lambda x: TIME_MAPPING.get(x, ["Unknown"]))
+    exploded = exploded.explode("Time Range")
+    facts = exploded[["Time Range", "Spatial_Type", "Function@Process"]].drop_duplicates()
+
+    is_unknown = facts["Function@Process"] == "Unknown"
+    only_unknown = is_unknown.groupby([facts["Time Range"], facts["Spatial_Type"]]).transform("all")
+    facts = facts[~only_unknown & (facts["Spatial_Type"] != "Unknown") & facts["Time Range"].isin(TIME_RANGES)]
+
+    facts = facts.rename(columns={
+        "Time Range": "time_range", "Spatial_Type": "spatial_type", "Function@Process": "function_process",
+    })
+    order = {v: i for i, v in enumerate(TIME_RANGES)}
+    facts = facts.sort_values(
+        ["time_range", "spatial_type", "function_process"],
+        key=lambda col: col.map(order) if col.name == "time_range" else col,
+    )
+    return facts.reset_index(drop=True), len(exploded)
+
+
+def max_rss_mb():
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_one(impl, week_dir):
+    """Body of the child process: fragments of every table, then the aggregation; prints a JSON line."""
+    os.chdir(week_dir)
+    module = load_tables_module()
+    fragments = [module.table_fragments(p, header_row=module.header_row_for(p))
+                 for p in module.list_tables(module.INPUT_FOLDER)]
+    rss_before = max_rss_mb()
+
+    digest = hashlib.sha256()
+    rows = facts_rows = 0
+    start = time.perf_counter()
+    for frame in fragments:
+        if impl == "legacy":
+            facts, exploded_rows = legacy_facts(module, frame)
+            rows += exploded_rows
+        else:
+            facts = module.fragments_to_facts(frame)
+            rows += len(frame)
+        facts_rows += len(facts)
+        digest.update(facts.astype(str).to_csv(index=False).encode("utf-8"))
+    seconds = time.perf_counter() - start
+
+    print(json.dumps({
+        "impl": impl,
+        "fragments": sum(len(f) for f in fragments),
+        "rows": rows,
+        "facts": facts_rows,
+        "seconds": round(seconds, 3),
+        "rss_before_mb": round(rss_before, 1),
+        "peak_rss_mb": round(max_rss_mb(), 1),
+        "digest": digest.hexdigest(),
+    }))
+
+
+def measure(impl, week_dir):
+    cmd = [sys.executable, "-m", "benchmarks.time_mask", "--child", impl, "--work", week_dir]
+    env = dict(os.environ, WPP_CACHE_DIR=os.path.join(week_dir, ".cache"))
+    proc = subprocess.run(cmd, cwd=SCRIPTS_DIR, env=env, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time-range bitmask vs explode in 02's aggregation.")
+    parser.add_argument("--scale", type=float, nargs="+", default=[1, 10], help="Table size multipliers.")
+    parser.add_argument("--work", help="Folder for the generated weeks (default: a temporary folder, removed after).")
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed.")
+    parser.add_argument("--report", help="Optional JSON file for the results.")
+    parser.add_argument("--child", choices=["legacy", "mask"], help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_one(args.child, args.work)
+        return 0
+
+    work_dir = args.work or tempfile.mkdtemp(prefix="wpp-time-mask-bench-")
+    results = []
+    print(f"{'scale':>6} {'impl':>7} {'fragments':>10} {'rows':>10} {'facts':>8} {'seconds':>8} "
+          f"{'base MB':>8} {'peak MB':>8} {'extra MB':>8}")
+    try:
+        for scale in args.scale:
+            week_dir = os.path.join(work_dir, f"scale_{scale:g}")
+            shutil.rmtree(week_dir, ignore_errors=True)
+            generate_week(week_dir, scale=scale, seed=args.seed)
+            pair = [measure(impl, week_dir) for impl in ("legacy", "mask")]
+            for r in pair:
+                r["scale"] = scale
+                print(f"{scale:>6g} {r['impl']:>7} {r['fragments']:>10} {r['rows']:>10} {r['facts']:>8} "
+                      f"{r['seconds']:>8.2f} {r['rss_before_mb']:>8.1f} {r['peak_rss_mb']:>8.1f} "
+                      f"{r['peak_rss_mb'] - r['rss_before_mb']:>8.1f}")
+            print(f"{'':>6} facts identical: {pair[0]['digest'] == pair[1]['digest']}")
+            results.extend(pair)
+    finally:
+        if not args.work:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return 0 if all(a["digest"] == b["digest"] for a, b in zip(results[::2], results[1::2])) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
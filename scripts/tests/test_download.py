@@ -0,0 +1,103 @@
+"""
+wpp.download against a local http.server stand-in.
+
+    cd scripts
+    python -m pytest -q tests
+"""
+
+import http.server
+import threading
+
+import pytest
+
+from wpp.download import download_sheets
+
+BODY = b"Function/1,Process\nA,b\n"
+ETAG = '"v1"'
+LAST_MODIFIED = "Wed, 28 Jan 2026 00:00:00 GMT"
+
+
+class SheetHandler(http.server.BaseHTTPRequestHandler):
+    """
+    /etag.csv      200 with ETag/Last-Modified, 304 when the ETag is sent back
+    /plain.csv     always 200 with the same body, no validators (content hash only)
+    /flaky.csv     503 on the first request, then 200
+    /missing.csv   404
+    """
+
+    hits = {}
+
+    def do_GET(self):
+        hits = self.hits[self.path] = self.hits.get(self.path, 0) + 1
+        if self.path == "/etag.csv":
+            if self.headers.get("If-None-Match") == ETAG:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_body(BODY, {"ETag": ETAG, "Last-Modified": LAST_MODIFIED})
+        elif self.path == "/plain.csv":
+            self.send_body(BODY)
+        elif self.path == "/flaky.csv" and hits > 1:
+            self.send_body(BODY)
+        elif self.path == "/flaky.csv":
+            self.send_error(503)
+        else:
+            self.send_error(404)
+
+    def send_body(self, body, headers=None):
+        self.send_response(200)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    SheetHandler.hits = {}
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), SheetHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def run(sheets, tmp_path):
+    return {r["file"]: r for r in download_sheets(
+        sheets, str(tmp_path / "out"), str(tmp_path / "cache"), workers=2, timeout=5, retries=2, backoff=0)}
+
+
+def test_unchanged_sheets_are_not_rewritten(server, tmp_path):
+    sheets = [("etag.csv", f"{server}/etag.csv"), ("plain.csv", f"{server}/plain.csv")]
+    first = run(sheets, tmp_path)
+    assert [first[f]["status"] for f in ("etag.csv", "plain.csv")] == ["updated", "updated"]
+    assert (tmp_path / "out" / "etag.csv").read_bytes() == BODY
+
+    second = run(sheets, tmp_path)
+    assert second["etag.csv"]["status"] == "not modified"
+    assert second["etag.csv"]["http"] == 304
+    assert second["plain.csv"]["status"] == "unchanged"
+    assert not second["etag.csv"]["written"] and not second["plain.csv"]["written"]
+    assert (tmp_path / "out" / "plain.csv").read_bytes() == BODY
+
+
+def test_transient_error_is_retried(server, tmp_path):
+    report = run([("flaky.csv", f"{server}/flaky.csv")], tmp_path)["flaky.csv"]
+    assert report["status"] == "updated"
+    assert report["attempts"] == 2
+    assert (tmp_path / "out" / "flaky.csv").read_bytes() == BODY
+
+
+def test_missing_sheet_does_not_stop_the_others(server, tmp_path):
+    reports = run([("missing.csv", f"{server}/missing.csv"), ("etag.csv", f"{server}/etag.csv")], tmp_path)
+    assert reports["missing.csv"]["status"] == "failed"
+    assert "404" in reports["missing.csv"]["error"]
+    # a 404 is not retried
+    assert reports["missing.csv"]["attempts"] == 1
+    assert reports["etag.csv"]["status"] == "updated"
+    assert not (tmp_path / "out" / "missing.csv").exists()
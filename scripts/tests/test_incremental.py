@@ -0,0 +1,56 @@
+"""
+wpp.incremental.StageCache: per-table results are reused only for the same
+content and file name.
+
+    cd scripts
+    python -m pytest -q tests
+"""
+
+import os
+
+import pytest
+
+from wpp import incremental
+
+TABLE = b"Function/1,Process\nA,b\n"
+
+
+@pytest.fixture
+def stage_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(incremental, "RESULTS_DIR", str(tmp_path / "results"))
+    monkeypatch.setattr(incremental, "MANIFEST_DIR", str(tmp_path / "manifest"))
+
+    def make():
+        cache = incremental.StageCache("test-stage", __file__)
+        cache.enabled, cache.force = True, False
+        return cache
+    return make
+
+
+def source_of(path):
+    # like the analyzers, the result carries the table's file name
+    return os.path.basename(path)
+
+
+def test_unchanged_table_is_reused(tmp_path, stage_cache):
+    path = tmp_path / "Cardiovascular_System.csv"
+    path.write_bytes(TABLE)
+    first = stage_cache()
+    assert first.table_result(str(path), source_of) == "Cardiovascular_System.csv"
+    assert first.computed == ["Cardiovascular_System.csv"]
+
+    second = stage_cache()
+    assert second.table_result(str(path), source_of) == "Cardiovascular_System.csv"
+    assert second.reused == ["Cardiovascular_System.csv"] and second.computed == []
+
+
+def test_renamed_table_is_recomputed(tmp_path, stage_cache):
+    old = tmp_path / "\ufeffCardiovascular_System.csv"
+    old.write_bytes(TABLE)
+    stage_cache().table_result(str(old), source_of)
+
+    new = tmp_path / "Cardiovascular_System.csv"
+    old.rename(new)
+    cache = stage_cache()
+    assert cache.table_result(str(new), source_of) == "Cardiovascular_System.csv"
+    assert cache.computed == ["Cardiovascular_System.csv"] and cache.reused == []
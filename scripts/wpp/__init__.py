@@ -0,0 +1,7 @@
+"""
+Shared helpers for the WPP table scripts in ./scripts.
+
+The numbered scripts are still run one by one (see run.sh) with CWD set to the
+week folder; anything they have in common lives in this package so it is
+written once.
+"""
@@ -0,0 +1,250 @@
+"""
+Prebuilt lookup index of the ASCT+B master table (data/all_asctb_ids_and_types.csv).
+
+The index is built once per master file content and stored under
+$WPP_CACHE_DIR/asctb_index/ (01 builds it right after writing the master), so
+04, 06 and ad-hoc checks load it instead of re-reading and re-normalizing the CSV.
+
+    index = load_index("./data/all_asctb_ids_and_types.csv")
+    "CL:0000236" in index                    # membership by raw id
+    index.ids(asctb_type="CT", organ="kidney")
+    index.uberon_ids("AS")                    # canonical UBERON:0000000 ids of the AS rows
+    index.labels("UBERON:0002113"); index.find_label("kidney")
+
+    python -m wpp.asctb_index <master.csv> [--id ID] [--label LABEL] [--type T] [--organ O]
+"""
+
+import argparse
+import os
+import pickle
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from wpp import handoff
+from wpp.incremental import _atomic_write, _dump_pickle
+from wpp.loader import CACHE_DIR, file_sha256
+
+INDEX_DIR = os.path.join(CACHE_DIR, "asctb_index")
+# bump when the index layout or the normalization changes
+INDEX_VERSION = 1
+
+_uberon_digits_re = re.compile(r"(\d+)")
+_uberon_re = re.compile(r"^UBERON[:_]?0*([0-9]+)$")
+_prefixed_re = re.compile(r"^[A-Z]+[:_].*$")
+
+
+def normalize_to_uberon(idstr):
+    """Canonical UBERON:0000000 form of an id, or None when it is not an UBERON id."""
+    if idstr is None:
+        return None
+    s = str(idstr).strip()
+    if s == "":
+        return None
+    s_upper = s.upper()
+    m = _uberon_re.match(s_upper)
+    if m:
+        return f"UBERON:{int(m.group(1)):07d}"
+    # if prefix is not UBERON and has colon, treat as non-uberon
+    if _prefixed_re.match(s_upper):
+        prefix = s_upper.split(":", 1)[0].split("_", 1)[0]
+        if prefix != "UBERON":
+            return None
+    md = _uberon_digits_re.search(s)
+    if not md or len(md.group(1)) < 4:
+        return None
+    return f"UBERON:{int(md.group(1)):07d}"
+
+
+def normalize_uberon_column(values):
+    """
+    normalize_to_uberon of every value as an object array (None: not an UBERON id).
+    Every distinct value is normalized once, with str.extract over the distinct values.
+    """
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    s = pd.Series(uniques, dtype=object).map(str).str.strip()
+    s_upper = s.str.upper()
+    exact = s_upper.str.extract(_uberon_re.pattern, expand=False)
+    # a prefix other than UBERON makes the id non-uberon
+    prefix = s_upper.str.split(":", n=1).str[0].str.split("_", n=1).str[0]
+    foreign = s_upper.str.match(_prefixed_re.pattern) & (prefix != "UBERON")
+    digits = s.str.extract(_uberon_digits_re.pattern, expand=False)
+    digits = digits.where(~foreign & (digits.str.len() >= 4))
+    number = exact.fillna(digits)
+    canonical = [None if pd.isna(d) else f"UBERON:{int(d):07d}" for d in number] + [None]
+    # code -1 (missing value) picks the last entry
+    return np.array(canonical, dtype=object)[codes]
+
+
+def _find_column(columns, candidates):
+    lowered = {c.lower(): c for c in columns}
+    for cand in candidates:
+        if cand in columns:
+            return cand
+        if cand.lower() in lowered:
+            return lowered[cand.lower()]
+    return None
+
+
+def _clean(val):
+    return "" if pd.isna(val) else str(val).strip()
+
+
+class AsctbIndex:
+    """Hash indexes over the master rows; every id is the stripped raw id string."""
+
+    def __init__(self, source, id_column, has_types, rows, by_id, by_type, by_organ, by_label, uberon_of):
+        self.source = source        # master file name
+        self.id_column = id_column  # master column the ids were read from
+        self.has_types = has_types  # False when the master has no cf_asctb_type column
+        self.rows = rows            # (organ, id, TYPE, label) per master row, TYPE stripped + upper-cased
+        self.by_id = by_id          # id -> row numbers
+        self.by_type = by_type      # TYPE -> set(ids)
+        self.by_organ = by_organ    # organ -> set(ids)
+        self.by_label = by_label    # lower-cased label -> set(ids)
+        self.uberon_of = uberon_of  # id -> canonical UBERON id (ids that normalize only)
+
+    def __contains__(self, term_id):
+        return str(term_id).strip() in self.by_id
+
+    def __len__(self):
+        return len(self.rows)
+
+    def ids(self, asctb_type=None, organ=None):
+        """Unique ids, optionally restricted to one cf_asctb_type and/or organ."""
+        out = set(self.by_id) if asctb_type is None else set(self.by_type.get(asctb_type.strip().upper(), ()))
+        if organ is not None:
+            out &= self.by_organ.get(organ, set())
+        return out
+
+    def rows_of_type(self, asctb_type):
+        t = asctb_type.strip().upper()
+        return sum(1 for r in self.rows if r[2] == t)
+
+    def type_counts(self):
+        """TYPE -> number of unique ids, sorted by TYPE (rows without a type are not counted)."""
+        return {t: len(ids) for t, ids in sorted(self.by_type.items()) if t}
+
+    def cl_ids(self):
+        """Ids starting with CL: (case-insensitive)."""
+        return {i for i in self.by_id if i.upper().startswith("CL:")}
+
+    def uberon_ids(self, asctb_type=None):
+        """Canonical UBERON ids of the (typed) rows; ids starting with CL are never normalized."""
+        ids = self.ids(asctb_type)
+        return {self.uberon_of[i] for i in ids if not i.upper().startswith("CL") and i in self.uberon_of}
+
+    def labels(self, term_id):
+        out = []
+        for n in self.by_id.get(str(term_id).strip(), ()):
+            label = self.rows[n][3]
+            if label and label not in out:
+                out.append(label)
+        return out
+
+    def types(self, term_id):
+        return sorted({self.rows[n][2] for n in self.by_id.get(str(term_id).strip(), ())})
+
+    def organs(self, term_id):
+        return sorted({self.rows[n][0] for n in self.by_id.get(str(term_id).strip(), ())})
+
+    def find_label(self, label):
+        """Ids whose label matches (case-insensitive, surrounding whitespace ignored)."""
+        return set(self.by_label.get(str(label).strip().lower(), ()))
+
+
+def build_index(master_path):
+    df = pd.read_csv(master_path, dtype=str)
+    id_col = _find_column(df.columns, ["id", "ID", "asctb_id", "uberon_id", "Uberon", "Uberon ID"])
+    if id_col is None:
+        id_col = next((c for c in df.columns if "id" in c.lower()), None)
+        if id_col is None:
+            raise ValueError(f"No id column in {master_path}; columns: {df.columns.tolist()}")
+    type_col = _find_column(df.columns, ["cf_asctb_type"])
+    organ_col = _find_column(df.columns, ["organ"])
+    label_col = _find_column(df.columns, ["label"])
+
+    n = len(df)
+    ids = [_clean(v) for v in df[id_col].tolist()]
+    types = [_clean(v).upper() for v in df[type_col].tolist()] if type_col else [""] * n
+    organs = [_clean(v) for v in df[organ_col].tolist()] if organ_col else [""] * n
+    labels = [_clean(v) for v in df[label_col].tolist()] if label_col else [""] * n
+
+    rows, by_id, by_type, by_organ, by_label, uberon_of = [], {}, {}, {}, {}, {}
+    for i, (organ, term_id, asctb_type, label) in enumerate(zip(organs, ids, types, labels)):
+        rows.append((organ, term_id, asctb_type, label))
+        if not term_id:
+            continue
+        by_id.setdefault(term_id, []).append(i)
+        by_type.setdefault(asctb_type, set()).add(term_id)
+        by_organ.setdefault(organ, set()).add(term_id)
+        if label:
+            by_label.setdefault(label.lower(), set()).add(term_id)
+        if term_id not in uberon_of:
+            norm = normalize_to_uberon(term_id)
+            if norm:
+                uberon_of[term_id] = norm
+    return AsctbIndex(os.path.basename(master_path), id_col, type_col is not None,
+                      rows, by_id, by_type, by_organ, by_label, uberon_of)
+
+
+def index_path(master_path):
+    return os.path.join(INDEX_DIR, f"{file_sha256(master_path)[:32]}-v{INDEX_VERSION}.pkl")
+
+
+def load_index(master_path, rebuild=False):
+    """The index of master_path: from the on-disk cache when its content was indexed before."""
+    path = index_path(master_path)
+    if not rebuild:
+        index = handoff.lookup(path)
+        if index is not None:
+            return index
+    if not rebuild and os.path.exists(path):
+        try:
+            with open(path, "rb") as fh:
+                index = pickle.load(fh)
+            handoff.publish(path, index)
+            return index
+        except Exception as e:
+            print(f"[WARN] Unreadable ASCT+B index {path} ({e}); rebuilding.")
+    index = build_index(master_path)
+    try:
+        _atomic_write(path, lambda tmp: _dump_pickle(index, tmp))
+        handoff.publish(path, index)
+    except Exception as e:
+        print(f"[WARN] Could not store ASCT+B index {path}: {e}")
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the ASCT+B master index.")
+    parser.add_argument("master", help="Path of all_asctb_ids_and_types.csv.")
+    parser.add_argument("--id", action="append", default=[], help="Report membership, types, organs and labels of an id.")
+    parser.add_argument("--label", action="append", default=[], help="Ids carrying this label.")
+    parser.add_argument("--type", help="List the ids of this cf_asctb_type (with --organ: of that organ).")
+    parser.add_argument("--organ", help="List the ids of this organ.")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index even if it is cached.")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    index = load_index(args.master, rebuild=args.rebuild)
+    print(f"{index.source}: {len(index)} rows, {len(index.by_id)} unique ids "
+          f"(loaded in {(time.perf_counter() - start) * 1000:.1f} ms)")
+    for term_id in args.id:
+        if term_id in index:
+            print(f"{term_id}: present; types={index.types(term_id)} organs={index.organs(term_id)} labels={index.labels(term_id)}")
+        else:
+            print(f"{term_id}: not in the master")
+    for label in args.label:
+        print(f"'{label}': {sorted(index.find_label(label))}")
+    if args.type or args.organ:
+        for term_id in sorted(index.ids(args.type, args.organ)):
+            print(term_id)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
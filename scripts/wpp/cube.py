@@ -0,0 +1,241 @@
+"""
+Organ system x spatial scale x time range count cube over the spatial-temporal facts.
+
+Built from the fact table of 02 (wpp/facts.py) and stored in
+temporal_spatial_output/count_cube/:
+
+    counts.npy  int32 [system, spatial, time]   Function@Process entries per cell
+    items.npy   uint8 [system, spatial, time, ⌈items/8⌉]   packed bitmap of the entries of each cell
+    axes.json   axis labels, item vocabulary and the digest of the facts it was built from
+
+Both arrays are memory-mapped. Totals of a slice are sums of counts; unique counts
+are the popcount of the OR of the slice's bitmaps (an entry seen in several cells
+counts once).
+
+    cube = load_cube()
+    cube.total(spatial="CT", time=["<1 second", "1s - < 1min"])    # all systems
+    cube.unique(system="Urinary_System_spatial_temporal_table")
+    cube.marginal("spatial")                                        # totals per spatial scale
+
+    python -m wpp.cube [folder]                                     # shape and marginals
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from wpp import handoff
+from wpp.facts import FACTS_FOLDER, fact_inputs, load_facts, organ_system_name
+from wpp.incremental import _atomic_write, _dump_json, files_digest
+from wpp.vocab import SPATIAL_TYPE_DTYPE, SPATIAL_TYPES, TIME_RANGE_DTYPE, TIME_RANGES, category_codes
+
+CUBE_DIR = "count_cube"
+AXES = ("system", "spatial", "time")
+# bump when the stored layout changes
+CUBE_VERSION = 1
+
+# set bits per byte value
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+
+def cube_dir(folder=FACTS_FOLDER):
+    return os.path.join(folder, CUBE_DIR)
+
+
+class CountCube:
+    """Memory-mapped cube with label axes; selections are a label, a list of labels or None (all)."""
+
+    def __init__(self, counts, items, axes):
+        self.counts = counts
+        self.bits = items
+        self.tables = axes["tables"]
+        self.systems = axes["systems"]
+        self.spatial = axes["spatial"]
+        self.time = axes["time"]
+        self.items = axes["items"]
+        self.digest = axes["digest"]
+        self._pos = {
+            "system": {t: i for i, t in enumerate(self.tables)},
+            "spatial": {s: i for i, s in enumerate(self.spatial)},
+            "time": {t: i for i, t in enumerate(self.time)},
+        }
+
+    @property
+    def shape(self):
+        return self.counts.shape
+
+    def _index(self, axis, sel):
+        if sel is None:
+            return slice(None)
+        pos = self._pos[axis]
+        if isinstance(sel, str):
+            return [pos[sel]]
+        return [pos[s] for s in sel]
+
+    def _select(self, array, system=None, spatial=None, time=None):
+        # one axis at a time: fancy-indexing several axes at once would pair the index lists
+        out = array[self._index("system", system)]
+        out = out[:, self._index("spatial", spatial)]
+        return out[:, :, self._index("time", time)]
+
+    def slice(self, system=None, spatial=None, time=None):
+        """Counts of the selected cells, axes kept (system, spatial, time)."""
+        return np.asarray(self._select(self.counts, system, spatial, time))
+
+    def total(self, system=None, spatial=None, time=None):
+        """Number of entries over the selected cells (an entry in two cells counts twice)."""
+        return int(self.slice(system, spatial, time).sum())
+
+    def _union(self, system=None, spatial=None, time=None):
+        bits = self._select(self.bits, system, spatial, time)
+        return np.bitwise_or.reduce(bits.reshape(-1, bits.shape[-1]), axis=0)
+
+    def unique(self, system=None, spatial=None, time=None):
+        """Number of distinct entries over the selected cells."""
+        if not self.items:
+            return 0
+        return int(_POPCOUNT[self._union(system, spatial, time)].sum())
+
+    def entries(self, system=None, spatial=None, time=None):
+        """The distinct Function@Process entries of the selected cells, sorted."""
+        if not self.items:
+            return []
+        flags = np.unpackbits(self._union(system, spatial, time))[:len(self.items)]
+        return [self.items[i] for i in np.flatnonzero(flags)]
+
+    def marginal(self, axis, system=None, spatial=None, time=None):
+        """Totals per label of one axis ("system", "spatial" or "time") over the selection."""
+        counts = self.slice(system, spatial, time)
+        keep = AXES.index(axis)
+        sums = counts.sum(axis=tuple(a for a in range(3) if a != keep))
+        labels = {"system": self.tables, "spatial": self.spatial, "time": self.time}[axis]
+        idx = self._index(axis, {"system": system, "spatial": spatial, "time": time}[axis])
+        labels = labels if idx == slice(None) else [labels[i] for i in idx]
+        return dict(zip(labels, (int(v) for v in sums)))
+
+    def cells(self):
+        """
+        Non-empty cells as a frame (table, organ_system, time_range, spatial_type, count),
+        ordered by spatial scale, table, time range.
+        """
+        sp, sy, tm = np.nonzero(np.asarray(self.counts).transpose(1, 0, 2))
+        return pd.DataFrame({
+            "table": [self.tables[i] for i in sy],
+            "organ_system": [self.systems[i] for i in sy],
+            "time_range": [self.time[i] for i in tm],
+            "spatial_type": [self.spatial[i] for i in sp],
+            "count": np.asarray(self.counts)[sy, sp, tm].astype(np.int64),
+        })
+
+    def organ_system_order(self):
+        """Organ system labels of the system axis, first occurrence order."""
+        order = []
+        for name in self.systems:
+            if name not in order:
+                order.append(name)
+        return order
+
+
+def build_cube(facts, digest=""):
+    """Dense counts and packed entry bitmaps of a fact table (see wpp/facts.py)."""
+    tables = sorted(facts["table"].cat.categories)
+    items = sorted(set(facts["function_process"].astype(str)))
+    shape = (len(tables), len(SPATIAL_TYPES), len(TIME_RANGES))
+
+    sys_idx = category_codes(facts["table"], pd.CategoricalDtype(tables))
+    sp_idx = category_codes(facts["spatial_type"], SPATIAL_TYPE_DTYPE)
+    tm_idx = category_codes(facts["time_range"], TIME_RANGE_DTYPE)
+    it_idx = category_codes(facts["function_process"].astype(str), pd.CategoricalDtype(items))
+    # facts outside the axes (e.g. derived from a hand-edited CSV) are left out
+    ok = (sp_idx >= 0) & (tm_idx >= 0)
+    sys_idx, sp_idx, tm_idx, it_idx = (a[ok].astype(np.int64) for a in (sys_idx, sp_idx, tm_idx, it_idx))
+
+    counts = np.zeros(shape, dtype=np.int32)
+    np.add.at(counts, (sys_idx, sp_idx, tm_idx), 1)
+
+    # same bit order as np.packbits / np.unpackbits (first item = highest bit of byte 0)
+    bits = np.zeros(shape + ((len(items) + 7) // 8,), dtype=np.uint8)
+    np.bitwise_or.at(bits, (sys_idx, sp_idx, tm_idx, it_idx >> 3), (0x80 >> (it_idx & 7)).astype(np.uint8))
+
+    axes = {
+        "version": CUBE_VERSION,
+        "digest": digest,
+        "tables": tables,
+        "systems": [organ_system_name(t) for t in tables],
+        "spatial": SPATIAL_TYPES,
+        "time": TIME_RANGES,
+        "items": items,
+    }
+    return CountCube(counts, bits, axes)
+
+
+def _save_array(array, path):
+    def write(tmp):
+        with open(tmp, "wb") as fh:
+            np.save(fh, array)
+    _atomic_write(path, write)
+
+
+def save_cube(cube, folder=FACTS_FOLDER):
+    out = cube_dir(folder)
+    _save_array(np.asarray(cube.counts), os.path.join(out, "counts.npy"))
+    _save_array(np.asarray(cube.bits), os.path.join(out, "items.npy"))
+    axes = {
+        "version": CUBE_VERSION, "digest": cube.digest, "tables": cube.tables, "systems": cube.systems,
+        "spatial": cube.spatial, "time": cube.time, "items": cube.items,
+    }
+    # written last: a cube whose axes.json does not match the facts is rebuilt
+    _atomic_write(os.path.join(out, "axes.json"), lambda tmp: _dump_json(axes, tmp))
+    return out
+
+
+def _read_cube(folder):
+    out = cube_dir(folder)
+    with open(os.path.join(out, "axes.json"), encoding="utf-8") as fh:
+        axes = json.load(fh)
+    counts = np.load(os.path.join(out, "counts.npy"), mmap_mode="r")
+    bits = np.load(os.path.join(out, "items.npy"), mmap_mode="r")
+    return CountCube(counts, bits, axes), axes.get("version")
+
+
+def load_cube(folder=FACTS_FOLDER):
+    """The cube of folder's facts: memory-mapped from disk, (re)built when missing or stale."""
+    digest = files_digest(fact_inputs(folder))
+    axes_path = os.path.join(cube_dir(folder), "axes.json")
+    cube = handoff.lookup(axes_path)
+    if cube is not None and cube.digest == digest:
+        return cube
+    try:
+        cube, version = _read_cube(folder)
+        if version == CUBE_VERSION and cube.digest == digest:
+            handoff.publish(axes_path, cube)
+            return cube
+    except (OSError, ValueError, KeyError):
+        pass
+    cube = build_cube(load_facts(folder), digest)
+    try:
+        save_cube(cube, folder)
+        cube, _ = _read_cube(folder)
+        handoff.publish(axes_path, cube)
+    except OSError as e:
+        print(f"[WARN] Could not store the count cube in {cube_dir(folder)}: {e}")
+    return cube
+
+
+def main(argv=None):
+    import sys
+    args = sys.argv[1:] if argv is None else argv
+    cube = load_cube(args[0] if args else FACTS_FOLDER)
+    print(f"Count cube {cube.shape[0]} systems x {cube.shape[1]} spatial x {cube.shape[2]} time, {len(cube.items)} distinct entries")
+    for axis in AXES:
+        print(f"\nTotal entries per {axis}:")
+        for label, value in cube.marginal(axis).items():
+            print(f"  {label}: {value}")
+    print(f"\nAll cells: {cube.total()} entries, {cube.unique()} distinct")
+    return 0
+
+
+if __name__ == "__main__":
+    main()
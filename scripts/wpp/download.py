@@ -0,0 +1,269 @@
+"""
+Download the WPP Google Sheets listed in sheets_to_fetch.csv.
+
+    python -m wpp.download --sheets sheets_to_fetch.csv --out "<week>/data/WPP Input Tables"
+
+- sheets are fetched concurrently by a bounded worker pool (--workers)
+- failed requests are retried with exponential backoff (--retries, --backoff)
+- conditional requests: the ETag / Last-Modified of the last download are sent back,
+  and a 304 (or a body with the same content hash) reuses the cached copy, so an
+  unchanged sheet is not rewritten
+- one sheet failing does not stop the others; if a cached copy exists it is used
+  instead (reported as "stale")
+- a per-sheet timing report is printed at the end (and written with --report)
+
+Nothing here is specific to Google: any HTTP server works, e.g. a local
+`python -m http.server` for testing.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import random
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+CACHE_DIR = os.environ.get("WPP_CACHE_DIR", "./.cache")
+DOWNLOAD_CACHE_DIR = os.path.join(CACHE_DIR, "downloads")
+META_FILE = "meta.json"
+
+RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+_local = threading.local()
+
+
+class DownloadError(RuntimeError):
+    def __init__(self, message, attempts, status=None):
+        super().__init__(message)
+        self.attempts = attempts
+        self.status = status
+
+
+def session():
+    """One pooled requests.Session per worker thread (Session is not thread-safe)."""
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def read_sheet_list(path):
+    """(file name, url) pairs from sheets_to_fetch.csv; blank or incomplete lines are skipped."""
+    sheets = []
+    # utf-8-sig: the list is edited in Excel/Sheets and starts with a BOM, which the old
+    # curl loop kept in the first file name (\ufeffCardiovascular_System.csv)
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        for row in csv.reader(fh):
+            if len(row) < 2:
+                continue
+            fname, url = row[0].strip(), row[1].strip()
+            if fname and url:
+                sheets.append((fname, url))
+    return sheets
+
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def atomic_write(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+def place_copy(cached_path, out_path, digest):
+    """Copy the cached body to out_path unless an identical file is already there."""
+    if os.path.exists(out_path) and sha256_file(out_path) == digest:
+        return False
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    tmp = f"{out_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    shutil.copyfile(cached_path, tmp)
+    os.replace(tmp, out_path)
+    return True
+
+
+def fetch(url, headers, timeout, retries, backoff):
+    """GET with retry + exponential backoff. Returns (response, attempts)."""
+    attempt = 0
+    while True:
+        attempt += 1
+        status = None
+        try:
+            resp = session().get(url, headers=headers, timeout=timeout, allow_redirects=True)
+            if resp.status_code not in RETRY_STATUS:
+                return resp, attempt
+            status = resp.status_code
+            error = f"HTTP {status}"
+        except requests.RequestException as e:
+            error = str(e)
+        if attempt > retries:
+            raise DownloadError(f"{error} (after {attempt} attempts)", attempt, status)
+        # exponential backoff with a little jitter so workers do not retry in lockstep
+        time.sleep(backoff * (2 ** (attempt - 1)) * (1 + random.random() * 0.25))
+
+
+def download_one(fname, url, out_dir, cache_dir, meta, timeout, retries, backoff):
+    """Fetch one sheet; returns (report dict, metadata entry). Never raises."""
+    start = time.perf_counter()
+    out_path = os.path.join(out_dir, fname)
+    cached_path = os.path.join(cache_dir, fname)
+    prev = meta.get(fname, {}) if meta.get(fname, {}).get("url") == url else {}
+    have_cached = bool(prev) and os.path.exists(cached_path)
+
+    headers = {}
+    if have_cached:
+        if prev.get("etag"):
+            headers["If-None-Match"] = prev["etag"]
+        if prev.get("last_modified"):
+            headers["If-Modified-Since"] = prev["last_modified"]
+
+    report = {"file": fname, "url": url, "status": "", "http": None, "attempts": 0, "bytes": 0, "seconds": 0.0}
+    entry = dict(prev)
+    try:
+        resp, report["attempts"] = fetch(url, headers, timeout, retries, backoff)
+        report["http"] = resp.status_code
+        if resp.status_code == 304:
+            if not have_cached:
+                raise RuntimeError("HTTP 304 but no cached copy to reuse")
+            report["status"] = "not modified"
+            written = place_copy(cached_path, out_path, prev["sha256"])
+        else:
+            resp.raise_for_status()
+            body = resp.content
+            digest = sha256_bytes(body)
+            report["bytes"] = len(body)
+            entry = {
+                "url": url,
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+                "sha256": digest,
+            }
+            if have_cached and prev.get("sha256") == digest:
+                report["status"] = "unchanged"
+            else:
+                report["status"] = "updated"
+                atomic_write(cached_path, body)
+            written = place_copy(cached_path, out_path, digest)
+        entry["checked"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        report["written"] = written
+    except Exception as e:
+        report["error"] = str(e)
+        if isinstance(e, DownloadError):
+            report["attempts"], report["http"] = e.attempts, e.status
+        if have_cached:
+            # keep the pipeline going with last known content
+            report["status"] = "stale"
+            report["written"] = place_copy(cached_path, out_path, prev["sha256"])
+        else:
+            report["status"] = "failed"
+            report["written"] = False
+    report["seconds"] = time.perf_counter() - start
+    return report, entry
+
+
+def load_meta(cache_dir):
+    path = os.path.join(cache_dir, META_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except Exception as e:
+        print(f"[WARN] Ignoring unreadable download metadata {path}: {e}")
+        return {}
+
+
+def save_meta(cache_dir, meta):
+    data = json.dumps(meta, indent=2, sort_keys=True).encode("utf-8")
+    atomic_write(os.path.join(cache_dir, META_FILE), data)
+
+
+def download_sheets(sheets, out_dir, cache_dir=DOWNLOAD_CACHE_DIR, workers=4, timeout=60, retries=3, backoff=1.0):
+    """Download all sheets; returns the per-sheet reports in the order of `sheets`."""
+    os.makedirs(out_dir, exist_ok=True)
+    os.makedirs(cache_dir, exist_ok=True)
+    meta = load_meta(cache_dir)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [
+            pool.submit(download_one, fname, url, out_dir, cache_dir, meta, timeout, retries, backoff)
+            for fname, url in sheets
+        ]
+        results = [f.result() for f in futures]
+
+    reports = []
+    for (fname, _), (report, entry) in zip(sheets, results):
+        if entry:
+            meta[fname] = entry
+        reports.append(report)
+    save_meta(cache_dir, meta)
+    return reports
+
+
+def print_report(reports, wall):
+    print("\n=== Download report ===")
+    for r in reports:
+        line = f"  {r['file']}: {r['status']} http={r['http']} attempts={r['attempts']} bytes={r['bytes']} {r['seconds']:.2f}s"
+        if not r.get("written") and r["status"] != "failed":
+            line += " (not rewritten)"
+        if r.get("error"):
+            line += f" error={r['error']}"
+        print(line)
+    counts = {}
+    for r in reports:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    print(f"  total: {len(reports)} sheets in {wall:.2f}s -> " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download the WPP sheets listed in sheets_to_fetch.csv.")
+    parser.add_argument("--sheets", required=True, help="CSV of (file name, url) lines.")
+    parser.add_argument("--out", required=True, help="Folder the sheets are written to.")
+    parser.add_argument("--cache-dir", default=DOWNLOAD_CACHE_DIR, help="Where bodies and ETag/Last-Modified metadata are kept.")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent downloads (default 4).")
+    parser.add_argument("--retries", type=int, default=3, help="Retries per sheet after the first attempt (default 3).")
+    parser.add_argument("--backoff", type=float, default=1.0, help="Initial backoff in seconds, doubled per retry (default 1).")
+    parser.add_argument("--timeout", type=float, default=60, help="Per-request timeout in seconds (default 60).")
+    parser.add_argument("--report", help="Optional JSON file for the per-sheet report.")
+    args = parser.parse_args(argv)
+
+    sheets = read_sheet_list(args.sheets)
+    if not sheets:
+        print(f"No sheets listed in {args.sheets}")
+        return 0
+
+    print(f"Downloading {len(sheets)} sheets -> {args.out} (workers={args.workers})")
+    start = time.perf_counter()
+    reports = download_sheets(sheets, args.out, args.cache_dir, args.workers, args.timeout, args.retries, args.backoff)
+    wall = time.perf_counter() - start
+    print_report(reports, wall)
+
+    if args.report:
+        atomic_write(args.report, json.dumps({"seconds": wall, "sheets": reports}, indent=2).encode("utf-8"))
+
+    failed = [r["file"] for r in reports if r["status"] == "failed"]
+    if failed:
+        print(f"ERROR: {len(failed)} sheet(s) could not be downloaded: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
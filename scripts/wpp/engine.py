@@ -0,0 +1,250 @@
+"""
+Single-pass analysis engine over the WPP input tables.
+
+Scripts 03, 05, 11, 12 and 13 each need a per-table scan of the same sheets. The
+engine walks every row of a table exactly once and hands it to all registered
+analyzers (see wpp/analyzers.py); the per-analyzer results of that one walk are
+kept in memory and on disk under $WPP_CACHE_DIR/scans/, keyed by the table's file
+name, content hash and the code of this package. The first script that asks for
+a table therefore scans it for all of them, and the later scripts pick up their
+part of the result.
+
+    result = table_scan(path, "CT")   # the CT analyzer's result for this table
+    ...
+    print_analyzer_report()           # CPU time per analyzer
+"""
+
+import itertools
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+from wpp import loader
+from wpp.incremental import _atomic_write, _dump_pickle, code_digest
+from wpp.loader import CACHE_DIR, file_sha256, load_table
+
+SCAN_CACHE_DIR = os.path.join(CACHE_DIR, "scans")
+# any change to the package (analyzers included) invalidates cached scans
+SCAN_CODE = code_digest(__file__)[:16]
+
+# analyzer name -> class, in registration order
+REGISTRY = {}
+# in-process memo: cache key -> scan
+_memo = {}
+# (file name, source, scan) for every table_scan call in this process
+SCAN_LOG = []
+
+
+class Analyzer:
+    """
+    One analysis fed by the shared row walk. A fresh instance is made per table:
+
+        begin(fname, df)  pick columns; return False to receive no rows
+        columns()         the columns row() reads (None: all of them)
+        row(idx, row)     row is a dict column -> cell value (NaN for empty cells)
+        rows(df)          instead of row() when vectorized = True: a whole table
+                          (or chunk) at once, with the columns the analyzer declared
+        finish()          return the per-table result (must be picklable)
+
+    begin() may only look at df.columns: with WPP_PROJECT=1 it gets the header
+    alone and the table is read with just the columns the analyzers declare, and
+    with WPP_STREAM_MB=N the rows arrive chunk by chunk (wpp.loader.iter_chunks),
+    so whatever row() collects must simply keep accumulating.
+
+    Anything the analyzer wants to tell the user goes to self.messages; it is
+    printed by the script that asks for this analyzer's result.
+    """
+
+    name = ""
+    vectorized = False
+
+    def __init__(self):
+        self.messages = []
+
+    def begin(self, fname, df):
+        return True
+
+    def columns(self):
+        return None
+
+    def row(self, idx, row):
+        pass
+
+    def rows(self, df):
+        pass
+
+    def finish(self):
+        return None
+
+
+def register(cls):
+    REGISTRY[cls.name] = cls
+    return cls
+
+
+def declared_columns(fname, header):
+    """Columns of header that the registered analyzers read, or None when one of them reads all."""
+    frame = pd.DataFrame(columns=header)
+    wanted = set()
+    for cls in REGISTRY.values():
+        a = cls()
+        if not a.begin(fname, frame):
+            continue
+        cols = a.columns()
+        if cols is None:
+            return None
+        wanted.update(c for c in cols if c is not None)
+    return [c for c in header if c in wanted]
+
+
+def walk(fname, df, analyzers, header=None):
+    """
+    Feed every row of df to the analyzers in one pass.
+    df may also be an iterable of row chunks of the table (streamed load); the analyzers
+    keep accumulating over the chunks, so the result is that of the whole table.
+    With header (a projected df or chunks, see declared_columns) begin() sees that
+    header and the header columns missing from df - dropped as empty - are NaN in every row.
+    Returns {name: result}, {name: messages}, {name: CPU seconds}.
+    """
+    chunks = [df] if isinstance(df, pd.DataFrame) else df
+    frame = df if header is None else pd.DataFrame(columns=header)
+    cpu = {a.name: 0.0 for a in analyzers}
+    active = []
+    for a in analyzers:
+        start = time.process_time()
+        if a.begin(fname, frame):
+            active.append(a)
+        cpu[a.name] += time.process_time() - start
+
+    columns = None
+    if active and header is not None:
+        declared = [a.columns() for a in active]
+        if all(cols is not None for cols in declared):
+            wanted = {c for cols in declared for c in cols if c is not None}
+            columns = [c for c in header if c in wanted]
+        else:
+            columns = list(header)
+
+    per_row = [a for a in active if not a.vectorized]
+    for chunk in (chunks if active else ()):
+        cols = list(chunk.columns) if columns is None else columns
+        present = set(chunk.columns)
+        for a in active:
+            if a.vectorized:
+                start = time.process_time()
+                a.rows(chunk if present.issuperset(cols) else chunk.reindex(columns=cols))
+                cpu[a.name] += time.process_time() - start
+        if not per_row:
+            continue
+        cells = (chunk[c].tolist() if c in present else itertools.repeat(np.nan) for c in cols)
+        # plain dicts are much cheaper to build and read than iterrows() Series
+        for idx, values in zip(chunk.index, zip(*cells)):
+            row = dict(zip(cols, values))
+            for a in per_row:
+                start = time.process_time()
+                a.row(idx, row)
+                cpu[a.name] += time.process_time() - start
+
+    results = {}
+    for a in analyzers:
+        start = time.process_time()
+        results[a.name] = a.finish()
+        cpu[a.name] += time.process_time() - start
+    return results, {a.name: a.messages for a in analyzers}, cpu
+
+
+def _counted(chunks, rows):
+    for chunk in chunks:
+        rows.append(len(chunk))
+        yield chunk
+
+
+def _scan_path(fname, digest):
+    # results depend on the file name too (source names, table prefixes)
+    safe = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in fname)
+    return os.path.join(SCAN_CACHE_DIR, f"{digest[:32]}-{SCAN_CODE}-{safe}.pkl")
+
+
+def scan(path):
+    """Results of all registered analyzers for one table (walked at most once per content)."""
+    import wpp.analyzers  # noqa: F401  (registers the built-in analyzers)
+
+    fname = os.path.basename(path)
+    cache_file = _scan_path(fname, file_sha256(path))
+
+    if cache_file in _memo:
+        SCAN_LOG.append((fname, "memory", _memo[cache_file]))
+        return _memo[cache_file]
+
+    # a stage walking this table right now holds the lock; wait and reuse its result
+    with loader.file_lock(cache_file):
+        result, source = _load_or_walk(path, fname, cache_file)
+    _memo[cache_file] = result
+    SCAN_LOG.append((fname, source, result))
+    return result
+
+
+def _load_or_walk(path, fname, cache_file):
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, "rb") as fh:
+                return pickle.load(fh), "disk"
+        except Exception as e:
+            print(f"[WARN] Unreadable scan cache {cache_file} ({e}); rescanning {fname}.")
+
+    header = loader.sniff_header(path) if loader.PROJECT or loader.STREAM_MB else None
+    columns = declared_columns(fname, header) if loader.PROJECT else None
+    rows = []
+    if loader.STREAM_MB:
+        # walked chunk by chunk as they are parsed (the time below includes the parsing)
+        df = _counted(loader.iter_chunks(path, columns=columns), rows)
+    else:
+        if columns is None:
+            header = None
+            df = load_table(path)
+        else:
+            df = loader.load_columns(path, columns)
+        rows.append(len(df))
+    start = time.perf_counter()
+    results, messages, cpu = walk(fname, df, [cls() for cls in REGISTRY.values()], header)
+    result = {
+        "results": results,
+        "messages": messages,
+        "cpu": cpu,
+        "rows": sum(rows),
+        "seconds": time.perf_counter() - start,
+    }
+    try:
+        _atomic_write(cache_file, lambda tmp: _dump_pickle(result, tmp))
+    except Exception as e:
+        print(f"[WARN] Could not cache scan of {fname}: {e}")
+    return result, "walked"
+
+
+def table_scan(path, name):
+    """One analyzer's result for the table at path; prints that analyzer's messages."""
+    result = scan(path)
+    for msg in result["messages"].get(name, []):
+        print(msg)
+    return result["results"][name]
+
+
+def print_analyzer_report():
+    """CPU time per analyzer, for the tables walked in this process and those reused."""
+    if not SCAN_LOG:
+        return
+    print("\n=== Single-pass analyzers ===")
+    walked = [(f, s) for f, src, s in SCAN_LOG if src == "walked"]
+    reused = [f for f, src, _ in SCAN_LOG if src != "walked"]
+    for fname, s in walked:
+        print(f"  {fname}: walked {s['rows']} rows in {s['seconds'] * 1000:.1f} ms")
+    print(f"  tables walked here: {len(walked)}  reused from an earlier walk: {len(reused)}")
+    totals = {}
+    for s in {f: s for f, _, s in SCAN_LOG}.values():
+        for name, secs in s["cpu"].items():
+            totals[name] = totals.get(name, 0.0) + secs
+    for name in REGISTRY:
+        print(f"  {name}: {totals.get(name, 0.0) * 1000:.1f} ms CPU")
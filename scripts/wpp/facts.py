@@ -0,0 +1,109 @@
+"""
+Long-format spatial-temporal fact table written by 02.
+
+One row per (table, Time Range, Spatial_Type, Function@Process), stored as
+temporal_spatial_output/spatial_temporal_facts.parquet next to the per-table
+CSV pivots (which render the same facts as "? "-joined cells). 07, 08 and 10
+count from it (through the count cube of wpp/cube.py) instead of re-splitting
+the pivot cells.
+
+    facts = load_facts()                       # Parquet, or derived from the CSV pivots
+"""
+
+import glob
+import os
+import re
+
+import pandas as pd
+
+from wpp import handoff
+from wpp.incremental import _atomic_write
+from wpp.vocab import SPATIAL_TYPE_DTYPE, SPATIAL_TYPES, TIME_RANGE_DTYPE
+
+FACTS_FOLDER = "./temporal_spatial_output/"
+FACTS_FILE = "spatial_temporal_facts.parquet"
+FACT_COLUMNS = ["table", "organ_system", "time_range", "spatial_type", "function_process"]
+
+# separator of the entries in a pivot cell
+ENTRY_SEPARATOR = "?"
+
+
+def facts_path(folder=FACTS_FOLDER):
+    return os.path.join(folder, FACTS_FILE)
+
+
+def organ_system_name(filename):
+    """
+    First two words of a pivot file name, e.g.
+    'Male_Reproductive_System_spatial_temporal_table.csv' -> 'Male Reproductive'
+    """
+    base = os.path.basename(filename)
+    base = re.sub(r"_final_spatial_temporal_v3\.csv$", "", base, flags=re.IGNORECASE)
+    base = re.sub(r"\.csv$", "", base, flags=re.IGNORECASE)
+    parts = base.split("_")
+    if len(parts) >= 2:
+        return " ".join(parts[:2])
+    return parts[0]
+
+
+def _categorical(facts, tables):
+    # every table is a category, also those without facts (08 draws an axis tick for each)
+    facts["table"] = pd.Categorical(facts["table"], categories=tables)
+    facts["organ_system"] = facts["organ_system"].astype("category")
+    facts["time_range"] = facts["time_range"].astype(TIME_RANGE_DTYPE)
+    facts["spatial_type"] = facts["spatial_type"].astype(SPATIAL_TYPE_DTYPE)
+    return facts
+
+
+def combine_facts(per_table):
+    """
+    Stack the per-table facts of 02 (time_range, spatial_type, function_process)
+    given as [(pivot CSV file name, facts), ...] into one fact table, in that order.
+    """
+    frames, tables = [], []
+    for fname, facts in per_table:
+        frame = facts[["time_range", "spatial_type", "function_process"]].copy()
+        frame.insert(0, "organ_system", organ_system_name(fname))
+        tables.append(os.path.splitext(os.path.basename(fname))[0])
+        frame.insert(0, "table", tables[-1])
+        frames.append(frame)
+    if not frames:
+        return _categorical(pd.DataFrame({c: pd.Series(dtype=object) for c in FACT_COLUMNS}), tables)
+    return _categorical(pd.concat(frames, ignore_index=True), tables)
+
+
+def write_facts(facts, path=None):
+    path = path or facts_path()
+    _atomic_write(path, lambda tmp: facts.to_parquet(tmp, index=False))
+    handoff.publish(path, facts)
+    return path
+
+
+def pivot_to_facts(pivot, fname):
+    """Facts of one CSV pivot (for output folders written before the fact table existed)."""
+    rows = []
+    for _, r in pivot.iterrows():
+        for spatial in SPATIAL_TYPES:
+            cell = r.get(spatial)
+            if pd.isna(cell):
+                continue
+            for item in str(cell).split(ENTRY_SEPARATOR):
+                if item.strip():
+                    rows.append((r["Time Range"], spatial, item.strip()))
+    return pd.DataFrame(rows, columns=["time_range", "spatial_type", "function_process"])
+
+
+def load_facts(folder=FACTS_FOLDER):
+    """The fact table of folder; rebuilt from its CSV pivots when 02 did not write one."""
+    path = facts_path(folder)
+    if os.path.exists(path):
+        return handoff.read(path, pd.read_parquet)
+    files = sorted(glob.glob(os.path.join(folder, "*.csv")))
+    print(f"[INFO] {path} not found; deriving facts from {len(files)} CSV pivots.")
+    return combine_facts([(f, pivot_to_facts(pd.read_csv(f, dtype=object), f)) for f in files])
+
+
+def fact_inputs(folder=FACTS_FOLDER):
+    """Files load_facts() reads (for the incremental stage caches)."""
+    path = facts_path(folder)
+    return [path] if os.path.exists(path) else sorted(glob.glob(os.path.join(folder, "*.csv")))
@@ -0,0 +1,63 @@
+"""
+In-memory hand-off of results between stages that run in one interpreter.
+
+The in-process pipeline runner (wpp/inprocess.py) turns this on. A stage that
+writes a file a later stage reads also publishes the object it wrote; the later
+stage gets that object back instead of re-reading the file, as long as the file
+is unchanged (same size and modification time) since it was published. The
+files are written either way, and with one process per stage nothing is
+published.
+
+    write_facts(facts, path); publish(path, facts)
+    facts = read(path, pd.read_parquet)       # published frame (a copy) or the file
+"""
+
+import os
+
+ENABLED = False
+# absolute path -> (file stamp, object)
+_published = {}
+# paths served from memory in this process
+HITS = []
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def publish(path, obj):
+    """Keep obj as the content of the file at path (no-op unless enabled)."""
+    if not ENABLED:
+        return
+    try:
+        _published[os.path.abspath(path)] = (_stamp(path), obj)
+    except OSError:
+        pass
+
+
+def lookup(path):
+    """The object published for path if the file has not changed since, else None."""
+    entry = _published.get(os.path.abspath(path))
+    if entry is None:
+        return None
+    try:
+        if _stamp(path) != entry[0]:
+            return None
+    except OSError:
+        return None
+    HITS.append(path)
+    return entry[1]
+
+
+def read(path, reader):
+    """The published DataFrame of path (copied, callers may modify it), else reader(path)."""
+    obj = lookup(path)
+    if obj is None:
+        return reader(path)
+    return obj.copy()
+
+
+def clear():
+    _published.clear()
+    HITS.clear()
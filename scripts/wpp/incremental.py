@@ -0,0 +1,208 @@
+"""
+Incremental mode: reuse per-table results of tables whose content did not change.
+
+Enabled with `./run.sh --incremental` (WPP_INCREMENTAL=1); `--force` (WPP_FORCE=1)
+recomputes everything but still refreshes the cache.
+
+Each stage keeps
+ - a manifest  $WPP_CACHE_DIR/manifest/<stage>.json  (table file -> content hash
+   seen on the last run), used to report which tables changed, and
+ - its per-table intermediate results under $WPP_CACHE_DIR/results/<stage>/,
+   keyed by the table's content hash, its file name (the results carry source
+   names and table prefixes) and a hash of the code that produced them,
+   so editing a script invalidates its cached results automatically.
+
+Cross-table outputs are always re-merged from the per-table results.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+
+from wpp.loader import CACHE_DIR, file_sha256
+
+INCREMENTAL = os.environ.get("WPP_INCREMENTAL", "") == "1"
+FORCE = os.environ.get("WPP_FORCE", "") == "1"
+
+MANIFEST_DIR = os.path.join(CACHE_DIR, "manifest")
+RESULTS_DIR = os.path.join(CACHE_DIR, "results")
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def code_digest(script_path):
+    """Hash of the stage script plus the shared wpp package it imports."""
+    h = hashlib.sha256()
+    for p in [script_path] + sorted(glob.glob(os.path.join(PACKAGE_DIR, "*.py"))):
+        with open(p, "rb") as fh:
+            h.update(fh.read())
+    return h.hexdigest()
+
+
+def files_digest(paths):
+    """Combined content hash of several files (names included, order-independent)."""
+    h = hashlib.sha256()
+    for p in sorted(paths):
+        h.update(os.path.basename(p).encode("utf-8"))
+        h.update(file_sha256(p).encode("ascii"))
+    return h.hexdigest()
+
+
+def _atomic_write(path, write):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def _dump_pickle(obj, path):
+    with open(path, "wb") as fh:
+        pickle.dump(obj, fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _dump_json(obj, path):
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(obj, fh, indent=2, sort_keys=True)
+
+
+class StageCache:
+    """
+    Per-table result cache for one pipeline stage.
+
+        cache = StageCache("05-CT_extracts_WPP", __file__)
+        partial = cache.table_result(path, scan_file)
+        ...
+        cache.save()
+    """
+
+    def __init__(self, stage, script_path, enabled=None):
+        self.stage = stage
+        # enabled=True: cache this stage's results even outside incremental mode
+        self.enabled = INCREMENTAL if enabled is None else enabled
+        self.force = FORCE
+        self.code = code_digest(script_path)[:16]
+        self.manifest_path = os.path.join(MANIFEST_DIR, f"{stage}.json")
+        self.results_dir = os.path.join(RESULTS_DIR, stage)
+        self.previous = self._load_manifest()
+        self.current = {}
+        self.reused = []
+        self.computed = []
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, encoding="utf-8") as fh:
+                return json.load(fh).get("tables", {})
+        except Exception as e:
+            print(f"[WARN] Ignoring unreadable manifest {self.manifest_path}: {e}")
+            return {}
+
+    def _result_path(self, fname, digest):
+        # results depend on the file name too (source names, table prefixes)
+        safe = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in fname)
+        return os.path.join(self.results_dir, f"{digest[:32]}-{self.code}-{safe}.pkl")
+
+    def lookup(self, path):
+        """(True, result) when the result for this table can be reused, else (False, None)."""
+        fname = os.path.basename(path)
+        digest = file_sha256(path)
+        self.current[fname] = digest
+        result_path = self._result_path(fname, digest)
+
+        if self.enabled and not self.force and os.path.exists(result_path):
+            try:
+                with open(result_path, "rb") as fh:
+                    result = pickle.load(fh)
+                self.reused.append(fname)
+                return True, result
+            except Exception as e:
+                print(f"[WARN] Unreadable cached result for {fname} ({e}); recomputing.")
+        return False, None
+
+    def store(self, path, result):
+        """Record a freshly computed result (and cache it in incremental mode)."""
+        fname = os.path.basename(path)
+        self.computed.append(fname)
+        if self.enabled:
+            digest = self.current.get(fname) or file_sha256(path)
+            _atomic_write(self._result_path(fname, digest), lambda tmp: _dump_pickle(result, tmp))
+
+    def table_result(self, path, compute):
+        """
+        Return compute(path). In incremental mode the result is loaded from the cache when
+        this table's content (and the stage code) is unchanged, and stored after computing.
+        """
+        hit, result = self.lookup(path)
+        if hit:
+            return result
+        result = compute(path)
+        self.store(path, result)
+        return result
+
+    def changed_tables(self):
+        """Tables that are new, edited or removed since the last recorded run."""
+        changed = [f for f, d in self.current.items() if self.previous.get(f) != d]
+        removed = [f for f in self.previous if f not in self.current]
+        return sorted(changed + removed)
+
+    def cached_outputs(self, input_paths, output_paths, produce):
+        """
+        Whole-stage variant for cross-table outputs (e.g. the 3D plot): when the combined
+        inputs are unchanged, copy the cached outputs into place instead of calling produce().
+        Returns True if produce() ran.
+        """
+        for p in input_paths:
+            self.current[os.path.basename(p)] = file_sha256(p)
+        key = files_digest(input_paths)
+        if self.restore_outputs(key, output_paths):
+            return False
+        produce()
+        self.store_outputs(key, output_paths)
+        return True
+
+    def _outputs_dir(self, key):
+        return os.path.join(self.results_dir, f"{key[:32]}-{self.code}")
+
+    def restore_outputs(self, key, output_paths):
+        """
+        Copy the outputs cached under key (any content hash, e.g. of a plot's data and
+        settings) into place; False when they are not cached or the mode is off / forced.
+        """
+        cached = [os.path.join(self._outputs_dir(key), os.path.basename(p)) for p in output_paths]
+        if not (self.enabled and not self.force and all(os.path.exists(c) for c in cached)):
+            return False
+        for src, dst in zip(cached, output_paths):
+            os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+            shutil.copyfile(src, dst)
+        self.reused.extend(os.path.basename(p) for p in output_paths)
+        return True
+
+    def store_outputs(self, key, output_paths):
+        """Record freshly written outputs (and cache them under key in incremental mode)."""
+        self.computed.extend(os.path.basename(p) for p in output_paths)
+        if self.enabled:
+            for src in output_paths:
+                dst = os.path.join(self._outputs_dir(key), os.path.basename(src))
+                _atomic_write(dst, lambda tmp, src=src: shutil.copyfile(src, tmp))
+
+    def save(self):
+        """Write the manifest and print what was reused vs recomputed."""
+        if not self.enabled:
+            return
+        manifest = {
+            "stage": self.stage,
+            "code": self.code,
+            "updated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "forced": self.force,
+            "tables": self.current,
+            "changed": self.changed_tables(),
+        }
+        _atomic_write(self.manifest_path, lambda tmp: _dump_json(manifest, tmp))
+        print(f"\n=== Incremental ({self.stage}) ===")
+        print(f"  recomputed: {len(self.computed)}  reused: {len(self.reused)}  forced: {self.force}")
+        for fname in manifest["changed"]:
+            print(f"  changed since last run: {fname}")
@@ -0,0 +1,232 @@
+"""
+Run the stage scripts inside one interpreter instead of one process each.
+
+Used by `python -m wpp.pipeline --in-process` (run.sh --in-process). numpy, pandas,
+pyarrow and matplotlib are imported once up front; every stage then runs as
+__main__ of this process (see wpp.metrics.run_script), one at a time, with
+CWD = week folder and its output in its own log file. Results a later stage
+reads - the input tables (wpp/loader.py memo), the spatial-temporal facts and
+count cube of 02, the ASCT+B index - stay in memory (wpp/handoff.py); every
+stage still writes the same files.
+
+Per stage the time spent in import statements is recorded. A fresh interpreter
+is probed once (alongside the stages) for what a separate process pays: its
+start plus the cold imports of the heavy libraries. The startup saved is, over
+the stages, that cost for the libraries each one uses, minus the one preload
+and the in-process import time.
+"""
+
+import ast
+import builtins
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+import traceback
+
+from wpp import engine, handoff, loader, metrics, parallel
+
+# imported once before the first stage, in this order (a later one reuses the earlier)
+PRELOAD = ["numpy", "pandas", "pyarrow.parquet", "matplotlib.pyplot"]
+# preloaded modules a stage needs besides the ones it imports itself
+PRELOAD_DEPS = {
+    "pandas": ["numpy"],
+    # the loader cache and the fact table are Parquet
+    "pyarrow.parquet": ["numpy"],
+    "matplotlib.pyplot": ["numpy"],
+}
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class ImportClock:
+    """builtins.__import__ wrapper summing the time of the outermost import statements."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self._depth = 0
+        self._import = builtins.__import__
+
+    def __call__(self, *args, **kwargs):
+        if self._depth:
+            return self._import(*args, **kwargs)
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            return self._import(*args, **kwargs)
+        finally:
+            self._depth -= 1
+            self.seconds += time.perf_counter() - start
+
+    def __enter__(self):
+        builtins.__import__ = self
+        return self
+
+    def __exit__(self, *exc):
+        builtins.__import__ = self._import
+
+
+# run in a fresh interpreter: cold import time of each PRELOAD module
+_PROBE = (
+    "import json, time\n"
+    "out = {}\n"
+    "for name in %r:\n"
+    "    start = time.perf_counter()\n"
+    "    __import__(name)\n"
+    "    out[name] = time.perf_counter() - start\n"
+    "print(json.dumps(out))\n"
+) % (PRELOAD,)
+
+
+def probe_startup(python=sys.executable):
+    """
+    What one process per stage pays: (bare interpreter start/exit seconds, {module: cold import seconds}),
+    measured in a fresh interpreter (this one has most of them imported already).
+    """
+    env = dict(os.environ, MPLBACKEND="Agg")
+    start = time.perf_counter()
+    proc = subprocess.run([python, "-c", _PROBE], capture_output=True, text=True, env=env)
+    wall = time.perf_counter() - start
+    try:
+        imports = json.loads(proc.stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        return wall, {name: 0.0 for name in PRELOAD}
+    return max(wall - sum(imports.values()), 0.0), imports
+
+
+def preload():
+    """Import the heavy libraries into this interpreter; returns the seconds it took."""
+    import matplotlib
+    matplotlib.use("Agg")
+    start = time.perf_counter()
+    for name in PRELOAD:
+        __import__(name)
+    return time.perf_counter() - start
+
+
+def _module_file(name):
+    """Source file of a wpp module name, or None."""
+    parts = name.split(".")
+    if parts[0] != "wpp":
+        return None
+    path = os.path.join(PACKAGE_DIR, *parts[1:]) + ".py" if len(parts) > 1 else os.path.join(PACKAGE_DIR, "__init__.py")
+    return path if os.path.exists(path) else None
+
+
+def static_imports(path, seen=None):
+    """Module names imported by a script and, transitively, by the wpp modules it imports."""
+    seen = set() if seen is None else seen
+    if path in seen:
+        return set()
+    seen.add(path)
+    with open(path, encoding="utf-8") as fh:
+        tree = ast.parse(fh.read(), path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(a.name for a in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module)
+            names.update(f"{node.module}.{a.name}" for a in node.names)
+    for name in list(names):
+        f = _module_file(name)
+        if f:
+            names |= static_imports(f, seen)
+    return names
+
+
+def preloaded_for(script_path):
+    """The PRELOAD modules a script needs (directly, through wpp, or as dependencies)."""
+    imported = static_imports(script_path)
+    need = set()
+    for name in PRELOAD:
+        if any(i == name or i.startswith(name + ".") or name.startswith(i + ".") for i in imported):
+            need.add(name)
+            need.update(PRELOAD_DEPS.get(name, []))
+    # pandas reads and writes the Parquet caches through pyarrow
+    if "pandas" in need:
+        need.add("pyarrow.parquet")
+    return [n for n in PRELOAD if n in need]
+
+
+def _reset_logs():
+    # per-script reports (load, analyzer, per-file timing) cover the current stage only
+    for log in loader.LOGS:
+        del log[:]
+    del engine.SCAN_LOG[:]
+    del parallel.RUNS[:]
+
+
+def run_stage(script, week_dir, log_path, scripts_dir, metrics_out=None, profile_dir=None):
+    """
+    Run one script in this process; returns (exit code, start, end, import seconds).
+    Like pipeline.run_stage, but stdout/stderr go to log_path through sys.stdout/sys.stderr.
+    """
+    script_path = os.path.join(scripts_dir, script)
+    saved = (os.getcwd(), list(sys.argv), list(sys.path), sys.modules.get("__main__"))
+    _reset_logs()
+    start = time.time()
+    with open(log_path, "w", encoding="utf-8") as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log), ImportClock() as clock:
+        os.chdir(week_dir)
+        try:
+            if metrics_out:
+                m = metrics.measure(script_path, [], profile_dir)
+                os.makedirs(os.path.dirname(metrics_out), exist_ok=True)
+                with open(metrics_out, "w", encoding="utf-8") as fh:
+                    json.dump(m, fh, indent=2)
+                code = m["exit_code"]
+            else:
+                code = metrics.run_script(script_path, [])
+        except Exception:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.flush()
+            os.chdir(saved[0])
+            sys.argv[:] = saved[1]
+            sys.path[:] = saved[2]
+            if saved[3] is not None:
+                sys.modules["__main__"] = saved[3]
+    return code, start, time.time(), clock.seconds
+
+
+def startup_report(results, scripts_dir, preload_seconds, startup_seconds, import_seconds):
+    """
+    Estimated seconds saved against one process per stage: each stage would pay the
+    interpreter start plus the cold imports of the libraries it uses (see module doc).
+    """
+    stages = {}
+    for script, r in results.items():
+        if not r or "import_seconds" not in r:
+            continue
+        needs = preloaded_for(os.path.join(scripts_dir, script))
+        separate = startup_seconds + sum(import_seconds.get(n, 0.0) for n in needs)
+        stages[script] = {
+            "import_seconds": round(r["import_seconds"], 4),
+            "preloaded": needs,
+            "separate_process_seconds": round(separate, 4),
+        }
+    in_process = preload_seconds + sum(s["import_seconds"] for s in stages.values())
+    saved = sum(s["separate_process_seconds"] for s in stages.values()) - in_process
+    return {
+        "interpreter_startup_seconds": round(startup_seconds, 4),
+        "cold_import_seconds": {k: round(v, 4) for k, v in import_seconds.items()},
+        "preload_seconds": round(preload_seconds, 4),
+        "stages": stages,
+        "estimated_seconds_saved": round(saved, 3),
+        "handoff_hits": len(handoff.HITS),
+    }
+
+
+def print_startup_report(report):
+    print("\n=== In-process startup ===")
+    cold = ", ".join(f"{k} {v:.2f}s" for k, v in report["cold_import_seconds"].items())
+    print(f"  separate process: interpreter start {report['interpreter_startup_seconds']:.2f}s, imports {cold}")
+    print(f"  preloaded once in {report['preload_seconds']:.2f}s")
+    for script, s in report["stages"].items():
+        print(f"  {script}: imports {s['import_seconds']:.3f}s in-process "
+              f"(~{s['separate_process_seconds']:.2f}s startup as its own process)")
+    print(f"  estimated startup saved: {report['estimated_seconds_saved']:.1f}s; "
+          f"results handed over in memory: {report['handoff_hits']}")
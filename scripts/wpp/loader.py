@@ -0,0 +1,361 @@
+"""
+Parse-once loader for the WPP input tables.
+
+Every WPP sheet is parsed a single time per run: the first script that asks for a
+table reads the CSV (cold load), normalizes the headers and stores the result in
+an on-disk Parquet cache keyed by the file's content hash. Any later request for
+the same content - from the same script or from a later script in the run - is
+served from the cache (warm load).
+
+Cache location: $WPP_CACHE_DIR/tables (run.sh points WPP_CACHE_DIR at the repo's
+.cache folder; falls back to ./.cache inside the week folder).
+
+Projected loads (load_columns, used by the scans and 02 with WPP_PROJECT=1) read
+only the columns a caller names: the header is sniffed once per file, the CSV -
+or the Parquet cache when the full table was cached already - is read with just
+those columns as pyarrow-backed strings (low-cardinality vocabularies as
+categoricals), and columns that are empty in every row are dropped.
+
+Header rows and header names come from the schema catalog (wpp/schema.py),
+which finds the Function/1 row in the first lines of every table.
+
+Concurrent stages (the pipeline runner starts 02, 03, 05, 11, 12 and 13 at the
+same time) do not parse a table side by side: the cold load holds a lock file
+next to the cache entry (file_lock), and the others wait for it and read the
+cache.
+
+Streamed loads (iter_chunks, used by the scans and 02 with WPP_STREAM_MB=N) hand
+a table out in row chunks of about N MB parsed, so a table never has to fit in
+memory whole; the callers merge per-chunk partial results.
+"""
+
+import contextlib
+import glob
+import hashlib
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks (Windows): concurrent stages may parse a table twice
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+INPUT_FOLDER = "./data/WPP Input Tables/"
+CACHE_DIR = os.environ.get("WPP_CACHE_DIR", "./.cache")
+TABLE_CACHE_DIR = os.path.join(CACHE_DIR, "tables")
+
+# bump when the normalization below changes so stale cache files are ignored
+CACHE_VERSION = 1
+
+# in-process memo: cache key -> DataFrame
+_memo = {}
+# (file name, source, seconds, rows) for every load in this process
+LOAD_TIMES = []
+
+# opt-in column-projected loads for the scans and 02 (see load_columns)
+PROJECT = os.environ.get("WPP_PROJECT", "") == "1"
+# pyarrow-backed strings; empty cells stay NaN as in the full reads
+ARROW_STRING = pd.StringDtype("pyarrow", na_value=np.nan)
+# vocabulary columns read as categoricals (lower-cased names)
+CATEGORICAL_COLUMNS = {"effectorscale", "timescale"}
+# (abs path, header row) -> (file stamp, stripped header names)
+_headers = {}
+# (file name, header columns, columns read, columns kept, bytes in memory) per projected load
+PROJECTIONS = []
+
+# opt-in streaming: the scans and 02 read tables in chunks of about this many MB (0: whole tables)
+STREAM_MB = float(os.environ.get("WPP_STREAM_MB", "") or 0)
+# rows parsed to estimate the memory per row of a table
+STREAM_SAMPLE_ROWS = 500
+# (file name, chunks, rows per chunk, largest chunk in bytes) per streamed load
+STREAMS = []
+# every per-load log (the process pool and the in-process runner carry them over)
+LOGS = (LOAD_TIMES, PROJECTIONS, STREAMS)
+
+
+def header_row_for(fname):
+    """
+    Header row (0-indexed) of a WPP sheet: the row the schema catalog found
+    Function/1 in (wpp/schema.py). For a bare file name, or a sheet without that
+    row, the old rule: Endocrine has one extra preamble line.
+    """
+    if os.path.isfile(fname):
+        from wpp.schema import table_schema
+
+        entry = table_schema(fname)
+        if entry["detected"]:
+            return entry["header_row"]
+    return 12 if "endocrine" in os.path.basename(fname).lower() else 11
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def list_tables(input_folder=INPUT_FOLDER, recursive=True):
+    """Sorted list of the CSV tables in input_folder."""
+    pattern = os.path.join(input_folder, "**", "*.csv") if recursive else os.path.join(input_folder, "*.csv")
+    return sorted(glob.glob(pattern, recursive=recursive))
+
+
+def normalize_headers(df):
+    df.columns = [str(c).strip() for c in df.columns]
+    return df
+
+
+def parse_table(path, header_row=None):
+    """Parse a WPP CSV straight from disk (no cache)."""
+    if header_row is None:
+        header_row = header_row_for(path)
+    df = pd.read_csv(path, dtype=str, header=header_row, encoding="utf-8-sig")
+    return normalize_headers(df)
+
+
+def sniff_header(path, header_row=None):
+    """
+    Stripped header names of a WPP CSV (as the full read names them), once per file
+    version; from the schema catalog when its header row is the one asked for.
+    """
+    if header_row is None:
+        header_row = header_row_for(path)
+    st = os.stat(path)
+    key = (os.path.abspath(path), header_row)
+    stamp = (st.st_size, st.st_mtime_ns)
+    entry = _headers.get(key)
+    if entry is None or entry[0] != stamp:
+        from wpp.schema import table_schema
+
+        schema = table_schema(path)
+        if schema["detected"] and schema["header_row"] == header_row:
+            columns = list(schema["columns"])
+        else:
+            head = pd.read_csv(path, dtype=str, header=header_row, encoding="utf-8-sig", nrows=0)
+            columns = list(normalize_headers(head).columns)
+        entry = _headers[key] = (stamp, columns)
+    return entry[1]
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Exclusive inter-process lock on path + ".lock" for the duration of the block."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.lock", "a") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _cache_path(digest, header_row):
+    return os.path.join(TABLE_CACHE_DIR, f"{digest[:32]}-h{header_row}-v{CACHE_VERSION}.parquet")
+
+
+def _read_cache(path):
+    df = pd.read_parquet(path)
+    # object columns come back with None for empty cells; keep the NaN the CSV reader produces
+    obj_cols = df.columns[df.dtypes == object]
+    if len(obj_cols):
+        df[obj_cols] = df[obj_cols].where(df[obj_cols].notna(), np.nan)
+    return df
+
+
+def _write_cache(df, path):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+    except Exception as e:
+        # a missing parquet engine or odd headers must never break the run
+        print(f"[WARN] Could not cache {path}: {e}")
+
+
+def _load_or_parse(path, header_row, cache_file):
+    if os.path.exists(cache_file):
+        try:
+            return _read_cache(cache_file), "warm"
+        except Exception as e:
+            print(f"[WARN] Unreadable cache file {cache_file} ({e}); re-parsing {os.path.basename(path)}.")
+    df = parse_table(path, header_row)
+    _write_cache(df, cache_file)
+    return df, "cold"
+
+
+def load_table(path, header_row=None, use_cache=True):
+    """
+    Return the parsed table at `path` (all cells as strings, headers stripped).
+    Served from memory, then from the Parquet cache, then from the CSV itself.
+    """
+    if header_row is None:
+        header_row = header_row_for(path)
+    fname = os.path.basename(path)
+    start = time.perf_counter()
+
+    if not use_cache:
+        df = parse_table(path, header_row)
+        LOAD_TIMES.append((fname, "parse", time.perf_counter() - start, len(df)))
+        return df
+
+    digest = file_sha256(path)
+    cache_file = _cache_path(digest, header_row)
+
+    if cache_file in _memo:
+        source = "memory"
+        df = _memo[cache_file]
+    else:
+        # a stage parsing this table right now holds the lock; wait and read its cache
+        with file_lock(cache_file):
+            df, source = _load_or_parse(path, header_row, cache_file)
+
+    _memo[cache_file] = df
+    LOAD_TIMES.append((fname, source, time.perf_counter() - start, len(df)))
+    # callers add helper columns, so never hand out the memoized frame itself
+    return df.copy()
+
+
+def _project(df, categorical):
+    df = df.astype(ARROW_STRING)
+    if categorical:
+        for col in df.columns:
+            if col.lower() in CATEGORICAL_COLUMNS:
+                df[col] = df[col].astype("category")
+    return df
+
+
+def load_columns(path, columns, header_row=None, use_cache=True, drop_empty=True, categorical=True):
+    """
+    The table at path with only the named columns (names as in sniff_header; names
+    the table does not have are ignored), in header order. Cells are pyarrow-backed
+    strings, CATEGORICAL_COLUMNS categoricals; with drop_empty the columns that are
+    empty in every row are left out. Read from the full table's Parquet cache when
+    it exists, else from the CSV.
+    """
+    if header_row is None:
+        header_row = header_row_for(path)
+    fname = os.path.basename(path)
+    start = time.perf_counter()
+
+    header = sniff_header(path, header_row)
+    wanted = set(columns)
+    positions = [i for i, c in enumerate(header) if c in wanted]
+    names = [header[i] for i in positions]
+
+    cache_file = _cache_path(file_sha256(path), header_row) if use_cache else None
+    key = (cache_file, tuple(names), drop_empty, categorical)
+    if use_cache and key in _memo:
+        source = "memory"
+        df = _memo[key]
+    else:
+        df = None
+        source = "projected"
+        if use_cache and os.path.exists(cache_file):
+            try:
+                df = pd.read_parquet(cache_file, columns=names)
+                source = "projected warm"
+            except Exception as e:
+                print(f"[WARN] Unreadable cache file {cache_file} ({e}); re-parsing {fname}.")
+        if df is None:
+            df = pd.read_csv(path, dtype=ARROW_STRING, header=header_row, encoding="utf-8-sig", usecols=positions)
+            # usecols keeps file order; name the columns as the full read does
+            df.columns = names
+        df = _project(df, categorical)
+        if drop_empty:
+            df = df.loc[:, df.notna().any().to_numpy()]
+        if use_cache:
+            _memo[key] = df
+
+    LOAD_TIMES.append((fname, source, time.perf_counter() - start, len(df)))
+    PROJECTIONS.append((fname, len(header), len(names), df.shape[1], int(df.memory_usage(deep=True).sum())))
+    return df.copy()
+
+
+def chunk_rows(path, header_row, positions=None, budget_mb=None):
+    """Rows per chunk so that one parsed chunk of the table takes about budget_mb (STREAM_MB)."""
+    budget_mb = STREAM_MB if budget_mb is None else budget_mb
+    sample = pd.read_csv(path, dtype=str, header=header_row, encoding="utf-8-sig",
+                         usecols=positions, nrows=STREAM_SAMPLE_ROWS)
+    per_row = sample.memory_usage(deep=True, index=False).sum() / max(len(sample), 1)
+    return max(1, int(budget_mb * (1 << 20) / max(per_row, 1)))
+
+
+def iter_chunks(path, header_row=None, columns=None, budget_mb=None):
+    """
+    The table at path in row chunks of about budget_mb (STREAM_MB) parsed, cells as in
+    parse_table, headers stripped; the index runs on across chunks as in a whole read.
+    With columns only those are read (names as in sniff_header, others ignored).
+    """
+    if header_row is None:
+        header_row = header_row_for(path)
+    fname = os.path.basename(path)
+    header = sniff_header(path, header_row)
+    positions = names = None
+    if columns is not None:
+        wanted = set(columns)
+        positions = [i for i, c in enumerate(header) if c in wanted]
+        names = [header[i] for i in positions]
+
+    secs = 0.0
+    start = time.perf_counter()
+    rows_per_chunk = chunk_rows(path, header_row, positions, budget_mb)
+    reader = pd.read_csv(path, dtype=str, header=header_row, encoding="utf-8-sig",
+                         usecols=positions, chunksize=rows_per_chunk)
+    n_chunks = n_rows = peak = 0
+    with reader:
+        while True:
+            try:
+                chunk = next(reader)
+            except StopIteration:
+                break
+            # usecols keeps file order; name the columns as the full read does
+            chunk = normalize_headers(chunk) if names is None else chunk.set_axis(names, axis=1)
+            n_chunks += 1
+            n_rows += len(chunk)
+            peak = max(peak, int(chunk.memory_usage(deep=True).sum()))
+            secs += time.perf_counter() - start
+            yield chunk
+            start = time.perf_counter()
+    LOAD_TIMES.append((fname, "streamed", secs, n_rows))
+    STREAMS.append((fname, n_chunks, rows_per_chunk, peak))
+
+
+def load_tables(input_folder=INPUT_FOLDER, recursive=True, report=True):
+    """Load every table in input_folder; returns a list of (path, DataFrame)."""
+    tables = []
+    for path in list_tables(input_folder, recursive=recursive):
+        try:
+            tables.append((path, load_table(path)))
+        except Exception as e:
+            print(f"[ERROR] Could not read {os.path.basename(path)}: {e} -- skipping.")
+    if report:
+        print_load_report()
+    return tables
+
+
+def print_load_report():
+    if not LOAD_TIMES:
+        return
+    print("\n=== Table load times ===")
+    for fname, source, secs, _ in LOAD_TIMES:
+        print(f"  {fname}: {source} {secs * 1000:.1f} ms")
+    by_source = {}
+    for _, source, secs, _ in LOAD_TIMES:
+        by_source[source] = by_source.get(source, 0.0) + secs
+    print("  total: " + ", ".join(f"{s}={t * 1000:.1f} ms" for s, t in sorted(by_source.items())))
+    if PROJECTIONS:
+        print("  column projection:")
+        for fname, n_header, n_read, n_kept, nbytes in PROJECTIONS:
+            print(f"    {fname}: read {n_read} of {n_header} columns, {n_kept} not empty, {nbytes / 1024:.1f} KB")
+    if STREAMS:
+        print(f"  streamed in chunks of about {STREAM_MB:g} MB:")
+        for fname, n_chunks, rows_per_chunk, peak in STREAMS:
+            print(f"    {fname}: {n_chunks} chunk(s) of up to {rows_per_chunk} rows, largest {peak / (1 << 20):.2f} MB")
@@ -0,0 +1,207 @@
+"""
+Opt-in resource instrumentation of the stage scripts.
+
+With WPP_METRICS=1 (run.sh --metrics) the pipeline runs every stage through
+this module instead of plain `python <script>`:
+
+    python -m wpp.metrics --out <stage.json> [--profile-dir DIR] <script> [args...]
+
+The script runs unchanged as __main__ in this process. Afterwards the stage's wall
+and CPU time, peak RSS (this process and its worker processes) and a per-table
+breakdown are written to <stage.json>. The per-table rows come from the table
+loads, analyzer scans and per-file pool runs the wpp package logged. The pipeline
+adds the rows of the stage's output files and merges all stages into
+<week folder>/metrics.json.
+
+Behind further flags (dumps go to --profile-dir):
+    WPP_PROFILE=1       cProfile of the stage: <script>.prof plus the top functions as text
+    WPP_TRACEMALLOC=1   Python allocation peak and the top allocation sites
+"""
+
+import argparse
+import cProfile
+import io
+import json
+import os
+import pstats
+import resource
+import sys
+import time
+import tracemalloc
+import types
+
+ENABLED = os.environ.get("WPP_METRICS", "") == "1"
+PROFILE = os.environ.get("WPP_PROFILE", "") == "1"
+TRACEMALLOC = os.environ.get("WPP_TRACEMALLOC", "") == "1"
+METRICS_FILE = "metrics.json"
+# lines kept in the text dumps
+TOP_N = 30
+
+
+def _rss_mb(who):
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _cpu_seconds(who):
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+
+def table_metrics():
+    """Per-table rows and seconds logged by the loader, the analyzer engine and the process pool."""
+    from wpp import engine, loader, parallel
+
+    tables = {}
+
+    def entry(name):
+        return tables.setdefault(name, {"table": name})
+
+    for fname, source, secs, rows in loader.LOAD_TIMES:
+        t = entry(fname)
+        t["rows_in"] = rows
+        t["load_source"] = source
+        t["load_seconds"] = round(t.get("load_seconds", 0.0) + secs, 4)
+    for fname, source, scan in engine.SCAN_LOG:
+        t = entry(fname)
+        t.setdefault("rows_in", scan["rows"])
+        t["scan_source"] = source
+        if source == "walked":
+            t["scan_seconds"] = round(scan["seconds"], 4)
+    for run in parallel.RUNS:
+        t = entry(run["name"])
+        t["run_seconds"] = round(run["seconds"], 4)
+        t["reused"] = run["reused"]
+        if run["rows_out"] is not None:
+            t["rows_out"] = run["rows_out"]
+        if run["error"] is not None:
+            t["error"] = run["error"]
+    return sorted(tables.values(), key=lambda t: t["table"])
+
+
+def count_rows(path):
+    """Data rows of an output file (CSV: lines after the header; Parquet: from its metadata)."""
+    try:
+        if path.endswith(".csv"):
+            with open(path, "rb") as fh:
+                return max(sum(1 for _ in fh) - 1, 0)
+        if path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+            return pq.ParquetFile(path).metadata.num_rows
+    except OSError:
+        pass
+    return None
+
+
+def run_script(script, args):
+    """Execute script as __main__ (so worker processes can find its functions); returns the exit code."""
+    script = os.path.abspath(script)
+    sys.argv = [script] + list(args)
+    sys.path[0] = os.path.dirname(script)
+    main = types.ModuleType("__main__")
+    main.__file__ = script
+    main.__builtins__ = __builtins__
+    sys.modules["__main__"] = main
+    with open(script, "rb") as fh:
+        code = compile(fh.read(), script, "exec")
+    try:
+        exec(code, main.__dict__)
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        return e.code if isinstance(e.code, int) else 1
+    return 0
+
+
+def measure(script, args, profile_dir=None, profile=PROFILE, trace=TRACEMALLOC):
+    """Run the script and return its metrics (see module doc)."""
+    name = os.path.splitext(os.path.basename(script))[0]
+    if trace:
+        tracemalloc.start()
+    profiler = cProfile.Profile() if profile else None
+    cpu_start = _cpu_seconds(resource.RUSAGE_SELF) + _cpu_seconds(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+    error = None
+    if profiler:
+        profiler.enable()
+    try:
+        code = run_script(script, args)
+    except Exception as e:
+        code, error = 1, f"{type(e).__name__}: {e}"
+        import traceback
+        traceback.print_exc()
+    finally:
+        if profiler:
+            profiler.disable()
+    wall = time.perf_counter() - start
+    cpu = _cpu_seconds(resource.RUSAGE_SELF) + _cpu_seconds(resource.RUSAGE_CHILDREN) - cpu_start
+    if trace:
+        # before the profile dump, whose allocations would show up otherwise
+        _, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics("lineno")[:TOP_N]
+        tracemalloc.stop()
+
+    tables = table_metrics()
+    metrics = {
+        "script": os.path.basename(script),
+        "exit_code": code,
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round(cpu, 3),
+        "peak_rss_mb": round(_rss_mb(resource.RUSAGE_SELF), 1),
+        "peak_rss_workers_mb": round(_rss_mb(resource.RUSAGE_CHILDREN), 1),
+        "rows_in": sum(t.get("rows_in", 0) for t in tables),
+        "tables": tables,
+    }
+    if error:
+        metrics["error"] = error
+
+    if profiler or trace:
+        profile_dir = profile_dir or "."
+        os.makedirs(profile_dir, exist_ok=True)
+    if profiler:
+        prof_path = os.path.join(profile_dir, f"{name}.prof")
+        profiler.dump_stats(prof_path)
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(TOP_N)
+        with open(f"{prof_path}.txt", "w", encoding="utf-8") as fh:
+            fh.write(text.getvalue())
+        metrics["profile"] = prof_path
+    if trace:
+        trace_path = os.path.join(profile_dir, f"{name}.tracemalloc.txt")
+        with open(trace_path, "w", encoding="utf-8") as fh:
+            fh.write(f"peak traced: {peak / (1024 * 1024):.1f} MB\n")
+            for stat in top:
+                fh.write(f"{stat}\n")
+        metrics["tracemalloc_peak_mb"] = round(peak / (1024 * 1024), 1)
+        metrics["tracemalloc"] = trace_path
+    return metrics
+
+
+def write_week_metrics(week_dir, report):
+    """Write the merged per-stage metrics of a pipeline run to <week_dir>/metrics.json."""
+    from wpp.download import atomic_write
+    path = os.path.join(week_dir, METRICS_FILE)
+    atomic_write(path, json.dumps(report, indent=2).encode("utf-8"))
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a stage script with resource instrumentation.")
+    parser.add_argument("--out", required=True, help="JSON file for the stage metrics.")
+    parser.add_argument("--profile-dir", help="Folder for the cProfile / tracemalloc dumps.")
+    parser.add_argument("script", help="Stage script to run.")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments of the script.")
+    args = parser.parse_args(argv)
+
+    metrics = measure(args.script, args.args, args.profile_dir)
+    # the script's own output may still be buffered; keep it ahead of ours
+    sys.stdout.flush()
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(metrics, fh, indent=2)
+    return metrics["exit_code"]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Per-file process pool for the stage scripts.
+
+    runs = run_per_file(func, [(path, args), ...], jobs=args.jobs, cache=cache)
+    for run in runs:                      # always in input order
+        if run["error"] is not None:
+            print(f"Failed processing {run['name']}: {run['error']}")
+    print_timing(runs, jobs, wall)
+
+func(*args) runs in a worker process when jobs > 1 (in this process otherwise),
+so it has to be a module-level function (or a functools.partial of one). An
+exception in one file is captured as run["error"] and does not stop the others.
+With a StageCache, tables whose result can be reused are not sent to the pool
+(run["reused"] is True) and new results are stored in the parent.
+
+The default for --jobs comes from WPP_JOBS (run.sh --jobs N), else 1.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from wpp import engine, loader
+
+JOBS = int(os.environ.get("WPP_JOBS", "") or 1)
+# every run of every run_per_file call in this process (for wpp/metrics.py)
+RUNS = []
+
+
+def add_jobs_argument(parser):
+    parser.add_argument("--jobs", "-j", type=int, default=JOBS,
+                        help=f"Process the tables in N worker processes (default {JOBS}, from WPP_JOBS).")
+
+
+def _call(func, args):
+    """Run one task; also hands back the load/scan log entries it produced."""
+    n_loads, n_scans = [len(log) for log in loader.LOGS], len(engine.SCAN_LOG)
+    start = time.perf_counter()
+    try:
+        result, error = func(*args), None
+    except Exception as e:
+        result, error = None, str(e)
+    seconds = time.perf_counter() - start
+    loads = [log[n:] for log, n in zip(loader.LOGS, n_loads)]
+    return result, error, seconds, loads, engine.SCAN_LOG[n_scans:]
+
+
+def _result_rows(result):
+    """Row count of a per-table result that is a DataFrame or a list of records."""
+    if isinstance(result, list) or hasattr(result, "columns"):
+        return len(result)
+    return None
+
+
+def run_per_file(func, tasks, jobs=1, cache=None):
+    """
+    Run func(*args) for each (path, args) task. Returns one dict per task, in task order:
+    name, path, result, error (message or None), seconds, reused.
+    """
+    runs = [
+        {"name": os.path.basename(path), "path": path, "args": args,
+         "result": None, "error": None, "seconds": 0.0, "reused": False}
+        for path, args in tasks
+    ]
+
+    pending = []
+    for run in runs:
+        if cache is not None:
+            start = time.perf_counter()
+            hit, result = cache.lookup(run["path"])
+            if hit:
+                run.update(result=result, reused=True, seconds=time.perf_counter() - start)
+                continue
+        pending.append(run)
+
+    if jobs > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as pool:
+            futures = [pool.submit(_call, func, run["args"]) for run in pending]
+            outcomes = []
+            for future in futures:
+                try:
+                    outcomes.append(future.result())
+                except Exception as e:
+                    # the task could not be sent to / returned from its worker
+                    outcomes.append((None, str(e), 0.0, [[] for _ in loader.LOGS], []))
+        for _, _, _, loads, scans in outcomes:
+            # so the load / analyzer reports of this process cover the workers too
+            for log, entries in zip(loader.LOGS, loads):
+                log.extend(entries)
+            engine.SCAN_LOG.extend(scans)
+    else:
+        outcomes = [_call(func, run["args"]) for run in pending]
+
+    for run, (result, error, seconds, *_) in zip(pending, outcomes):
+        run.update(result=result, error=error, seconds=seconds)
+        if cache is not None and error is None:
+            cache.store(run["path"], result)
+
+    for run in runs:
+        del run["args"]
+        RUNS.append({
+            "name": run["name"], "seconds": run["seconds"], "reused": run["reused"], "error": run["error"],
+            "rows_out": _result_rows(run["result"]),
+        })
+    return runs
+
+
+def print_timing(runs, jobs, wall):
+    print(f"\n=== Per-file timing (jobs={jobs}) ===")
+    for run in runs:
+        status = "failed" if run["error"] is not None else "reused" if run["reused"] else "done"
+        print(f"  {run['name']}: {status} {run['seconds']:.3f} s")
+    busy = sum(run["seconds"] for run in runs)
+    print(f"  total: {len(runs)} files, {busy:.2f} s of work in {wall:.2f} s wall")
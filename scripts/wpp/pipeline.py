@@ -0,0 +1,450 @@
+"""
+Dependency-aware runner for the numbered scripts (used by run.sh).
+
+    python -m wpp.pipeline --week-dir <week folder> --log-dir <log folder> [--workers N] [--force]
+
+Each stage declares the files it reads and writes (globs relative to the week
+folder) and the stages it depends on. Stages run as soon as their dependencies
+are done, up to --workers at a time, each as its own process with CWD = week
+folder and its log in <log folder>/<script>_<timestamp>.log.
+
+- A stage is skipped when its script (and the wpp package) and its input files
+  are unchanged since its last successful run, in any week folder: fingerprints
+  and a copy of each stage's latest outputs are kept in $WPP_CACHE_DIR/pipeline/,
+  and the outputs are copied into a new week folder instead of running the stage
+  again. --force (or WPP_FORCE=1) runs everything.
+- A stage that fails marks every stage depending on it as "blocked"; they are not
+  started. Independent stages still run. The exit code is 1 if anything failed.
+- A timing report with the critical path is printed and written to
+  <log folder>/pipeline_<timestamp>.json.
+- With --metrics (or WPP_METRICS=1) every stage runs under wpp/metrics.py and the
+  per-stage resources (wall/CPU time, peak RSS, rows in/out, per-table breakdown)
+  are written to <week folder>/metrics.json; profiles go to <log folder>/profiles/.
+- With --in-process (or WPP_IN_PROCESS=1) the stages run one at a time inside
+  this interpreter (wpp/inprocess.py): the heavy libraries are imported once and
+  02's facts and count cube and the ASCT+B index are handed over in memory. The
+  import time per stage and the estimated startup saved are reported.
+
+Scripts that are not declared below still run, after all declared stages with a
+lower number, and are never skipped.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from wpp import handoff, inprocess
+from wpp.download import atomic_write
+from wpp.incremental import code_digest
+from wpp.loader import CACHE_DIR, file_sha256
+from wpp.metrics import ENABLED as METRICS_ENABLED, count_rows, write_week_metrics
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATE_DIR = os.path.join(CACHE_DIR, "pipeline")
+# stage -> fingerprint and outputs digest of its last successful run
+STATE_FILE = os.path.join(STATE_DIR, "state.json")
+OUTPUTS_DIR = os.path.join(STATE_DIR, "outputs")
+
+RAW_TABLES = "data/WPP Input Tables/**/*"
+ASCTB_MASTER = "data/all_asctb_ids_and_types.csv"
+SPATIAL_TEMPORAL = "temporal_spatial_output/*.csv"
+SPATIAL_TEMPORAL_FACTS = "temporal_spatial_output/spatial_temporal_facts.parquet"
+COUNT_CUBE = "temporal_spatial_output/count_cube/*"
+
+# script -> inputs, outputs, dependencies; always=True: never skipped (reads the network)
+STAGES = {
+    "01-all_asctb_ids_with_types.py": {
+        "inputs": [], "outputs": [ASCTB_MASTER], "deps": [], "always": True},
+    "02-WPP_tables.py": {
+        "inputs": [RAW_TABLES], "outputs": [SPATIAL_TEMPORAL, SPATIAL_TEMPORAL_FACTS, COUNT_CUBE], "deps": []},
+    "03-AS_extraction_wpp.py": {
+        "inputs": [RAW_TABLES],
+        "outputs": ["analysis/all_Uberon_statistics/AS_UBERON_in_WPP.csv"], "deps": []},
+    "04-AS_missing_present_HRA_WPP.py": {
+        "inputs": ["analysis/all_Uberon_statistics/AS_UBERON_in_WPP.csv", ASCTB_MASTER],
+        "outputs": ["analysis/all_Uberon_statistics/uberon_ids_present_in_astcb.csv",
+                    "analysis/all_Uberon_statistics/uberon_ids_missing_in_asctb.csv"],
+        "deps": ["01-all_asctb_ids_with_types.py", "03-AS_extraction_wpp.py"]},
+    "05-CT_extracts_WPP.py": {
+        "inputs": [RAW_TABLES],
+        "outputs": ["analysis/all_CT_statistics/all_CL_ids_in_WPP_by_id.csv"], "deps": []},
+    "06-CT_present_missing_HRA_WPP.py": {
+        "inputs": ["analysis/all_CT_statistics/all_CL_ids_in_WPP_by_id.csv", ASCTB_MASTER],
+        "outputs": ["analysis/all_CT_statistics/cl_ids_*_in_astcb.csv"],
+        "deps": ["01-all_asctb_ids_with_types.py", "05-CT_extracts_WPP.py"]},
+    "07-2d_plots.py": {
+        "inputs": [SPATIAL_TEMPORAL, SPATIAL_TEMPORAL_FACTS], "outputs": ["2d_plots/*.png"], "deps": ["02-WPP_tables.py"]},
+    "08-3d_scatter_plot.py": {
+        "inputs": [SPATIAL_TEMPORAL, SPATIAL_TEMPORAL_FACTS], "outputs": ["3d_scatter_plots/*.png"], "deps": ["02-WPP_tables.py"]},
+    "10-process_counts.py": {
+        "inputs": [SPATIAL_TEMPORAL, SPATIAL_TEMPORAL_FACTS], "outputs": ["unique_processes/process_counts.csv"],
+        "deps": ["02-WPP_tables.py"]},
+    "11-unique_effectors.py": {
+        "inputs": [RAW_TABLES], "outputs": ["unique_effectors/*.csv"], "deps": []},
+    "12-common_effectors_across_systems.py": {
+        "inputs": [RAW_TABLES],
+        "outputs": ["common_effectors_across_systems/labels_present_in_multiple_files.csv"], "deps": []},
+    "13-ftus_wpp.py": {
+        "inputs": [RAW_TABLES], "outputs": ["unique_ftus/*.csv"], "deps": []},
+}
+
+
+def stage_number(script):
+    head = script.split("-", 1)[0]
+    return int(head) if head.isdigit() else 0
+
+
+def discover_stages(scripts_dir=SCRIPTS_DIR):
+    """Declared stages present in scripts_dir, plus any undeclared script (see module doc)."""
+    present = sorted(os.path.basename(p) for p in glob.glob(os.path.join(scripts_dir, "*.py")))
+    stages = {}
+    for script in present:
+        if script in STAGES:
+            spec = dict(STAGES[script])
+            spec["deps"] = [d for d in spec["deps"] if d in present]
+        else:
+            deps = [s for s in present if s in STAGES and stage_number(s) < stage_number(script)]
+            spec = {"inputs": [], "outputs": [], "deps": deps, "always": True}
+        stages[script] = spec
+    return stages
+
+
+def expand(week_dir, patterns):
+    files = set()
+    for pattern in patterns:
+        for p in glob.glob(os.path.join(week_dir, pattern), recursive=True):
+            if os.path.isfile(p):
+                files.add(p)
+    return sorted(files)
+
+
+def fingerprint(week_dir, script, spec, scripts_dir=SCRIPTS_DIR):
+    """Hash of the stage code and of the names and contents of its input files."""
+    h = hashlib.sha256(code_digest(os.path.join(scripts_dir, script)).encode("ascii"))
+    for p in expand(week_dir, spec["inputs"]):
+        h.update(os.path.relpath(p, week_dir).encode("utf-8"))
+        h.update(file_sha256(p).encode("ascii"))
+    return h.hexdigest()
+
+
+def outputs_digest(week_dir, spec):
+    files = expand(week_dir, spec["outputs"])
+    if len(files) == 0 or any(not glob.glob(os.path.join(week_dir, p)) for p in spec["outputs"]):
+        return None  # some declared output is missing
+    h = hashlib.sha256()
+    for p in files:
+        h.update(os.path.relpath(p, week_dir).encode("utf-8"))
+        h.update(file_sha256(p).encode("ascii"))
+    return h.hexdigest()
+
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return {}
+    try:
+        with open(STATE_FILE, encoding="utf-8") as fh:
+            return json.load(fh)
+    except Exception as e:
+        print(f"[WARN] Ignoring unreadable pipeline state {STATE_FILE}: {e}")
+        return {}
+
+
+def _outputs_copy(script):
+    return os.path.join(OUTPUTS_DIR, os.path.splitext(script)[0])
+
+
+def store_outputs(week_dir, script, spec, fp):
+    """Keep a copy of the stage's outputs under its fingerprint (latest run only)."""
+    dst_root = _outputs_copy(script)
+    tmp = f"{dst_root}.{os.getpid()}.tmp"
+    try:
+        shutil.rmtree(tmp, ignore_errors=True)
+        for p in expand(week_dir, spec["outputs"]):
+            dst = os.path.join(tmp, "files", os.path.relpath(p, week_dir))
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.copyfile(p, dst)
+        with open(os.path.join(tmp, "fingerprint"), "w", encoding="ascii") as fh:
+            fh.write(fp)
+        shutil.rmtree(dst_root, ignore_errors=True)
+        os.replace(tmp, dst_root)
+    except Exception as e:
+        print(f"[WARN] Could not keep the outputs of {script}: {e}")
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def restore_outputs(week_dir, script, fp):
+    """Copy the outputs kept for fingerprint fp into week_dir; False when none are kept."""
+    root = _outputs_copy(script)
+    try:
+        with open(os.path.join(root, "fingerprint"), encoding="ascii") as fh:
+            if fh.read() != fp:
+                return False
+    except OSError:
+        return False
+    files = os.path.join(root, "files")
+    for base, _, names in os.walk(files):
+        for name in names:
+            src = os.path.join(base, name)
+            dst = os.path.join(week_dir, os.path.relpath(src, files))
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.copyfile(src, dst)
+    return True
+
+
+def run_stage(script, week_dir, log_path, python, scripts_dir=SCRIPTS_DIR, metrics_out=None, profile_dir=None):
+    """
+    Run one script (CWD = week folder, output to its log file); returns (exit code, start, end).
+    With metrics_out the script runs under wpp.metrics, which writes its measurements there.
+    """
+    cmd, env = [python, os.path.join(scripts_dir, script)], None
+    if metrics_out:
+        cmd = [python, "-m", "wpp.metrics", "--out", metrics_out, "--profile-dir", profile_dir, cmd[1]]
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+            p for p in (scripts_dir, os.environ.get("PYTHONPATH")) if p))
+    start = time.time()
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.run(cmd, cwd=week_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return proc.returncode, start, time.time()
+
+
+def _total_rows(counts):
+    known = [n for n in counts.values() if n is not None]
+    return sum(known) if known else None
+
+
+def stage_metrics(week_dir, spec, metrics_out, ok=True):
+    """
+    The metrics wpp.metrics wrote for a stage, plus the rows of its output files.
+    Stages that read no WPP tables (07, 08, 10) get the rows of their input files as rows_in.
+    """
+    try:
+        with open(metrics_out, encoding="utf-8") as fh:
+            m = json.load(fh)
+    except (OSError, ValueError):
+        m = {}
+    if not m.get("rows_in"):
+        inputs = {os.path.relpath(p, week_dir): count_rows(p) for p in expand(week_dir, spec["inputs"])}
+        m["rows_in"] = _total_rows(inputs) or 0
+    if ok:
+        outputs = {os.path.relpath(p, week_dir): count_rows(p) for p in expand(week_dir, spec["outputs"])}
+        m["outputs"] = outputs
+        m["rows_out"] = _total_rows(outputs)
+    return m
+
+
+def blocked_by_failure(stages, failed):
+    """Every stage that depends (directly or not) on a failed stage."""
+    blocked = set()
+    changed = True
+    while changed:
+        changed = False
+        for script, spec in stages.items():
+            if script not in blocked and any(d in failed or d in blocked for d in spec["deps"]):
+                blocked.add(script)
+                changed = True
+    return blocked
+
+
+def critical_path(stages, results):
+    """
+    Longest chain of dependent stages by end time: walk back from the last stage to finish.
+    Only stages that succeeded count; failed stages are listed apart in the report.
+    """
+    finished = {s: r for s, r in results.items() if r and r.get("status") == "ok"}
+    if not finished:
+        return []
+    current = max(finished, key=lambda s: finished[s]["end"])
+    path = [current]
+    while True:
+        deps = [d for d in stages[current]["deps"] if d in finished]
+        if not deps:
+            break
+        current = max(deps, key=lambda d: finished[d]["end"])
+        path.append(current)
+    return list(reversed(path))
+
+
+def run_pipeline(week_dir, log_dir, timestamp, python=sys.executable, workers=None, force=False,
+                 scripts_dir=SCRIPTS_DIR, metrics=False, in_process=False):
+    stages = discover_stages(scripts_dir)
+    workers = 1 if in_process else workers or os.cpu_count() or 1
+    if in_process:
+        # what one process per stage would pay, measured in a fresh interpreter meanwhile
+        probe = {}
+        prober = threading.Thread(target=lambda: probe.update(cost=inprocess.probe_startup(python)))
+        prober.start()
+        handoff.ENABLED = True
+        preload_seconds = inprocess.preload()
+    state = load_state()
+    new_state = dict(state)
+    results = {}
+    done, failed = set(), set()
+    running = {}   # future -> script
+    launched = {}  # script -> (fingerprint, log path)
+    t0 = time.time()
+
+    def ready(script):
+        return script not in results and all(d in done for d in stages[script]["deps"])
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            blocked = blocked_by_failure(stages, failed)
+            for script in stages:
+                if script in blocked and script not in results:
+                    failed_deps = [d for d in stages[script]["deps"] if d in failed or d in blocked]
+                    results[script] = {"status": "blocked", "blocked_by": failed_deps}
+                    print(f"-> {script}: blocked (dependency failed: {', '.join(failed_deps)})")
+
+            for script in stages:
+                if len(running) >= workers or not ready(script):
+                    continue
+                spec = stages[script]
+                fp = None if spec.get("always") else fingerprint(week_dir, script, spec, scripts_dir)
+                prev = state.get(script, {})
+                if not force and fp is not None and prev.get("fingerprint") == fp:
+                    if prev.get("outputs") == outputs_digest(week_dir, spec):
+                        results[script] = {"status": "skipped"}
+                        done.add(script)
+                        print(f"-> {script}: skipped (inputs unchanged)")
+                        continue
+                    # unchanged since a run in another week folder: reuse that run's outputs
+                    if (restore_outputs(week_dir, script, fp)
+                            and prev.get("outputs") == outputs_digest(week_dir, spec)):
+                        results[script] = {"status": "skipped", "restored": True}
+                        done.add(script)
+                        print(f"-> {script}: skipped (inputs unchanged, outputs restored)")
+                        continue
+                log_path = os.path.join(log_dir, f"{os.path.splitext(script)[0]}_{timestamp}.log")
+                metrics_out = (os.path.join(log_dir, "metrics", f"{os.path.splitext(script)[0]}_{timestamp}.json")
+                               if metrics else None)
+                print(f"-> {script} (log: {log_path})")
+                if in_process:
+                    # in this (main) thread: the stage takes over stdout, CWD and __main__
+                    future = Future()
+                    future.set_result(inprocess.run_stage(script, week_dir, log_path, scripts_dir,
+                                                          metrics_out, os.path.join(log_dir, "profiles")))
+                else:
+                    future = pool.submit(run_stage, script, week_dir, log_path, python, scripts_dir,
+                                         metrics_out, os.path.join(log_dir, "profiles"))
+                running[future] = script
+                results[script] = None  # placeholder until it finishes
+                new_state.pop(script, None)
+                launched[script] = (fp, log_path, metrics_out)
+
+            if not running:
+                break
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                script = running.pop(future)
+                fp, log_path, metrics_out = launched[script]
+                code, start, end, *import_seconds = future.result()
+                status = "ok" if code == 0 else "failed"
+                results[script] = {"status": status, "exit_code": code, "log": log_path,
+                                   "start": start - t0, "end": end - t0, "seconds": end - start}
+                if import_seconds:
+                    results[script]["import_seconds"] = import_seconds[0]
+                if metrics_out:
+                    results[script]["metrics"] = stage_metrics(week_dir, stages[script], metrics_out, code == 0)
+                print(f"   {script} {status} in {end - start:.1f}s" + ("" if code == 0 else f" (exit {code}, see {log_path})"))
+                if code == 0:
+                    done.add(script)
+                    if fp is not None:
+                        new_state[script] = {"fingerprint": fp, "outputs": outputs_digest(week_dir, stages[script])}
+                        store_outputs(week_dir, script, stages[script], fp)
+                else:
+                    failed.add(script)
+
+    atomic_write(STATE_FILE, json.dumps(new_state, indent=2, sort_keys=True).encode("utf-8"))
+    wall = time.time() - t0
+    report = build_report(stages, results, wall, workers)
+    if in_process:
+        prober.join()
+        startup_seconds, import_seconds = probe["cost"]
+        report["in_process"] = inprocess.startup_report(results, scripts_dir, preload_seconds,
+                                                        startup_seconds, import_seconds)
+    atomic_write(os.path.join(log_dir, f"pipeline_{timestamp}.json"), json.dumps(report, indent=2).encode("utf-8"))
+    print_report(report)
+    if in_process:
+        inprocess.print_startup_report(report["in_process"])
+    if metrics:
+        path = write_week_metrics(week_dir, dict(report, timestamp=timestamp))
+        print_metrics(report)
+        print(f"  metrics: {path}")
+    return 1 if failed else 0
+
+
+def build_report(stages, results, wall, workers):
+    path = critical_path(stages, results)
+    return {
+        "wall_seconds": wall,
+        "workers": workers,
+        "stage_seconds": sum(r.get("seconds", 0.0) for r in results.values()),
+        "critical_path": path,
+        "critical_path_seconds": sum(results[s]["seconds"] for s in path),
+        "failed": [s for s in stages if (results.get(s) or {}).get("status") == "failed"],
+        "blocked": [s for s in stages if (results.get(s) or {}).get("status") == "blocked"],
+        "stages": {s: results.get(s) for s in stages},
+    }
+
+
+def print_report(report):
+    print("\n=== Pipeline timing ===")
+    for script, r in report["stages"].items():
+        if r is None:
+            continue
+        if "seconds" in r:
+            print(f"  {script}: {r['status']} {r['start']:7.1f}s -> {r['end']:7.1f}s ({r['seconds']:.1f}s)")
+        else:
+            print(f"  {script}: {r['status']}")
+    print(f"  wall: {report['wall_seconds']:.1f}s with {report['workers']} workers; "
+          f"sum of stage times: {report['stage_seconds']:.1f}s")
+    if report["critical_path"]:
+        print(f"  critical path ({report['critical_path_seconds']:.1f}s): " + " -> ".join(report["critical_path"]))
+    if report["failed"] or report["blocked"]:
+        print(f"  not in the critical path: failed {', '.join(report['failed']) or '-'}; "
+              f"blocked {', '.join(report['blocked']) or '-'}")
+
+
+def print_metrics(report):
+    print("\n=== Stage resources ===")
+    for script, r in report["stages"].items():
+        m = (r or {}).get("metrics")
+        if not m or "wall_seconds" not in m:
+            continue
+        rows_out = "-" if m.get("rows_out") is None else m["rows_out"]
+        print(f"  {script}: {m['wall_seconds']:.1f}s wall, {m['cpu_seconds']:.1f}s CPU, "
+              f"{max(m['peak_rss_mb'], m['peak_rss_workers_mb']):.0f} MB peak RSS, "
+              f"rows in {m['rows_in']} out {rows_out}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the numbered scripts as a dependency graph.")
+    parser.add_argument("--week-dir", required=True, help="Week folder (CWD of every script).")
+    parser.add_argument("--log-dir", required=True, help="Folder for the per-script logs and the timing report.")
+    parser.add_argument("--timestamp", default=time.strftime("%Y%m%d_%H%M%S"), help="Suffix of the log files.")
+    parser.add_argument("--python", default=sys.executable, help="Python used to run the scripts.")
+    parser.add_argument("--workers", type=int, default=None, help="Stages run at the same time (default: CPU count).")
+    parser.add_argument("--force", action="store_true", default=os.environ.get("WPP_FORCE", "") == "1",
+                        help="Run every stage even if its inputs are unchanged.")
+    parser.add_argument("--metrics", action="store_true", default=METRICS_ENABLED,
+                        help="Record per-stage resources in <week folder>/metrics.json (default from WPP_METRICS).")
+    parser.add_argument("--in-process", action="store_true", default=os.environ.get("WPP_IN_PROCESS", "") == "1",
+                        help="Run the stages one at a time in this interpreter (default from WPP_IN_PROCESS).")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.log_dir, exist_ok=True)
+    return run_pipeline(os.path.abspath(args.week_dir), os.path.abspath(args.log_dir), args.timestamp,
+                        python=args.python, workers=args.workers, force=args.force, metrics=args.metrics,
+                        in_process=args.in_process)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
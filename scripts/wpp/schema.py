@@ -0,0 +1,202 @@
+"""
+Schema catalog of the WPP input tables.
+
+A WPP sheet starts with a preamble - title, author and reviewer rows, Date,
+Version Number, section captions - above the column header row that starts
+with Function/1 (one line further down in some sheets, e.g. Endocrine). probe()
+reads only the first PROBE_LINES records of a table to find that row and the
+preamble fields. The result is catalogued per file content under
+$WPP_CACHE_DIR/schema/, and the loader takes the header row and the column names
+of every table from here (loader.header_row_for, loader.sniff_header) instead
+of guessing from the file name.
+
+    entry = table_schema(path)   # file, sha256, header_row, columns, title, metadata, detected
+    entry["header_row"], entry["metadata"].get("Version Number")
+    version_changed(path)        # Date / Version Number differ from the last catalogued content
+
+The preamble alone is enough for version_changed, so it answers without hashing
+or parsing the table.
+
+    python -m wpp.schema ["data/WPP Input Tables"] [--check]
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+
+from wpp.incremental import _atomic_write, _dump_json
+from wpp.loader import CACHE_DIR, INPUT_FOLDER, file_sha256, list_tables
+
+SCHEMA_DIR = os.path.join(CACHE_DIR, "schema")
+# bump when probe() changes so stale entries are ignored
+SCHEMA_VERSION = 1
+# records read from the top of a table at most
+PROBE_LINES = 40
+# first cell of the column header row
+HEADER_MARKER = "Function/1"
+# preamble fields version_changed compares
+VERSION_FIELDS = ["Date", "Version Number"]
+
+# (abs path, size, mtime) -> entry, for the files probed in this process
+_memo = {}
+
+
+def _delimiter(path):
+    return "\t" if os.path.splitext(path)[1].lower() in (".tsv", ".tab") else ","
+
+
+def _column_names(cells):
+    """Header cells named as pandas names them (empty -> "Unnamed: i", repeats -> "x.1"), then stripped."""
+    names, counts = [], {}
+    for i, cell in enumerate(cells):
+        name = cell if cell != "" else f"Unnamed: {i}"
+        count = counts.get(name, 0)
+        while count > 0:
+            counts[name] = count + 1
+            name = f"{name}.{count}"
+            count = counts.get(name, 0)
+        counts[name] = count + 1
+        names.append(name)
+    return [n.strip() for n in names]
+
+
+def read_preamble(path, max_lines=PROBE_LINES):
+    """
+    (preamble records, header row, header cells) from the top of a table. The header
+    row counts records like pandas' header= does (blank lines skipped); it is None
+    when no record within max_lines holds HEADER_MARKER.
+    """
+    preamble = []
+    with open(path, encoding="utf-8-sig", newline="") as fh:
+        for cells in itertools.islice(csv.reader(fh, delimiter=_delimiter(path)), max_lines):
+            if not cells:
+                continue
+            if HEADER_MARKER in (c.strip() for c in cells):
+                return preamble, len(preamble), cells
+            preamble.append(cells)
+    return preamble, None, []
+
+
+def preamble_metadata(preamble):
+    """Title (first cell of the first record) and the "Field:,value" rows of a preamble."""
+    title, metadata = "", {}
+    for cells in preamble:
+        values = [c.strip() for c in cells if c.strip()]
+        if not values:
+            continue
+        if not title:
+            title = values[0]
+            continue
+        key = cells[0].strip()
+        if key.endswith(":"):
+            metadata[key[:-1].strip()] = next((c.strip() for c in cells[1:] if c.strip()), "")
+    return title, metadata
+
+
+def probe(path, max_lines=PROBE_LINES):
+    """Schema entry of a table from its first max_lines records (no content hash)."""
+    preamble, header_row, cells = read_preamble(path, max_lines)
+    title, metadata = preamble_metadata(preamble)
+    return {
+        "file": os.path.basename(path),
+        "header_row": header_row,
+        "columns": _column_names(cells),
+        "title": title,
+        "metadata": metadata,
+        "detected": header_row is not None,
+    }
+
+
+def _entry_path(digest):
+    return os.path.join(SCHEMA_DIR, f"{digest[:32]}-v{SCHEMA_VERSION}.json")
+
+
+def _name_path(fname):
+    safe = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in fname)
+    return os.path.join(SCHEMA_DIR, "by_name", f"{safe}.json")
+
+
+def _store(entry):
+    try:
+        _atomic_write(_entry_path(entry["sha256"]), lambda tmp: _dump_json(entry, tmp))
+        # the last catalogued content of this file name, for version_changed
+        _atomic_write(_name_path(entry["file"]), lambda tmp: _dump_json(entry, tmp))
+    except Exception as e:
+        print(f"[WARN] Could not store the schema of {entry['file']}: {e}")
+
+
+def table_schema(path):
+    """The catalog entry of the table at path (probed once per file content)."""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    entry = _memo.get(key)
+    if entry is not None:
+        return entry
+
+    digest = file_sha256(path)
+    entry_file = _entry_path(digest)
+    if os.path.exists(entry_file):
+        try:
+            with open(entry_file, encoding="utf-8") as fh:
+                entry = json.load(fh)
+        except Exception as e:
+            print(f"[WARN] Unreadable schema entry {entry_file} ({e}); probing again.")
+    if entry is None or entry.get("file") != os.path.basename(path):
+        entry = dict(probe(path), sha256=digest)
+        _store(entry)
+    _memo[key] = entry
+    return entry
+
+
+def last_catalogued(fname):
+    """The catalog entry last stored for a file name, or None."""
+    try:
+        with open(_name_path(os.path.basename(fname)), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def version_changed(path):
+    """
+    True when the preamble's Date / Version Number differ from the last catalogued
+    content of this file, None when the file was never catalogued. Reads the preamble only.
+    """
+    previous = last_catalogued(path)
+    if previous is None:
+        return None
+    _, metadata = preamble_metadata(read_preamble(path)[0])
+    return any(metadata.get(f) != previous["metadata"].get(f) for f in VERSION_FIELDS)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Schema catalog of the WPP input tables.")
+    parser.add_argument("folder", nargs="?", default=INPUT_FOLDER, help="Folder of WPP tables.")
+    parser.add_argument("--check", action="store_true",
+                        help="Only compare each preamble's Date / Version Number with the catalog.")
+    args = parser.parse_args(argv)
+
+    paths = list_tables(args.folder)
+    if not paths:
+        print(f"[ERROR] No CSV tables in {args.folder}")
+        return 1
+    if args.check:
+        for path in paths:
+            changed = version_changed(path)
+            status = "new" if changed is None else "changed" if changed else "unchanged"
+            print(f"{os.path.basename(path)}: {status}")
+        return 0
+    for path in paths:
+        entry = table_schema(path)
+        meta = entry["metadata"]
+        where = f"header row {entry['header_row']}" if entry["detected"] else "[WARN] no Function/1 header row"
+        print(f"{entry['file']}: {where}, {len(entry['columns'])} columns; {entry['title']} "
+              f"({meta.get('Version Number', '?')}, {meta.get('Date', '?')})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Shared vocabulary of the WPP tables: time ranges, spatial types, organ systems
+and the FTU ids.
+
+02, 07, 08, 10, 11, 13 and the fact table / count cube (wpp/facts.py,
+wpp/cube.py) take their category lists from here. The raw TimeScale and
+EffectorScale cells of a table are normalized in batch: the column is
+factorized, every distinct raw value is normalized once (and remembered for the
+rest of the process), and the result comes back as a categorical, so the rows
+carry small integer codes instead of repeated strings.
+
+    keys = time_keys(df["TimeScale"])                              # "hoursdays", ..., "nan"
+    masks = time_masks(keys)                                       # uint16 time coverage per row
+    spatial = spatial_types(df["EffectorScale"], df["Effector/ID"])   # SPATIAL_TYPE_DTYPE, Unknown = NaN
+    codes = category_codes(facts["time_range"], TIME_RANGE_DTYPE)
+"""
+
+import functools
+import re
+
+import numpy as np
+import pandas as pd
+
+# time range columns of the spatial-temporal pivots, in order
+TIME_RANGES = [
+    "<1 second", "1s - < 1min", "1min - < 1hr", "1hr - < 1day",
+    "1day - < 1week", "1 week - < 1 year", "1 year or longer",
+    "continuous", "variable"
+]
+# the time ranges with a duration (the y axis of the plots)
+PLOT_TIME_RANGES = TIME_RANGES[:7]
+# spatial types of the pivots, counts and plots, in order
+SPATIAL_TYPES = ["Organ", "AS", "FTU", "CT", "B"]
+
+# normalized TimeScale -> time ranges
+TIME_MAPPING = {
+    "milliseconds": ["<1 second"], "seconds": ["1s - < 1min"], "secondsminutes": ["1s - < 1min", "1min - < 1hr"],
+    "minuteshours": ["1min - < 1hr", "1hr - < 1day"], "hoursdays": ["1hr - < 1day", "1day - < 1week"],
+    "daysweeks": ["1day - < 1week", "1 week - < 1 year"], "hours": ["1hr - < 1day"], "minutes": ["1min - < 1hr"],
+    "days": ["1day - < 1week"], "nan": ["Unknown"],
+    "weeks": ["1 week - < 1 year"], "months": ["1 week - < 1 year"], "years": ["1 year or longer"],
+    "weeksmonths": ["1 week - < 1 year"], "minuteshoursdays": ["1min - < 1hr", "1hr - < 1day", "1day - < 1week"],
+    "hoursdaysweeksmonths": ["1hr - < 1day", "1day - < 1week", "1 week - < 1 year"],
+    "secondsminuteshours": ["1s - < 1min", "1min - < 1hr", "1hr - < 1day"],
+    "milisecondsseconds": ["<1 second", "1s - < 1min"], "secondshours": ["1s - < 1min", "1min - < 1hr", "1hr - < 1day"],
+    "continuous": ["continuous"], "variable": ["variable"],
+}
+
+# normalized EffectorScale -> spatial type
+SPATIAL_MAPPING = {
+    "tissue": "AS",
+    "tissueftu": "FTU",
+    "cell": "CT",
+    "organ": "Organ",
+    "organsystem": "Organ",
+    "biomolecule": "B",
+    "molecule": "B",
+    "subcellular": "Unknown",
+    "organism": "Unknown",
+    "nan": "Unknown",
+    "": "Unknown"
+}
+
+FTU_IDS = frozenset({
+    "UBERON:0004203", "UBERON:0001289", "UBERON:0004205", "UBERON:0004193",
+    "UBERON:0001285", "UBERON:0004204", "UBERON:0001229", "UBERON:0001291",
+    "UBERON:0004647", "UBERON:0002299", "UBERON:8410043", "UBERON:0000006",
+    "UBERON:0001263", "UBERON:0014725", "UBERON:0004179", "UBERON:0001983",
+    "UBERON:0000412", "UBERON:0002073", "UBERON:0013487", "UBERON:0001213",
+    "UBERON:0001250", "UBERON:0001959", "UBERON:0002125", "UBERON:0001831",
+    "UBERON:0001832", "UBERON:0001736",
+})
+
+TIME_RANGE_DTYPE = pd.CategoricalDtype(TIME_RANGES, ordered=True)
+# "Unknown" is not a category: unknown spatial types are missing values
+SPATIAL_TYPE_DTYPE = pd.CategoricalDtype(SPATIAL_TYPES, ordered=True)
+
+# time coverage of a normalized TimeScale as a bitmask: bit i = TIME_RANGES[i]
+# (scales mapping to "Unknown" only, or not in TIME_MAPPING, cover nothing)
+TIME_MASKS = {
+    scale: sum(1 << TIME_RANGES.index(t) for t in ranges if t in TIME_RANGES)
+    for scale, ranges in TIME_MAPPING.items()
+}
+
+TIME_KEY_RE = re.compile(r"[–—\-\s,]+")
+SPATIAL_KEY_RE = re.compile(r"[^a-z0-9]")
+UBERON_TOKEN_RE = re.compile(r"(UBERON:\d+)", re.IGNORECASE)
+
+
+def organ_system_dtype(systems):
+    """Ordered dtype of organ system names, in first occurrence order."""
+    return pd.CategoricalDtype(list(dict.fromkeys(systems)), ordered=True)
+
+
+@functools.lru_cache(maxsize=None)
+def time_key(raw):
+    """Normalized TimeScale ("Hours-Days" -> "hoursdays")."""
+    return TIME_KEY_RE.sub("", str(raw).lower())
+
+
+@functools.lru_cache(maxsize=None)
+def spatial_key(raw):
+    """Normalized EffectorScale ("Organ System" -> "organsystem")."""
+    return SPATIAL_KEY_RE.sub("", str(raw).strip().lower())
+
+
+@functools.lru_cache(maxsize=None)
+def is_ftu_id(raw):
+    """True when the first UBERON token of an id cell (any case) is an FTU id."""
+    m = UBERON_TOKEN_RE.search(str(raw))
+    return m is not None and m.group(1).upper() in FTU_IDS
+
+
+def _per_unique(series, normalize, missing):
+    """normalize applied once per distinct value of series (missing cells -> missing), as a categorical."""
+    codes, uniques = pd.factorize(series)
+    values = [normalize(raw) for raw in uniques] + [missing]
+    # code -1 (missing cell) picks the last value
+    out_codes, categories = pd.factorize(np.array(values, dtype=object))
+    return pd.Series(pd.Categorical.from_codes(out_codes[codes], categories=categories), index=series.index)
+
+
+def time_keys(series):
+    """Normalized TimeScale of every cell (missing -> "nan"), as a categorical."""
+    return _per_unique(series, time_key, "nan")
+
+
+def spatial_keys(series):
+    """Normalized EffectorScale of every cell (missing -> ""), as a categorical."""
+    return _per_unique(series, spatial_key, "")
+
+
+def time_masks(keys):
+    """TIME_MASKS of normalized TimeScale keys as a uint16 array (0: no known time range)."""
+    keys = keys if isinstance(keys.dtype, pd.CategoricalDtype) else keys.astype("category")
+    table = np.array([TIME_MASKS.get(k, 0) for k in keys.cat.categories] + [0], dtype=np.uint16)
+    return table[keys.cat.codes.to_numpy()]
+
+
+def spatial_types(scale, effector_id=None):
+    """
+    EffectorScale -> spatial type as SPATIAL_TYPE_DTYPE (Unknown -> NaN). Tissue
+    rows whose Effector/ID carries one of the FTU UBERON ids become "FTU".
+    """
+    keys = spatial_keys(scale)
+    categories = list(keys.cat.categories)
+    code_of = {s: i for i, s in enumerate(SPATIAL_TYPES)}
+    table = np.array([code_of.get(SPATIAL_MAPPING.get(k, "Unknown"), -1) for k in categories] + [-1], dtype=np.int8)
+    tissue_table = np.array([k.startswith("tissue") and k != "tissueftu" for k in categories] + [False])
+
+    key_codes = keys.cat.codes.to_numpy()
+    codes = table[key_codes]
+    tissue = tissue_table[key_codes]
+    if tissue.any():
+        if effector_id is not None:
+            ftu = _per_unique(effector_id[tissue], is_ftu_id, False).astype(bool).to_numpy()
+        else:
+            ftu = np.zeros(int(tissue.sum()), dtype=bool)
+        codes[tissue] = np.where(ftu, code_of["FTU"], code_of["AS"])
+    return pd.Series(pd.Categorical.from_codes(codes, dtype=SPATIAL_TYPE_DTYPE), index=scale.index)
+
+
+def category_codes(series, dtype):
+    """Codes of series in dtype's categories, in their order (-1: not a category); no recoding when they match."""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(dtype)
+    elif not series.cat.categories.equals(dtype.categories):
+        # unordered dtypes compare equal whatever their category order, so compare the categories
+        series = series.cat.set_categories(dtype.categories)
+    return series.cat.codes.to_numpy()